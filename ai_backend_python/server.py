@@ -1,9 +1,66 @@
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-import subprocess
+"""
+Async HTTP service for anonymization.
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+The NER pipeline is loaded once per process and each inference thread gets
+its own DocumentConverter (through NerWorker from cli/ner_worker.py).
+Inference runs in a bounded thread pool so the event loop never blocks.
+When every worker is busy and the queue is full, new jobs are rejected
+with HTTP 429 instead of piling up. The worker, its result cache and the
+thread pool are created in the lifespan hook, so importing this module has
+no side effects.
+
+Token windows from concurrent jobs are coalesced by a MicroBatcher
+(cli/batching.py) so the model runs one larger forward pass instead of one
+small pass per document.
+
+Endpoints:
+    POST /anonymize/text   JSON {"text": "...", "regex_only": false}
+    POST /anonymize/text/edit
+                           JSON {"text": "...", "redactions": [...],
+                           "edit": {"start": 0, "end": 0, "text": "..."}}.
+                           Re-runs detection only around the edited range
+                           and returns the updated text and redactions.
+    POST /anonymize/pdf    Raw PDF bytes as the request body. With
+                           ?stream=true the response is NDJSON with one
+                           {"event": "page", ...} line per page and a final
+                           {"event": "result", ...} line.
+    GET  /health           Model and queue status
+    GET|POST /run-script   Compatibility route for ALLOWED_SCRIPTS
+
+Configuration through environment variables:
+    ANONYMIZATION_WORKERS    Inference threads (default 4)
+    ANONYMIZATION_MAX_QUEUE  Jobs allowed to wait for a thread (default 8)
+    ANONYMIZATION_BATCH_WINDOWS  Max token windows per forward pass (default 32)
+    ANONYMIZATION_BATCH_WAIT_MS  Max wait for more windows before a pass (default 10)
+    ANONYMIZATION_LAZY       Load the model on the first job instead of at startup
+
+Usage:
+    python ai_backend_python/server.py [--host 0.0.0.0] [--port 8000]
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "cli"))
+
+from batching import MicroBatcher
+from censurering import create_ner_pipeline, original_stderr
+from models import ModelRouter
+from ner_worker import NerWorker
+from result_cache import ResultCache
+
+logger = logging.getLogger("anonymization.server")
 
 # Allowed scripts for security
 ALLOWED_SCRIPTS = {
@@ -11,21 +68,226 @@ ALLOWED_SCRIPTS = {
     "censurering": "censurering.py"
 }
 
-@app.route('/run-script', methods=['GET', 'POST'])
-def run_script():
-    script_key = request.args.get("script")  # Get the script parameter from the request
+INFERENCE_WORKERS = int(os.environ.get('ANONYMIZATION_WORKERS', 4))
+MAX_QUEUE = int(os.environ.get('ANONYMIZATION_MAX_QUEUE', 8))
+BATCH_WINDOWS = int(os.environ.get('ANONYMIZATION_BATCH_WINDOWS', 32))
+BATCH_WAIT_MS = float(os.environ.get('ANONYMIZATION_BATCH_WAIT_MS', 10))
+
+
+class QueueFull(Exception):
+    pass
+
+
+class InferenceExecutor:
+    """Thread pool that accepts at most workers + max_queue jobs at a time"""
+
+    def __init__(self, workers, max_queue):
+        self.capacity = workers + max_queue
+        self.in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+
+    @asynccontextmanager
+    async def slot(self):
+        """Reserve a place in the queue, or raise QueueFull"""
+        if self.in_flight >= self.capacity:
+            raise QueueFull()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    async def run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_batched_pipeline():
+    def batched(ner_pipeline):
+        return MicroBatcher(ner_pipeline, max_windows=BATCH_WINDOWS, max_wait_ms=BATCH_WAIT_MS)
+
+    ner_pipeline = create_ner_pipeline()
+    if isinstance(ner_pipeline, ModelRouter):
+        # One batcher per model, created as the router loads each model
+        ner_pipeline.wrap = batched
+        return ner_pipeline
+    return batched(ner_pipeline)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.worker = NerWorker(cache=ResultCache(), pipeline_factory=create_batched_pipeline)
+    app.state.executor = InferenceExecutor(INFERENCE_WORKERS, MAX_QUEUE)
+    if not os.environ.get('ANONYMIZATION_LAZY'):
+        await app.state.executor.run(app.state.worker.warm)
+    yield
+    app.state.executor.shutdown()
+
+
+app = FastAPI(title="Anonymization", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+@app.exception_handler(QueueFull)
+async def queue_full(request, exc):
+    return JSONResponse({"error": "Server is busy, try again later"}, status_code=429,
+                        headers={"Retry-After": "1"})
+
+
+def _unwrap(response):
+    """Turn a NerWorker response into the HTTP result"""
+    if not response.get('ok'):
+        raise HTTPException(status_code=422, detail=response.get('error'))
+    return response['result']
 
-    if script_key not in ALLOWED_SCRIPTS:
-        return jsonify({"error": "Invalid script name"}), 400  # Return an error if script is not allowed
 
-    script_name = ALLOWED_SCRIPTS[script_key]  # Get the actual script filename
+@app.post('/anonymize/text')
+async def anonymize_text(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict) or not isinstance(body.get('text'), str):
+        raise HTTPException(status_code=400, detail="Body must be JSON with a 'text' string")
 
-    result = subprocess.run(["python3", script_name], capture_output=True, text=True)
+    job = {'text': body['text'], 'regex_only': bool(body.get('regex_only'))}
+    executor = request.app.state.executor
+    async with executor.slot():
+        return _unwrap(await executor.run(request.app.state.worker.handle, job))
+
+
+@app.post('/anonymize/text/edit')
+async def anonymize_text_edit(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    if (not isinstance(body, dict) or not isinstance(body.get('text'), str)
+            or not isinstance(body.get('redactions', []), list) or not isinstance(body.get('edit'), dict)):
+        raise HTTPException(status_code=400,
+                            detail="Body must be JSON with 'text', 'redactions' and an 'edit' object")
+
+    job = {
+        'text': body['text'],
+        'redactions': body.get('redactions', []),
+        'edit': body['edit'],
+        'regex_only': bool(body.get('regex_only')),
+    }
+    executor = request.app.state.executor
+    async with executor.slot():
+        return _unwrap(await executor.run(request.app.state.worker.handle, job))
+
+
+@app.post('/anonymize/pdf')
+async def anonymize_pdf(request: Request, stream: bool = False):
+    data = await request.body()
+    if not data:
+        raise HTTPException(status_code=400, detail="Request body must contain the PDF")
+
+    worker, executor = request.app.state.worker, request.app.state.executor
+    if stream:
+        return await _stream_pdf(data, worker, executor)
+
+    async with executor.slot():
+        with temporary_pdf(data) as pdf_path:
+            return _unwrap(await executor.run(worker.handle, {'pdf_path': pdf_path}))
+
+
+async def _stream_pdf(data, worker, executor):
+    """Stream one NDJSON line per page while the PDF is being processed"""
+    # Reserve the slot before the response starts so a full queue still gives 429
+    slot = executor.slot()
+    await slot.__aenter__()
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(message):
+        loop.call_soon_threadsafe(events.put_nowait, {'event': 'page', **message['data']})
+
+    async def produce():
+        try:
+            with temporary_pdf(data) as pdf_path:
+                response = await executor.run(worker.handle, {'pdf_path': pdf_path, 'stream': True}, emit)
+            if response.get('ok'):
+                await events.put({'event': 'result', **response['result']})
+            else:
+                await events.put({'event': 'error', 'error': response.get('error')})
+        except Exception as e:
+            logger.exception("Streaming job failed")
+            await events.put({'event': 'error', 'error': str(e)})
+        finally:
+            await events.put(None)
+            await slot.__aexit__(None, None, None)
+
+    # Started right away so the slot is released even if the client disconnects
+    task = asyncio.create_task(produce())
+
+    async def body():
+        while (event := await events.get()) is not None:
+            yield json.dumps(event, ensure_ascii=False) + '\n'
+        await task
+
+    return StreamingResponse(body(), media_type='application/x-ndjson')
+
+
+@contextmanager
+def temporary_pdf(data):
+    """Write the uploaded bytes to a temporary file that is removed afterwards"""
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        yield path
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+@app.get('/health')
+async def health(request: Request):
+    worker, executor = request.app.state.worker, request.app.state.executor
+    return {
+        "status": "ok",
+        "model_loaded": worker.loaded,
+        "in_flight": executor.in_flight,
+        "capacity": executor.capacity,
+        "batching": worker.ner_pipeline.stats if worker.loaded else None,
+    }
+
+
+@app.api_route('/run-script', methods=['GET', 'POST'])
+async def run_script(script: str = None):
+    if script not in ALLOWED_SCRIPTS:
+        return JSONResponse({"error": "Invalid script name"}, status_code=400)  # Return an error if script is not allowed
+
+    script_name = ALLOWED_SCRIPTS[script]  # Get the actual script filename
+
+    process = await asyncio.create_subprocess_exec(
+        "python3", script_name,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+
+    return {
+        "output": stdout.decode(errors='replace').strip(),
+        "error": stderr.decode(errors='replace').strip()
+    }
 
-    return jsonify({
-        "output": result.stdout.strip(),
-        "error": result.stderr.strip()
-    })
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Async HTTP service for anonymization.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    # censurering.py silences sys.stderr, so server logs go to the real stderr
+    logging.basicConfig(stream=original_stderr, level=logging.INFO)
+    uvicorn.run(app, host=args.host, port=args.port, log_config=None)
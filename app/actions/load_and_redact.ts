@@ -1,9 +1,9 @@
 "use server";
 
-import { writeFile, readFile, unlink } from 'fs/promises';
+import { writeFile, unlink } from 'fs/promises';
 import { join } from 'path';
 import { tmpdir } from 'os';
-import { runCommand } from '../utils/process';
+import { getPythonWorker } from '../utils/pythonWorker';
 import { Redaction } from '@/ai';
 import { FileCache } from '../utils/fileCache';
 
@@ -40,23 +40,16 @@ export async function processPDF(file: File): Promise<string> {
 
     const tempDir = tmpdir();
     const inputPath = join(tempDir, `input-${Date.now()}.pdf`);
-    const outputPath = join(tempDir, `output-${Date.now()}.txt`);
 
     try {
         // Convert File to Buffer and write to temp file
         const buffer = Buffer.from(await file.arrayBuffer());
         await writeFile(inputPath, buffer);
 
-        // Run the PDF conversion command with a 3-minute timeout
-        await runCommand('python', [
-            'cli/pdf_converter.py',
-            inputPath,
-            outputPath
-        ]);
-
-        // Read the output file
-        const pyOutput = await readFile(outputPath, 'utf-8');
-        const parsedOutput = JSON.parse(pyOutput);
+        // Run the PDF conversion in the warm Python worker (3-minute timeout)
+        const parsedOutput = await getPythonWorker().run<Omit<PyOutput, 'filename'>>({
+            pdf_path: inputPath
+        });
 
         // Store in memory for BART and file cache for persistence
         LOAD_AND_REDACT_STORAGE.push({
@@ -65,21 +58,15 @@ export async function processPDF(file: File): Promise<string> {
         });
         await fileCache.set(fileName, parsedOutput);
 
-        // Clean up temporary files
-        await Promise.all([
-            unlink(inputPath),
-            unlink(outputPath)
-        ]);
+        // Clean up temporary file
+        await unlink(inputPath);
 
         return parsedOutput.original_text;
     } catch (error) {
         console.error('Error processing PDF:', error);
-        // Clean up temporary files even if there's an error
+        // Clean up temporary file even if there's an error
         try {
-            await Promise.all([
-                unlink(inputPath).catch(() => { }),
-                unlink(outputPath).catch(() => { })
-            ]);
+            await unlink(inputPath).catch(() => { });
         } catch (cleanupError) {
             console.error('Error cleaning up temporary files:', cleanupError);
         }
@@ -1,45 +1,31 @@
 "use server";
 
-import { writeFile, readFile, unlink } from 'fs/promises';
+import { writeFile, unlink } from 'fs/promises';
 import { join } from 'path';
 import { tmpdir } from 'os';
-import { runCommand } from '../utils/process';
+import { getPythonWorker } from '../utils/pythonWorker';
 
 export async function processPDF(file: File): Promise<string> {
   const tempDir = tmpdir();
   const inputPath = join(tempDir, `input-${Date.now()}.pdf`);
-  const outputPath = join(tempDir, `output-${Date.now()}.txt`);
 
   try {
     // Convert File to Buffer and write to temp file
     const buffer = Buffer.from(await file.arrayBuffer());
     await writeFile(inputPath, buffer);
 
-    // Run the PDF conversion command with a 3-minute timeout
-    await runCommand('python', [
-      'cli/pdf_converter.py',
-      inputPath,
-      outputPath
-    ]);
+    // Run the PDF conversion in the warm Python worker (3-minute timeout)
+    const result = await getPythonWorker().run({ pdf_path: inputPath });
 
-    // Read the output file
-    const outputText = await readFile(outputPath, 'utf-8');
+    // Clean up temporary file
+    await unlink(inputPath);
 
-    // Clean up temporary files
-    await Promise.all([
-      unlink(inputPath),
-      unlink(outputPath)
-    ]);
-
-    return outputText;
+    return JSON.stringify(result);
   } catch (error) {
     console.error('Error processing PDF:', error);
-    // Clean up temporary files even if there's an error
+    // Clean up temporary file even if there's an error
     try {
-      await Promise.all([
-        unlink(inputPath).catch(() => { }),
-        unlink(outputPath).catch(() => { })
-      ]);
+      await unlink(inputPath).catch(() => { });
     } catch (cleanupError) {
       console.error('Error cleaning up temporary files:', cleanupError);
     }
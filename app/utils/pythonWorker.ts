@@ -0,0 +1,160 @@
+import { spawn, ChildProcessByStdio } from 'child_process';
+import { createInterface } from 'readline';
+import { Readable, Writable } from 'stream';
+
+type WorkerProcess = ChildProcessByStdio<Writable, Readable, null>;
+
+type QueuedJob = {
+    id: string;
+    payload: Record<string, unknown>;
+    resolve: (result: unknown) => void;
+    reject: (error: Error) => void;
+    onEvent?: (event: WorkerEvent) => void;
+    timeoutId?: NodeJS.Timeout;
+};
+
+export type WorkerEvent = {
+    event: string;
+    data: unknown;
+};
+
+type WorkerResponse = {
+    id: string;
+    ok?: boolean;
+    event?: string;
+    data?: unknown;
+    result?: unknown;
+    error?: string;
+};
+
+/**
+ * Keeps a single long-lived `cli/ner_worker.py` process around so the NER model
+ * and docling converter are only loaded once, and talks to it over a
+ * JSON-lines protocol on stdin/stdout.
+ *
+ * The worker handles one job at a time, so jobs wait in a bounded queue here
+ * and are written to the worker one by one. The timeout only covers the time
+ * the worker spends on a job; when it expires the worker is killed (it is
+ * restarted for the next job) so it never keeps working on a dropped job.
+ */
+export class PythonWorker {
+    private process: WorkerProcess | null = null;
+    private queue: QueuedJob[] = [];
+    private active: QueuedJob | null = null;
+    private nextId = 0;
+
+    constructor(
+        private command: string = 'python',
+        private args: string[] = ['cli/ner_worker.py', '--lazy'], // Cache hits never need the model
+        private timeoutMs: number = 180000,
+        private maxQueued: number = 16
+    ) { }
+
+    private start(): WorkerProcess {
+        if (this.process) return this.process;
+
+        const child = spawn(this.command, this.args, {
+            stdio: ['pipe', 'pipe', 'inherit'] // Worker logs go straight to our stderr
+        });
+
+        createInterface({ input: child.stdout }).on('line', (line) => {
+            let response: WorkerResponse;
+            try {
+                response = JSON.parse(line);
+            } catch {
+                console.error('Unexpected output from Python worker:', line);
+                return;
+            }
+
+            const job = this.active;
+            if (child !== this.process || !job || response.id !== job.id) return;
+
+            // Intermediate events (e.g. one per page when streaming) don't finish the job
+            if (response.event) {
+                job.onEvent?.({ event: response.event, data: response.data });
+                return;
+            }
+
+            this.finish(job);
+            if (response.ok) {
+                job.resolve(response.result);
+            } else {
+                job.reject(new Error(response.error ?? 'Python worker failed'));
+            }
+        });
+
+        const fail = (error: Error) => {
+            // A worker that was replaced after a timeout no longer owns any job
+            if (child !== this.process) return;
+            this.process = null;
+            const job = this.active;
+            if (job) {
+                this.finish(job);
+                job.reject(error);
+            }
+        };
+
+        child.on('exit', (code) => fail(new Error(`Python worker exited with code ${code}`)));
+        child.on('error', (error) => fail(new Error(`Failed to start Python worker: ${error.message}`)));
+
+        this.process = child;
+        return child;
+    }
+
+    /** Writes the next queued job to the worker if it is idle */
+    private pump() {
+        if (this.active) return;
+        const job = this.queue.shift();
+        if (!job) return;
+
+        const child = this.start();
+        this.active = job;
+        job.timeoutId = setTimeout(() => {
+            // Kill the worker so it stops working on the job; the next job starts a new one
+            this.process = null;
+            child.kill();
+            this.finish(job);
+            job.reject(new Error(`Python worker timed out after ${this.timeoutMs / 1000} seconds`));
+        }, this.timeoutMs);
+
+        child.stdin.write(JSON.stringify({ ...job.payload, id: job.id }) + '\n');
+    }
+
+    private finish(job: QueuedJob) {
+        clearTimeout(job.timeoutId);
+        if (this.active === job) this.active = null;
+        setImmediate(() => this.pump());
+    }
+
+    /**
+     * Queues a job for the worker and resolves with its `result` field
+     * @param job The job payload, e.g. `{ pdf_path: '/tmp/input.pdf' }`
+     * @param onEvent Called for intermediate events, e.g. each page of a `stream: true` job
+     */
+    async run<T>(job: Record<string, unknown>, onEvent?: (event: WorkerEvent) => void): Promise<T> {
+        if (this.queue.length >= this.maxQueued) {
+            throw new Error(`Python worker queue is full (${this.maxQueued} jobs waiting)`);
+        }
+
+        return new Promise<T>((resolve, reject) => {
+            this.queue.push({
+                id: String(this.nextId++),
+                payload: job,
+                resolve: (result) => resolve(result as T),
+                reject,
+                onEvent
+            });
+            this.pump();
+        });
+    }
+}
+
+// Reuse the same worker across hot reloads in development
+const globalForWorker = globalThis as unknown as { pythonWorker?: PythonWorker };
+
+export function getPythonWorker(): PythonWorker {
+    if (!globalForWorker.pythonWorker) {
+        globalForWorker.pythonWorker = new PythonWorker();
+    }
+    return globalForWorker.pythonWorker;
+}
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Paritet och latens för NER-backends (se cli/ner_backends.py).
+
+Kör run_ner över texterna i resources/txt med PyTorch fp32 som referens och
+med varje vald backend. För varje backend rapporteras latensen per dokument
+(p50/p99 efter en uppvärmningskörning), hur väl entiteterna stämmer med
+referensen (precision/recall/F1 på exakt (start, end, entity_group)) och
+största skillnaden i score för matchade entiteter.
+
+Avslutas med felkod om en backend har lägre F1 än --min-f1 mot referensen.
+Pariteten kontrolleras också automatiskt av tests/test_backend_parity.py;
+det här skriptet är till för att mäta latensen.
+
+Användning:
+    python benchmarks/bench_backends.py [--backends onnx,onnx-int8] [--repeat 3] [--min-f1 0.95]
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR / "cli"))
+
+from censurering import create_ner_pipeline, logger, NER_CONFIDENCE_THRESHOLD
+from chunking import run_ner
+
+from bench_utils import percentile
+
+RESOURCES_DIR = REPO_DIR / "resources"
+
+
+def load_texts(resources_dir=RESOURCES_DIR):
+    """Originaltexterna i resources/txt (<namn>_non_anon.txt, samma som bench_corpus.py)"""
+    return {
+        path.name[:-len("_non_anon.txt")]: path.read_text(encoding="utf-8")
+        for path in sorted((resources_dir / "txt").glob("*_non_anon.txt"))
+    }
+
+
+def run_backend(backend, texts, repeat, confidence_threshold):
+    """
+    Kör NER på alla texter med en backend.
+
+    Returns:
+        (entiteter per dokument, latenser i sekunder, laddningstid i sekunder)
+    """
+    started = time.perf_counter()
+    ner_pipeline = create_ner_pipeline(backend)
+    load_seconds = time.perf_counter() - started
+
+    entities = {}
+    latencies = []
+    for name, text in texts.items():
+        # Första körningen värmer upp (allokeringar, ORT-sessionens grafoptimering)
+        entities[name] = run_ner(text, ner_pipeline, confidence_threshold)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run_ner(text, ner_pipeline, confidence_threshold)
+            latencies.append(time.perf_counter() - started)
+
+    return entities, latencies, load_seconds
+
+
+def compare(reference, candidate):
+    """Jämför entiteterna från en backend med referensen"""
+    matched = 0
+    expected = 0
+    found = 0
+    max_score_diff = 0.0
+
+    for name, ref_entities in reference.items():
+        ref = {(e['start'], e['end'], e['entity_group']): float(e['score']) for e in ref_entities}
+        cand = {(e['start'], e['end'], e['entity_group']): float(e['score']) for e in candidate[name]}
+
+        expected += len(ref)
+        found += len(cand)
+        for key in ref.keys() & cand.keys():
+            matched += 1
+            max_score_diff = max(max_score_diff, abs(ref[key] - cand[key]))
+
+    precision = matched / found if found else 1.0
+    recall = matched / expected if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'f1': round(f1, 4),
+        'max_score_diff': round(max_score_diff, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paritet och latens för NER-backends.')
+    parser.add_argument('--backends', default='onnx,onnx-int8',
+                        help='Kommaseparerade backends att jämföra med torch')
+    parser.add_argument('--repeat', type=int, default=3, help='Antal mätta körningar per dokument')
+    parser.add_argument('--min-f1', type=float, default=0.95,
+                        help='Lägsta godkända F1 mot torch-referensen')
+    parser.add_argument('--confidence-threshold', type=float, default=NER_CONFIDENCE_THRESHOLD)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    texts = load_texts()
+    chars = sum(len(text) for text in texts.values())
+
+    reference = None
+    rows = []
+    failures = []
+    for backend in ['torch'] + [b for b in args.backends.split(',') if b and b != 'torch']:
+        entities, latencies, load_seconds = run_backend(backend, texts, args.repeat, args.confidence_threshold)
+        row = {
+            'backend': backend,
+            'load_s': round(load_seconds, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'chars_per_s': round(chars * args.repeat / sum(latencies)) if latencies else None,
+        }
+
+        if reference is None:
+            reference = entities
+            row['entities'] = sum(len(e) for e in entities.values())
+        else:
+            row['parity'] = compare(reference, entities)
+            row['speedup'] = round(rows[0]['p50_ms'] / row['p50_ms'], 2) if row['p50_ms'] else None
+            if row['parity']['f1'] < args.min_f1:
+                failures.append(f"{backend}: F1 {row['parity']['f1']} < {args.min_f1}")
+
+        rows.append(row)
+        print(json.dumps(row), flush=True)
+
+    for failure in failures:
+        print(f"FEL: {failure}", file=sys.__stderr__)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Benchmark och träffsäkerhet över exempelkorpusen i resources/.
+
+Varje resources/txt/<namn>_non_anon.txt körs genom samma
+build_censoring_plan och render_plan som produktionen, och tiden för varje
+steg (regex, ordlistor, NER, spridning, överlappsupplösning, rendering)
+hämtas från deras Metrics. Texterna skalas syntetiskt (1x, 100x, 10 000x)
+genom att upprepas, och för varje skala rapporteras tecken/sekund,
+p50/p99-latens per steg och processens högsta RSS.
+
+På originaltexterna (skala 1) mäts även recall mot
+resources/labels/<namn>_critical.json och <namn>_potential.json: en etikett
+räknas som hittad om dess förekomst i texten överlappar ett censurerat spann.
+
+Resultatet skrivs som JSON så att körningar från olika commits kan jämföras.
+
+Användning:
+    python benchmarks/bench_corpus.py [--scales 1,100,10000] [--ner] [--output resultat.json]
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR / "cli"))
+
+from censurering import build_censoring_plan, render_plan, logger, NER_CONFIDENCE_THRESHOLD
+from instrumentation import Metrics
+
+from bench_utils import percentile
+
+RESOURCES_DIR = REPO_DIR / "resources"
+LABEL_CATEGORIES = ("critical", "potential")
+
+# Upprepade kopior av en text sätts ihop som separata stycken
+SCALE_SEPARATOR = "\n\n"
+
+
+def load_corpus(resources_dir=RESOURCES_DIR):
+    """
+    Läs in alla <namn>_non_anon.txt med tillhörande etiketter.
+
+    Returns:
+        Lista med dicts (name, text, labels) där labels är
+        {'critical': [...], 'potential': [...]}
+    """
+    corpus = []
+    for path in sorted((resources_dir / "txt").glob("*_non_anon.txt")):
+        name = path.name[:-len("_non_anon.txt")]
+
+        labels = {}
+        for category in LABEL_CATEGORIES:
+            label_path = resources_dir / "labels" / f"{name}_{category}.json"
+            if label_path.exists():
+                with open(label_path, encoding="utf-8") as f:
+                    labels[category] = json.load(f)
+            else:
+                labels[category] = []
+
+        corpus.append({
+            'name': name,
+            'text': path.read_text(encoding="utf-8"),
+            'labels': labels,
+        })
+    return corpus
+
+
+def peak_rss_mb():
+    """Processens högsta RSS hittills (ru_maxrss är i kB på Linux, bytes på macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def label_recall(text, labels, plan):
+    """
+    Andel etiketter vars förekomster i texten täcks av ett spann i planen.
+
+    En etikett som förekommer flera gånger i listan matchas mot lika många
+    förekomster i texten, i ordning. Etiketter som inte finns i texten alls
+    räknas separat som 'not_in_text' och ingår inte i recall.
+
+    Returns:
+        Dict med found, total, not_in_text och recall
+    """
+    covered = sorted((item['start'], item['end']) for item in plan)
+
+    def is_covered(start, end):
+        return any(cstart < end and cend > start for cstart, cend in covered)
+
+    wanted = {}
+    for label in labels:
+        wanted[label] = wanted.get(label, 0) + 1
+
+    found = total = not_in_text = 0
+    for label, count in wanted.items():
+        occurrences = []
+        position = text.find(label)
+        while position >= 0 and len(occurrences) < count:
+            occurrences.append((position, position + len(label)))
+            position = text.find(label, position + 1)
+
+        not_in_text += count - len(occurrences)
+        total += len(occurrences)
+        found += sum(1 for start, end in occurrences if is_covered(start, end))
+
+    return {
+        'found': found,
+        'total': total,
+        'not_in_text': not_in_text,
+        'recall': round(found / total, 4) if total else None,
+    }
+
+
+def run_stages(text, ner_pipeline, confidence_threshold):
+    """
+    Kör hela planen och renderingen en gång på texten och mät tiden för varje
+    steg.
+
+    Returns:
+        (tider per steg i sekunder, där 'plan' är hela build_censoring_plan,
+        slutlig plan)
+    """
+    metrics = Metrics()
+
+    started = time.perf_counter()
+    filtered_plan = build_censoring_plan(text, ner_pipeline, confidence_threshold, metrics=metrics)
+    plan_seconds = time.perf_counter() - started
+
+    render_plan(text, filtered_plan, metrics)
+
+    return {**metrics.timings, 'plan': plan_seconds}, filtered_plan
+
+
+def benchmark_scale(corpus, scale, repeat, ner_pipeline, confidence_threshold):
+    """Kör hela korpusen i en given skala och sammanställ mätvärdena per steg"""
+    samples = {}
+    stage_chars = {}
+    recall = {}
+
+    for document in corpus:
+        text = SCALE_SEPARATOR.join([document['text']] * scale)
+
+        for _ in range(repeat):
+            timings, plan = run_stages(text, ner_pipeline, confidence_threshold)
+            for stage, seconds in timings.items():
+                samples.setdefault(stage, []).append(seconds)
+                stage_chars[stage] = stage_chars.get(stage, 0) + len(text)
+
+        if scale == 1:
+            recall[document['name']] = {
+                category: label_recall(text, labels, plan)
+                for category, labels in document['labels'].items()
+            }
+        del text, plan
+
+    stages = {}
+    for stage, seconds in samples.items():
+        total = sum(seconds)
+        stages[stage] = {
+            'runs': len(seconds),
+            'chars_per_s': round(stage_chars[stage] / total) if total else None,
+            'p50_ms': round(percentile(seconds, 0.50) * 1000, 3),
+            'p99_ms': round(percentile(seconds, 0.99) * 1000, 3),
+        }
+
+    row = {
+        'scale': scale,
+        'chars': sum(len(d['text']) * scale + len(SCALE_SEPARATOR) * (scale - 1) for d in corpus),
+        'ner': 'ner' in samples,
+        'stages': stages,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    if recall:
+        row['recall'] = recall
+        row['recall_total'] = {
+            category: _combine_recall(r[category] for r in recall.values())
+            for category in LABEL_CATEGORIES
+        }
+    return row
+
+
+def _combine_recall(results):
+    found = total = not_in_text = 0
+    for result in results:
+        found += result['found']
+        total += result['total']
+        not_in_text += result['not_in_text']
+    return {
+        'found': found,
+        'total': total,
+        'not_in_text': not_in_text,
+        'recall': round(found / total, 4) if total else None,
+    }
+
+
+def git_commit():
+    """Aktuell commit, så att resultat från olika körningar kan jämföras"""
+    try:
+        completed = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR,
+                                   capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark och recall över resources/.')
+    parser.add_argument('--scales', default='1,100,10000',
+                        help='Kommaseparerade skalfaktorer för korpusen')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Antal körningar per dokument i skala 1 (repeat // skala i större skalor, minst 1)')
+    parser.add_argument('--ner', action='store_true', help='Ladda NER-modellen och mät även NER-steget')
+    parser.add_argument('--ner-max-scale', type=int, default=1,
+                        help='Största skala där NER-steget körs')
+    parser.add_argument('--confidence-threshold', type=float, default=NER_CONFIDENCE_THRESHOLD)
+    parser.add_argument('--resources', default=str(RESOURCES_DIR), help='Katalog med txt/ och labels/')
+    parser.add_argument('--output', help='Skriv resultatet till fil i stället för stdout')
+    args = parser.parse_args()
+
+    corpus = load_corpus(Path(args.resources))
+    if not corpus:
+        print(f"FEL: hittade inga *_non_anon.txt i {args.resources}/txt", file=sys.stderr)
+        sys.exit(1)
+
+    # Stegloggen skulle annars skrivas för varje körning och påverka mätningen
+    logger.setLevel(logging.WARNING)
+
+    ner_pipeline = None
+    if args.ner:
+        from censurering import create_ner_pipeline
+        ner_pipeline = create_ner_pipeline()
+
+    rows = []
+    for scale in (int(s) for s in args.scales.split(',')):
+        pipeline = ner_pipeline if scale <= args.ner_max_scale else None
+        repeat = max(1, args.repeat // scale)
+
+        row = benchmark_scale(corpus, scale, repeat, pipeline, args.confidence_threshold)
+        rows.append(row)
+        print(f"skala {scale}: klar", file=sys.__stderr__, flush=True)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'documents': [d['name'] for d in corpus],
+        'results': rows,
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
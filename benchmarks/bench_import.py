@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Kontroll av kallstartstiden för censurering.py.
+
+Importerar modulen i en ny Python-process med `python -X importtime`,
+summerar den kumulativa importtiden och kontrollerar att varken torch,
+transformers eller docling laddas bara av att modulen importeras. Avslutas
+med felkod om budgeten överskrids, så att skriptet kan köras i CI.
+
+Användning:
+    python benchmarks/bench_import.py [--module censurering] [--budget-ms 150]
+"""
+import re
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+CLI_DIR = Path(__file__).resolve().parent.parent / "cli"
+
+# Tunga beroenden som bara får laddas när NER eller PDF-konvertering faktiskt används
+HEAVY_MODULES = ("torch", "transformers", "docling")
+
+# Rader från -X importtime: "import time:   self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(module):
+    """
+    Importera modulen i en separat process och returnera mätvärdena.
+
+    Returns:
+        Dict med kumulativ importtid (ms), de långsammaste importerna och
+        vilka tunga moduler som laddades
+    """
+    code = (
+        f"import sys, json; import {module}; "
+        f"sys.__stdout__.write(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=CLI_DIR, capture_output=True, text=True, check=True,
+    )
+
+    timings = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative_us = int(match.group(2))
+            depth = len(match.group(3)) // 2
+            timings.append((match.group(4), cumulative_us, depth))
+
+    total_us = next((us for name, us, _ in timings if name == module), 0)
+    top_level = sorted(((name, us) for name, us, depth in timings if depth == 0),
+                       key=lambda x: x[1], reverse=True)
+
+    return {
+        'module': module,
+        'cumulative_ms': round(total_us / 1000, 1),
+        'slowest_imports_ms': {name: round(us / 1000, 1) for name, us in top_level[:10]},
+        'heavy_modules_loaded': json.loads(completed.stdout or "[]"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mät importtiden för en modul i cli/.')
+    parser.add_argument('--module', default='censurering', help='Modul att importera')
+    parser.add_argument('--budget-ms', type=float, default=150.0,
+                        help='Max tillåten kumulativ importtid i millisekunder')
+    args = parser.parse_args()
+
+    result = measure(args.module)
+    result['budget_ms'] = args.budget_ms
+    print(json.dumps(result, indent=2))
+
+    failures = []
+    if result['heavy_modules_loaded']:
+        failures.append(f"tunga moduler laddades vid import: {', '.join(result['heavy_modules_loaded'])}")
+    if result['cumulative_ms'] > args.budget_ms:
+        failures.append(f"importtiden {result['cumulative_ms']} ms överskrider budgeten {args.budget_ms} ms")
+
+    for failure in failures:
+        print(f"FEL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark för överlappsupplösning av spann.
+
+Jämför resolve_overlaps i cli/spans.py med den tidigare linjära genomgången
+av covered_ranges på syntetiska spann-mängder, och kontrollerar att båda
+ger exakt samma resultat där referensen hinner köras.
+
+Användning:
+    python benchmarks/bench_spans.py [--sizes 10000,100000,1000000] [--reference-limit 100000]
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "cli"))
+
+from spans import resolve_overlaps
+
+
+def reference_resolve_overlaps(spans):
+    """Den ursprungliga O(n²)-implementationen från remove_overlapping_entities"""
+    sorted_spans = sorted(spans, key=lambda x: x['score'], reverse=True)
+
+    covered_ranges = []
+    filtered = []
+
+    for span in sorted_spans:
+        start = span['start']
+        end = span['end']
+
+        overlap = False
+        for cstart, cend in covered_ranges:
+            if (start <= cend and end >= cstart):
+                overlap = True
+                break
+
+        if not overlap:
+            filtered.append(span)
+            covered_ranges.append((start, end))
+
+    return filtered
+
+
+def synthetic_spans(count, seed=0, density=20, max_length=30):
+    """Skapa slumpmässiga spann utspridda över en text med ca density tecken per spann"""
+    rng = random.Random(seed)
+    text_length = count * density
+
+    spans = []
+    for _ in range(count):
+        start = rng.randrange(text_length)
+        spans.append({
+            'start': start,
+            'end': start + rng.randint(1, max_length),
+            'score': rng.random(),
+        })
+    return spans
+
+
+def timed(function, spans):
+    started = time.perf_counter()
+    result = function(spans)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark för resolve_overlaps.')
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='Kommaseparerade antal spann att testa')
+    parser.add_argument('--reference-limit', type=int, default=100000,
+                        help='Kör bara den gamla implementationen upp till så här många spann')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        spans = synthetic_spans(size, seed=args.seed)
+
+        accepted, seconds = timed(resolve_overlaps, spans)
+        row = {
+            'spans': size,
+            'accepted': len(accepted),
+            'resolve_overlaps_s': round(seconds, 4),
+        }
+
+        if size <= args.reference_limit:
+            expected, reference_seconds = timed(reference_resolve_overlaps, spans)
+            row['reference_s'] = round(reference_seconds, 4)
+            row['speedup'] = round(reference_seconds / seconds, 1) if seconds else None
+            row['identical'] = [id(s) for s in accepted] == [id(s) for s in expected]
+
+        results.append(row)
+        print(json.dumps(row), flush=True)
+
+    if not all(row.get('identical', True) for row in results):
+        print("FEL: resolve_overlaps skiljer sig från referensimplementationen", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""Hjälpfunktioner som delas av benchmark-skripten."""
+import math
+
+
+def percentile(samples, fraction):
+    """Percentil enligt nearest-rank, tillräckligt för ett fåtal mätningar"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
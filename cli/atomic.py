@@ -0,0 +1,65 @@
+"""
+Atomiska skrivningar av filer och kataloger.
+
+Innehållet skrivs först till en temporär fil (eller katalog) bredvid målet
+och flyttas sedan på plats med os.replace. En läsare ser därför antingen
+den gamla eller den nya versionen, aldrig en halvskriven, och en avbruten
+skrivning lämnar målet orört.
+"""
+import os
+import uuid
+import shutil
+from pathlib import Path
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode='w', encoding=None):
+    """
+    Öppna en temporär fil som ersätter path när with-blocket avslutas utan fel.
+
+    Args:
+        path: Filen som skrivs
+        mode: 'w' eller 'wb'
+        encoding: Teckenkodning i textläge
+
+    Yields:
+        Filobjektet att skriva till
+    """
+    path = Path(path)
+    # Unikt namn så att samtidiga skrivare inte delar temporärfil
+    temp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp, mode.replace('w', 'x'), encoding=encoding) as f:
+            yield f
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def atomic_directory(path):
+    """
+    Skapa en temporär katalog som ersätter path när with-blocket avslutas utan fel.
+
+    Katalogen har ett fast namn, så en rest från en tidigare avbruten
+    skrivning tas bort först. Bara en skrivare åt gången stöds.
+
+    Yields:
+        Sökvägen till den temporära katalogen
+    """
+    path = Path(path)
+    temp = path.with_name(f".{path.name}.tmp")
+    shutil.rmtree(temp, ignore_errors=True)
+    temp.mkdir(parents=True)
+    try:
+        yield temp
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temp, path)
+    except BaseException:
+        shutil.rmtree(temp, ignore_errors=True)
+        raise
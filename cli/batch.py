@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Batchläge för att anonymisera hela kataloger med PDF:er.
+
+Filerna fördelas över en ProcessPoolExecutor där varje arbetsprocess laddar
+docling-konverteraren och NER-modellen en gång. Antalet jobb som ligger i kö
+är begränsat, och varje färdig fil skrivs till completed.jsonl i
+utdatakatalogen så att en avbruten körning kan återupptas.
+
+Med --prefork laddar huvudprocessen NER-modellen en gång och sätter torch i
+inferensläge innan arbetsprocesserna forkas. Processerna ärver då samma
+fysiska sidor (copy-on-write) i stället för att ha en egen kopia av modellen
+var. Vikterna flyttas inte till delat minne med share_memory(): det skulle
+kopiera varje tensor till /dev/shm, och för vikter som mmap:ats från
+modellagret även bryta delningen via sidcachen. Ingen inferens körs i
+huvudprocessen före forken, eftersom OpenMP-trådpooler inte överlever fork.
+
+Varje arbetsprocess begränsas till cpu_count / workers trådar för NER-
+backenden (torch-trådar, eller ONNX Runtimes intra-op-trådar) och med
+--pin-cpus till lika många egna kärnor, så att processerna inte konkurrerar
+om samma kärnor.
+
+För varje PDF skrivs <namn>.redactions.json med redaktionerna i samma
+format som main2 returnerar under 'redactions'.
+
+Användning:
+    python cli/batch.py <katalog|manifest.txt> --output <katalog> [--workers N] [--prefork] [--pin-cpus]
+"""
+import os
+import json
+import hashlib
+import logging
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+PROGRESS_FILE = "completed.jsonl"
+
+# Laddas en gång per arbetsprocess av _init_worker
+_ner_pipeline = None
+_converter = None
+
+
+def _init_worker(verbose, threads, cpu_counter=None):
+    """Ladda konverterare och NER-modell en gång när arbetsprocessen startar"""
+    global _ner_pipeline, _converter
+    from censurering import create_ner_pipeline, create_converter, logger
+
+    # Stegloggen från main2 är bara brus i batchläge
+    if not verbose:
+        logger.setLevel(logging.WARNING)
+
+    _limit_threads(threads, cpu_counter)
+
+    # I prefork-läget är pipelinen redan ärvd från huvudprocessen
+    if _ner_pipeline is None:
+        _ner_pipeline = create_ner_pipeline()
+    _converter = create_converter()
+
+
+def _limit_threads(threads, cpu_counter=None):
+    """
+    Begränsa NER-backenden till threads trådar i den här processen, och om
+    cpu_counter anges även till en egen uppsättning kärnor.
+
+    torch importeras bara för torch-backenden. För ONNX-backenderna sätts
+    ANONYMIZATION_ORT_THREADS, som ner_backends.py läser när sessionen skapas.
+    """
+    from ner_backends import selected_backend
+
+    if selected_backend() == "torch":
+        import torch
+        torch.set_num_threads(threads)
+    else:
+        os.environ['ANONYMIZATION_ORT_THREADS'] = str(threads)
+
+    if cpu_counter is None or not hasattr(os, 'sched_setaffinity'):
+        return
+
+    # Varje process tar nästa lediga index och får kärnorna som hör till det
+    with cpu_counter.get_lock():
+        index = cpu_counter.value
+        cpu_counter.value += 1
+
+    cpus = sorted(os.sched_getaffinity(0))
+    start = (index * threads) % len(cpus)
+    os.sched_setaffinity(0, cpus[start:start + threads] or cpus)
+
+
+def load_shared_pipeline():
+    """
+    Ladda NER-pipelinen i huvudprocessen för prefork-läget.
+
+    Modellen sätts i eval-läge och gradienter stängs av globalt (även i de
+    forkade processerna). Vikterna delas med arbetsprocesserna genom fork.
+    """
+    import torch
+    from censurering import create_ner_pipeline
+
+    ner_pipeline = create_ner_pipeline()
+    model = getattr(ner_pipeline, 'model', None)
+    if not isinstance(model, torch.nn.Module):
+        raise RuntimeError("--prefork kräver en PyTorch-modell (ANONYMIZATION_NER_BACKEND=torch och en fast modell)")
+
+    torch.set_grad_enabled(False)
+    model.eval()
+    return ner_pipeline
+
+
+def _process_file(pdf_path, output_path):
+    """Kör main2 på en fil i en arbetsprocess och skriv redaktionerna som JSON"""
+    from censurering import main2
+
+    result = main2(pdf_path, None, ner_pipeline=_ner_pipeline, converter=_converter)
+    if result is None:
+        raise RuntimeError(f"Kunde inte bearbeta '{pdf_path}'")
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(result['redactions'], f, ensure_ascii=False, indent=2)
+
+    return len(result['redactions'])
+
+
+def iter_input_files(source):
+    """
+    Iterera över PDF-filer från en katalog (rekursivt) eller en manifestfil
+    med en sökväg per rad (relativ till manifestets katalog).
+
+    Returns:
+        (rotkatalog, iterator med sökvägar)
+    """
+    source = Path(source)
+
+    if source.is_dir():
+        def walk():
+            for dirpath, dirnames, filenames in os.walk(source):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith('.pdf'):
+                        yield Path(dirpath) / filename
+        return source, walk()
+
+    def read_manifest():
+        with open(source, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield source.parent / line
+    return source.parent, read_manifest()
+
+
+def output_path_for(pdf_path, root, output_dir):
+    """Utdatafil för en PDF, med samma katalogstruktur som indata om möjligt"""
+    try:
+        relative = pdf_path.resolve().relative_to(root.resolve())
+    except ValueError:
+        # Filen ligger utanför roten, undvik namnkrockar med en hash av sökvägen
+        digest = hashlib.sha1(str(pdf_path.resolve()).encode('utf-8')).hexdigest()[:8]
+        relative = Path(f"{pdf_path.stem}-{digest}.pdf")
+    return output_dir / relative.with_suffix('.redactions.json')
+
+
+def load_completed(progress_path):
+    """Läs vilka filer som redan bearbetats utan fel"""
+    completed = set()
+    if progress_path.exists():
+        with open(progress_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Halvskriven rad från en avbruten körning
+                if entry.get('status') == 'ok':
+                    completed.add(entry['file'])
+    return completed
+
+
+def run_batch(source, output_dir, workers=None, max_pending=None, verbose=False,
+              prefork=False, pin_cpus=False):
+    """
+    Anonymisera alla PDF:er i source och skriv resultatet till output_dir.
+
+    Args:
+        source: Katalog med PDF:er eller manifestfil
+        output_dir: Katalog för redaktionsfiler och completed.jsonl
+        workers: Antal arbetsprocesser (default antal CPU:er)
+        max_pending: Max antal jobb i kö samtidigt (default 2 * workers)
+        verbose: Visa stegloggen från main2
+        prefork: Ladda modellen en gång här och forka arbetsprocesserna
+        pin_cpus: Lås varje arbetsprocess till egna kärnor
+
+    Returns:
+        Dict med antal bearbetade, överhoppade och misslyckade filer
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    progress_path = output_dir / PROGRESS_FILE
+
+    global _ner_pipeline
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    if prefork:
+        # Ärvs av arbetsprocesserna via fork
+        _ner_pipeline = load_shared_pipeline()
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    cpu_counter = context.Value('i', 0) if pin_cpus else None
+
+    root, files = iter_input_files(source)
+    completed = load_completed(progress_path)
+    stats = {'ok': 0, 'skipped': 0, 'error': 0}
+
+    with open(progress_path, "a", encoding="utf-8") as progress, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                initargs=(verbose, threads, cpu_counter)) as executor:
+        pending = {}
+
+        def record(done):
+            for future in done:
+                pdf_path, output_path = pending.pop(future)
+                entry = {'file': str(pdf_path), 'output': str(output_path)}
+                try:
+                    entry['redactions'] = future.result()
+                    entry['status'] = 'ok'
+                    stats['ok'] += 1
+                except Exception as e:
+                    entry['status'] = 'error'
+                    entry['error'] = str(e)
+                    stats['error'] += 1
+                progress.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                progress.flush()
+                print(f"[{entry['status']}] {pdf_path}")
+
+        for pdf_path in files:
+            if str(pdf_path) in completed:
+                stats['skipped'] += 1
+                continue
+
+            # Begränsa kön så att inte hela arkivet läses in i minnet
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                record(done)
+
+            output_path = output_path_for(pdf_path, root, output_dir)
+            future = executor.submit(_process_file, str(pdf_path), str(output_path))
+            pending[future] = (pdf_path, output_path)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            record(done)
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Anonymisera en hel katalog med PDF:er.')
+    parser.add_argument('source', help='Katalog med PDF:er eller manifestfil med en sökväg per rad')
+    parser.add_argument('--output', required=True, help='Katalog för redaktioner och förloppsfil')
+    parser.add_argument('--workers', type=int, help='Antal arbetsprocesser (default antal CPU:er)')
+    parser.add_argument('--max-pending', type=int, help='Max antal jobb i kö (default 2 * workers)')
+    parser.add_argument('--verbose', action='store_true', help='Visa stegloggen från varje fil')
+    parser.add_argument('--prefork', action='store_true',
+                        help='Ladda modellen en gång och dela vikterna med arbetsprocesserna')
+    parser.add_argument('--pin-cpus', action='store_true', help='Lås varje arbetsprocess till egna kärnor')
+    args = parser.parse_args()
+
+    stats = run_batch(args.source, args.output, args.workers, args.max_pending, args.verbose,
+                      args.prefork, args.pin_cpus)
+    print(f"Klart: {stats['ok']} bearbetade, {stats['skipped']} överhoppade, {stats['error']} misslyckade")
@@ -0,0 +1,152 @@
+"""
+Mikrobatchning av NER-anrop från samtidiga dokument.
+
+MicroBatcher ligger framför den delade NER-pipelinen och ser ut som den för
+run_ner (anropas med en lista texter och har .tokenizer). Tokenfönstren från
+alla trådar som anropar den samlas i en kö, och en bakgrundstråd kör dem
+tillsammans i en forward pass när antingen max_windows fönster har samlats
+eller max_wait_ms har gått sedan det första fönstret kom. Resultatet för
+varje fönster skickas tillbaka till rätt anropare i samma ordning som
+indata, så run_ner kan förskjuta positionerna med sina egna chunk_start
+precis som mot pipelinen direkt.
+"""
+import time
+import queue
+import threading
+
+
+class _Request:
+    """Ett anrop från en tråd som väntar på sina fönster"""
+
+    def __init__(self, count):
+        self.results = [None] * count
+        self.remaining = count
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Samlar fönster från samtidiga anrop till gemensamma batchar"""
+
+    def __init__(self, pipeline, max_windows=32, max_wait_ms=10):
+        """
+        Args:
+            pipeline: NER-pipeline från create_ner_pipeline
+            max_windows: Max antal fönster per forward pass
+            max_wait_ms: Hur länge första fönstret i en batch får vänta på fler
+        """
+        self.pipeline = pipeline
+        self.max_windows = max_windows
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {'batches': 0, 'windows': 0}
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def tokenizer(self):
+        return self.pipeline.tokenizer
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        """
+        Kör NER på inputs via den gemensamma kön och vänta på resultatet.
+
+        batch_size ignoreras, batchstorleken bestäms av max_windows.
+
+        Returns:
+            Samma format som pipelinen: en lista entiteter per text (eller en
+            lista entiteter om inputs är en enskild sträng)
+
+        Raises:
+            RuntimeError om batchern redan är stängd
+        """
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        if not texts:
+            return []
+
+        request = _Request(len(texts))
+        with self._close_lock:
+            # Efter close() skulle fönstren aldrig köras och anroparen vänta för evigt
+            if self._closed:
+                raise RuntimeError("MicroBatcher är stängd")
+            for index, text in enumerate(texts):
+                self._queue.put((request, index, text))
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+
+        return request.results[0] if single else request.results
+
+    def close(self):
+        """
+        Stoppa bakgrundstråden. Batchen som redan körs blir klar, men anrop
+        vars fönster fortfarande ligger i kön får ett RuntimeError i stället
+        för att vänta.
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    request = item[0]
+                    request.error = RuntimeError("MicroBatcher stängdes innan anropet kördes")
+                    request.done.set()
+            self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        """Samla fönster tills batchen är full eller väntetiden har gått ut"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_windows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Stoppa efter den här batchen
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            texts = [text for _, _, text in batch]
+
+            try:
+                outputs = self.pipeline(texts, batch_size=len(texts))
+            except Exception as e:
+                # Alla anrop som hade fönster i batchen får felet
+                for request, _, _ in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+
+            self.stats['batches'] += 1
+            self.stats['windows'] += len(texts)
+
+            for (request, index, _), entities in zip(batch, outputs):
+                request.results[index] = entities
+                request.remaining -= 1
+                if request.remaining == 0:
+                    request.done.set()
@@ -6,6 +6,7 @@ import sys
 import warnings
 import re
 import uuid  # Lägg till import för att generera unika ID:n
+import logging
 
 # 1. Tvinga docling att använda CPU
 os.environ['FORCE_CPU'] = "1"
@@ -21,63 +22,86 @@ sys.stderr = NullWriter()
 warnings.filterwarnings('ignore')
 
 # 4. Importera nödvändiga bibliotek
-import torch
+# torch, transformers, onnxruntime och docling importeras först när de behövs
+# (se create_ner_pipeline och create_converter), så att regex-vägen startar snabbt
 from pathlib import Path
-from docling.document_converter import DocumentConverter
-from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
+from chunking import run_ner
+from spans import resolve_overlaps
+from markdown_offsets import build_offset_map, project_spans, censor_markdown
+from gazetteer import load_gazetteers, classify as classify_gazetteer, find_spans as find_gazetteer_spans
+from propagation import DictionaryMatcher, propagate, COMMON_NAMES, ADDRESS_INDICATORS
+from render import render_views, clip_spans, censored_replacement, tagged_replacement, info_replacement
+from pii_patterns import PII_SCANNER, PERSONAL_DATA_SCANNER, classify_pii
+from instrumentation import Metrics, logger, configure_logging, profiling, report
+from ner_backends import selected_backend
+from model_store import resolve_docling
+from models import MODEL_REGISTRY, DEFAULT_MODEL, AUTO_MODEL, ModelRouter, load_pipeline, selected_model
+
+# Loggen går till den riktiga stderr eftersom sys.stderr är avstängd ovan
+configure_logging(original_stderr)
+
+# NER-modellen som används som standard och lägsta score för att en entitet ska censureras
+NER_MODEL_ID = MODEL_REGISTRY[DEFAULT_MODEL].model_id
+NER_CONFIDENCE_THRESHOLD = 0.7
+
+def __getattr__(name):
+    """Ladda DocumentConverter först när den efterfrågas (PEP 562)"""
+    if name == 'DocumentConverter':
+        from docling.document_converter import DocumentConverter
+        return DocumentConverter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def create_converter():
+    """
+    Skapa en DocumentConverter, docling importeras först här.
 
-def create_ner_pipeline():
-    """Skapa och returnera en NER-pipeline som använder GPU om möjligt, annars CPU"""
-    from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
+    Om doclings modeller finns i det lokala modellagret (se model_store.py)
+    laddas de därifrån i stället för att hämtas vid första konverteringen.
+    """
+    from docling.document_converter import DocumentConverter
 
-    print("\nAnvänder engelsk NER-modell...")
+    artifacts_path = resolve_docling()
+    if artifacts_path is None:
+        return DocumentConverter()
 
-    # Använd den engelska NER-modellen
-    tokenizer = AutoTokenizer.from_pretrained("dslim/bert-large-NER", local_files_only=False)
-    model = AutoModelForTokenClassification.from_pretrained("dslim/bert-large-NER", local_files_only=False)
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import PdfFormatOption
 
-    # Försök att använda GPU om den är tillgänglig
-    device = 0 if torch.cuda.is_available() else -1
-    print("NER använder GPU" if device >= 0 else "NER använder CPU")
+    options = PdfPipelineOptions(artifacts_path=str(artifacts_path))
+    return DocumentConverter(format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=options)})
 
-    # Skapa pipeline med explicit modell och tokenizer
-    ner_pipeline = pipeline(
-        'ner',
-        model=model,
-        tokenizer=tokenizer,
-        device=device,
-        aggregation_strategy="simple"
-    )
+def create_ner_pipeline(backend=None, model=None):
+    """
+    Skapa och returnera en NER-pipeline.
+
+    Args:
+        backend: 'torch' (GPU om möjligt, annars CPU), 'onnx' eller 'onnx-int8'.
+            Default från ANONYMIZATION_NER_BACKEND, se ner_backends.py.
+        model: Namn i models.MODEL_REGISTRY, eller 'auto' för en ModelRouter
+            som väljer modell per dokument. Default från ANONYMIZATION_NER_MODEL.
+    """
+    model = selected_model(model)
+    if model == AUTO_MODEL:
+        return ModelRouter(backend=backend)
+    return load_pipeline(MODEL_REGISTRY[model], backend)
 
-    return ner_pipeline
+def ner_model_key(backend=None, model=None):
+    """
+    Identifierar modell och backend, t.ex. i cachenycklar (int8 ger något
+    andra scores)
+    """
+    model = selected_model(model)
+    model_id = AUTO_MODEL if model == AUTO_MODEL else MODEL_REGISTRY[model].model_id
+    return f"{model_id}:{selected_backend(backend)}"
 
 def remove_overlapping_entities(entities):
     """Ta bort överlappande entiteter, behåll den med högst score"""
     if not entities:
         return []
 
-    # Sortera entiteter efter score (högst först)
-    sorted_entities = sorted(entities, key=lambda x: x['score'], reverse=True)
-
-    # Lista för att hålla reda på vilka områden som redan är "täckta"
-    covered_ranges = []
-    filtered_entities = []
-
-    for entity in sorted_entities:
-        start = entity['start']
-        end = entity['end']
-
-        # Kontrollera om denna entitet överlappar med någon redan täckt
-        overlap = False
-        for cstart, cend in covered_ranges:
-            # Om det finns någon överlappning
-            if (start <= cend and end >= cstart):
-                overlap = True
-                break
-
-        if not overlap:
-            filtered_entities.append(entity)
-            covered_ranges.append((start, end))
+    # Behåll entiteterna med högst score bland de som överlappar
+    filtered_entities = resolve_overlaps(entities)
 
     # Sortera tillbaka efter position (bakifrån)
     return sorted(filtered_entities, key=lambda x: x['start'], reverse=True)
@@ -97,7 +121,15 @@ def merge_nearby_entities(entities, max_distance=2):
         return []
 
     # Sortera entiteterna efter startposition
-    sorted_entities = sorted(entities, key=lambda x: x['start'])
+    sorted_entities = []
+    for entity in sorted(entities, key=lambda x: x['start']):
+        # Hoppa över entiteter som ligger helt inom föregående entitet av samma typ,
+        # annars skulle ett ord kunna slås ihop med sin egen dubblett
+        if (sorted_entities and entity['end'] <= sorted_entities[-1]['end'] and
+                entity['entity_group'] == sorted_entities[-1]['entity_group']):
+            continue
+        sorted_entities.append(entity)
+
     merged_entities = []
 
     i = 0
@@ -129,38 +161,10 @@ def merge_nearby_entities(entities, max_distance=2):
 
     return merged_entities
 
-def censurering_text(text, ner_pipeline, confidence_threshold=0.5, callback=None):
+def censurering_text(text, ner_pipeline, confidence_threshold=0.5, callback=None, batch_size=8):
     """Identifiera och censurering alla NER med confidence över threshold"""
-    # Dela texten i mindre bitar för att hantera långa texter
-    chunk_size = 512
-    stride = 384  # Överlappning mellan chunks
-
-    # Behandla varje chunk
-    all_entities = []
-
-    # Gå igenom texten med överlappande fönster
-    for i in range(0, len(text), stride):
-        # Extrahera chunk och spara dess startposition
-        chunk = text[i:i+chunk_size]
-        chunk_start = i
-
-        if not chunk.strip():  # Hoppa över tomma chunks
-            continue
-
-        # Kör NER på den aktuella chunken
-        entities = ner_pipeline(chunk)
-
-        # Spara bara entiteter med tillräckligt hög confidence
-        for e in entities:
-            if e['score'] >= confidence_threshold:
-                # Anropa callback-funktionen om den är angiven
-                if callback:
-                    callback(e)
-
-                # Justera start/end positioner relativt till hela texten
-                e['start'] += chunk_start
-                e['end'] += chunk_start
-                all_entities.append(e)
+    # Kör NER i tokenfönster som skickas till pipelinen i batchar
+    all_entities = run_ner(text, ner_pipeline, confidence_threshold, callback, batch_size=batch_size)
 
     # Sammanslå närliggande entiteter
     merged_entities = merge_nearby_entities(all_entities)
@@ -168,22 +172,17 @@ def censurering_text(text, ner_pipeline, confidence_threshold=0.5, callback=None
     # Ta bort överlappande entiteter (behåll de med högst score)
     filtered_entities = remove_overlapping_entities(merged_entities)
 
-    # Ersätt alla entiteter med asterisker
-    censored_text = text
-    for entity in filtered_entities:
-        # Kontrollera att start/end positioner är inom textens gränser
-        start = max(0, min(entity['start'], len(text)))
-        end = max(0, min(entity['end'], len(text)))
-
-        if start >= end:
-            continue  # Ogiltig position
-
-        word = text[start:end]
-        censored = '*' * len(word)  # Skapa lika många asterisker som längden på ordet
-        censored_text = censored_text[:start] + censored + censored_text[end:]
+    # Ersätt alla entiteter med asterisker i ett pass
+    rendered = render_views(text, filtered_entities, {'censored': censored_replacement})
+    censored_text, _ = rendered['censored']
 
-        # Skriv ut vad som censurerades (för debugging)
-        print(f"Censurerat: '{word}' ({entity['entity_group']}) - confidence: {entity['score']:.2f}")
+    # Logga vad som censurerades (för debugging)
+    if logger.isEnabledFor(logging.DEBUG):
+        for entity in filtered_entities:
+            start = max(0, min(entity['start'], len(text)))
+            end = max(0, min(entity['end'], len(text)))
+            if start < end:
+                logger.debug(f"Censurerat: '{text[start:end]}' ({entity['entity_group']}) - confidence: {entity['score']:.2f}")
 
     # Returnera både den censurerade texten och entiteterna för att kunna skapa annoterad version
     return censored_text, filtered_entities
@@ -199,31 +198,7 @@ def censor_personal_data(text):
     - Censurerad text
     - Lista med alla censurerade enheter (för loggning)
     """
-    import re
-
     censored_items = []
-    censored_text = text
-
-    # 1. E-postadresser
-    # Format: namn@domän.tld
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
-
-    # 2. Telefonnummer (svenska format)
-    # Hanterar format som:
-    # 07X-XXX XX XX, 07XXXXXXXX, 07X XXX XX XX, +467XXXXXXXX, +46 7X XXX XX XX
-    phone_patterns = [
-        r'\b(?:\+46|0)(?:[\s-])?7[0-9](?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b',  # Mobilnummer
-        r'\b(?:\+46|0)(?:[\s-])?[1-9][0-9]{0,2}(?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b',  # Fasta nummer
-        r'\b(?:\+46|0)(?:[\s-])?[1-9](?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b',  # Växel/företag
-    ]
-
-    # 3. Personnummer
-    # Format: ÅÅÅÅMMDD-XXXX eller ÅÅMMDD-XXXX
-    # Även utan bindestreck
-    personal_id_patterns = [
-        r'\b[1-2][0-9]{3}(?:0[1-9]|1[0-2])(?:0[1-9]|[1-2][0-9]|3[0-1])[-]?[0-9]{4}\b',  # ÅÅÅÅMMDD-XXXX
-        r'\b(?:[0-9]{2})(?:0[1-9]|1[0-2])(?:0[1-9]|[1-2][0-9]|3[0-1])[-]?[0-9]{4}\b',   # ÅÅMMDD-XXXX
-    ]
 
     # Funktion för att censurering med asterisker
     def replace_with_stars(match):
@@ -231,16 +206,8 @@ def censor_personal_data(text):
         censored_items.append(matched_text)
         return '*' * len(matched_text)
 
-    # Censurering e-postadresser
-    censored_text = re.sub(email_pattern, replace_with_stars, censored_text)
-
-    # Censurering telefonnummer
-    for pattern in phone_patterns:
-        censored_text = re.sub(pattern, replace_with_stars, censored_text)
-
-    # Censurering personnummer
-    for pattern in personal_id_patterns:
-        censored_text = re.sub(pattern, replace_with_stars, censored_text)
+    # Censurera e-postadresser, telefonnummer och personnummer i ett pass
+    censored_text = PERSONAL_DATA_SCANNER.sub(replace_with_stars, text)
 
     return censored_text, censored_items
 
@@ -257,12 +224,6 @@ def create_censored_info_text(text, entities, personal_data_items=None):
     Returns:
         Text där känsliga ord är ersatta med beskrivande information
     """
-    # Skapa en kopia av originaltexten
-    info_text = text
-
-    # Positionsjusteringar när vi ersätter ord
-    offset = 0
-
     # Samla alla entiteter (NER och personuppgifter)
     all_entities = []
 
@@ -286,53 +247,24 @@ def create_censored_info_text(text, entities, personal_data_items=None):
             'score': score
         })
 
-    # Lägg till personuppgifter i listan om det finns några
+    # Lägg till alla förekomster av personuppgifterna i ett pass över texten
     if personal_data_items:
-        for item in personal_data_items:
-            # Hitta alla förekomster av denna uppgift i texten
-            pos = 0
-            while True:
-                pos = text.find(item, pos)
-                if pos == -1:
-                    break
-
-                all_entities.append({
-                    'start': pos,
-                    'end': pos + len(item),
-                    'word': item,
-                    'entity_type': 'PERSONUPPGIFT',
-                    'score': 1.0
-                })
-
-                pos += 1  # Fortsätt söka efter nästa förekomst
-
-    # Sortera entiteterna efter position (bakifrån för att undvika indexeringsproblem)
-    all_entities.sort(key=lambda x: x['start'], reverse=True)
-
-    # Ersätt entiteter med informativ text
-    for entity in all_entities:
-        start = entity['start']
-        end = entity['end']
-        word = entity['word']
-        entity_type = entity['entity_type']
-        score = entity['score']
-
-        # Justera positioner baserat på tidigare ändringar
-        adjusted_start = start + offset
-        adjusted_end = end + offset
-
-        # Skapa ersättningstext med beskrivande information
-        replacement = f"Censurerat: '{word}' ({entity_type}) - confidence: {score:.2f}"
+        matcher = DictionaryMatcher((item, 'PERSONUPPGIFT') for item in personal_data_items)
+        for start, end, entity_type in matcher.finditer(text):
+            all_entities.append({
+                'start': start,
+                'end': end,
+                'word': text[start:end],
+                'entity_type': entity_type,
+                'score': 1.0
+            })
 
-        # Ersätt i texten
-        info_text = (
-                info_text[:adjusted_start] +
-                replacement +
-                info_text[adjusted_end:]
-        )
+    # Överlappande entiteter kan inte ersättas båda, behåll den med högst score
+    all_entities = resolve_overlaps(all_entities)
 
-        # Uppdatera offset för nästa ersättning
-        offset += len(replacement) - (adjusted_end - adjusted_start)
+    # Ersätt entiteter med informativ text i ett pass
+    rendered = render_views(text, all_entities, {'info': info_replacement})
+    info_text, _ = rendered['info']
 
     return info_text
 
@@ -366,38 +298,22 @@ def identify_pii_subtype(text, entity_type):
     if base_type in ["name", "address"]:
         return base_type
 
-    # E-postadresser
-    if re.match(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b', text):
-        return "email"
+    # E-post, telefon, IP-adresser, kreditkort och personnummer
+    rule = classify_pii(text)
+    if rule is not None:
+        return rule.pii_type
 
-    # Telefonnummer (olika format)
-    if re.match(r'\b(?:\+46|0)(?:[\s-])?[0-9]{1,3}(?:[\s-])?[0-9]{2,3}(?:[\s-])?[0-9]{2,3}(?:[\s-])?[0-9]{2,3}\b', text):
-        return "phone"
-
-    # IP-adresser (IPv4)
-    if re.match(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', text):
-        return "ip"
-
-    # IP-adresser (IPv6)
-    if re.match(r'\b(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}\b', text):
-        return "ip"
-
-    # Kreditkort
-    if re.match(r'\b(?:\d{4}[- ]?){3}\d{4}\b', text):
-        return "credit-card"
-
-    # Personnummer (hanteras som "other" för att passa PII_TYPES)
-    if re.match(r'\b(?:\d{6,8})[-]?\d{4}\b', text):
-        return "other"  # Personnummer kategoriseras som "other"
+    # Namn- och adressregister från ANONYMIZATION_GAZETTEERS
+    gazetteer_type = classify_gazetteer(text)
+    if gazetteer_type is not None:
+        return gazetteer_type
 
     # Personnamn - om texten innehåller vanliga namndelar
-    common_names = ["johan", "andersson", "erik", "larsson", "svensson", "marie", "anna", "nils", "olsson", "karlsson"]
-    if any(name in text.lower() for name in common_names):
+    if any(name in text.lower() for name in COMMON_NAMES):
         return "name"
 
     # Adressindikationer
-    address_indicators = ["vägen", "gatan", "avenue", "street", "malmö", "stockholm", "göteborg", "köpenhamn", "oslo"]
-    if any(indicator in text.lower() for indicator in address_indicators):
+    if any(indicator in text.lower() for indicator in ADDRESS_INDICATORS):
         return "address"
 
     # Om vi inte kan identifiera en specifik undertyp, använd den mappade entitetstypen
@@ -483,18 +399,8 @@ def extract_entities_from_tagged_text(tagged_text):
             entity_type = "PER"  # Default till PER som kommer mapppas till "name"
 
             # Försök identifiera typ baserat på innehåll
-            if re.match(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b', word):
-                entity_type = "PERSONUPPGIFT"  # E-post
-            elif re.match(r'\b(?:\+46|0)(?:[\s-])?[0-9]{1,3}(?:[\s-])?[0-9]{2,3}(?:[\s-])?[0-9]{2,3}(?:[\s-])?[0-9]{2,3}\b', word):
-                entity_type = "PERSONUPPGIFT"  # Telefonnummer
-            elif re.match(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', word):
-                entity_type = "PERSONUPPGIFT"  # IP-adress (IPv4)
-            elif re.match(r'\b(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}\b', word):
-                entity_type = "PERSONUPPGIFT"  # IP-adress (IPv6)
-            elif re.match(r'\b(?:\d{4}[- ]?){3}\d{4}\b', word):
-                entity_type = "PERSONUPPGIFT"  # Kreditkort
-            elif re.match(r'\b(?:\d{6,8})[-]?\d{4}\b', word):
-                entity_type = "PERSONUPPGIFT"  # Personnummer
+            if classify_pii(word) is not None:
+                entity_type = "PERSONUPPGIFT"  # E-post, telefon, IP-adress, kreditkort eller personnummer
             elif any(word.lower().find(place) >= 0 for place in ['väg', 'gata', 'gatan', 'avenue', 'street', 'malmö', 'stockholm', 'göteborg']):
                 entity_type = "LOC"  # Adress om det verkar innehålla platsord
 
@@ -514,6 +420,10 @@ def generate_redactions_from_tagged(tagged_text):
     Generera redaktioner från taggad text genom att extrahera entiteter och bestämma typ.
     Detta säkerställer att vi använder exakt samma positioner som i taggningen.
 
+    Finns kvar för anropare som bara har den taggade texten. Med en
+    censurerings-plan är generate_redactions_from_plan snabbare och klarar
+    ord som innehåller '>'.
+
     Args:
         tagged_text: Den taggade texten med markerade ord
 
@@ -549,318 +459,372 @@ def generate_redactions_from_tagged(tagged_text):
 
     return redactions, original_text
 
-def main2(pdf_path, output_path):
-    # 1. Konvertera PDF till text
-    print("\n=== STEG 1: PDF-KONVERTERING ===")
+def generate_redactions_from_plan(plain_text, filtered_plan):
+    """
+    Generera redaktioner direkt från censurerings-planen, utan att gå via
+    taggad text.
 
-    # Om pdf_path inte är specificerad, använd default
-    if pdf_path is None:
-        pdf_path = Path("3.pdf")  # Använd relativ sökväg till filen i aktuell mapp
-    elif isinstance(pdf_path, str):
-        pdf_path = Path(pdf_path)
+    Ger samma redaktioner som generate_redactions_from_tagged på den taggade
+    vyen av samma plan (confidence avrundas till två decimaler som i taggen),
+    men utan att tolka om hela texten med regex.
 
-    if not pdf_path.exists():
-        print(f"ERROR: Filen '{pdf_path}' hittades inte!")
-        return
+    Args:
+        plain_text: Originaltexten som planen gäller
+        filtered_plan: Icke-överlappande spann (start, end, entity_type, score)
 
-    print(f"Konverterar PDF: {pdf_path.absolute()}")
-    converter = DocumentConverter()
+    Returns:
+        Lista med redaktioner som följer schemas.ts, sorterad efter position
+    """
+    redactions = []
 
-    try:
-        result = converter.convert(pdf_path)
+    for item, start, end in clip_spans(plain_text, filtered_plan):
+        word = plain_text[start:end]
 
-        # Hämta både text och markdown från docling
-        plain_text = result.document.export_to_text()
-        markdown_text = result.document.export_to_markdown()
+        redactions.append({
+            "id": str(uuid.uuid4()),
+            "type": identify_pii_subtype(word, item['entity_type']),
+            "confidence": round(item['score'], 2),
+            "start": start,
+            "end": end,
+            "replacement": "*" * len(word),
+            "text": word
+        })
 
-        print(f"PDF konverterad: {len(result.document.pages)} sidor")
+    return redactions
 
-        # 2. Skapa en lista med alla ord som ska censureras/taggas
-        print("\n=== STEG 2: IDENTIFIERA PERSONUPPGIFTER OCH ENTITETER ===")
+def find_ner_entities(plain_text, ner_pipeline, confidence_threshold=NER_CONFIDENCE_THRESHOLD, batch_size=8,
+                      metrics=None):
+    """
+    Kör NER på texten och returnera entiteterna i censurerings-planens format.
 
-        # Lista för att hålla alla positioner och ord som ska censureras
-        censoring_plan = []
+    Args:
+        plain_text: Texten som ska analyseras
+        ner_pipeline: NER-pipeline från create_ner_pipeline
+        confidence_threshold: Lägsta score för NER-entiteter
+        batch_size: Antal tokenfönster per forward pass
+        metrics: Metrics som tid och räknare läggs till i
 
-        # 2a. Identifiera personuppgifter först
-        # Detta innebär att vi letar efter personuppgifter i originaltexten
-        personal_data = []
+    Returns:
+        Lista med spann (start, end, word, entity_type, score)
+    """
+    if metrics is None:
+        metrics = Metrics()
+    logger.info("=== STEG 3: NER-ANALYS ===")
 
-        # E-postadresser
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
-        for match in re.finditer(email_pattern, plain_text):
-            personal_data.append({
-                'start': match.start(),
-                'end': match.end(),
-                'word': match.group(0),
-                'entity_type': 'PERSONUPPGIFT',
-                'score': 1.0
-            })
+    # Kör NER i tokenfönster som skickas till pipelinen i batchar
+    with metrics.stage('ner'):
+        all_entities = run_ner(plain_text, ner_pipeline, confidence_threshold, batch_size=batch_size,
+                               metrics=metrics)
+        return ner_entities_to_plan(plain_text, all_entities, metrics)
 
-        # Telefonnummer (svenska format)
-        phone_patterns = [
-            r'\b(?:\+46|0)(?:[\s-])?7[0-9](?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b',  # Mobilnummer
-            r'\b(?:\+46|0)(?:[\s-])?[1-9][0-9]{0,2}(?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b',  # Fasta nummer
-            r'\b(?:\+46|0)(?:[\s-])?[1-9](?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b',  # Växel/företag
-        ]
-
-        for pattern in phone_patterns:
-            for match in re.finditer(pattern, plain_text):
-                personal_data.append({
-                    'start': match.start(),
-                    'end': match.end(),
-                    'word': match.group(0),
-                    'entity_type': 'PERSONUPPGIFT',
-                    'score': 1.0
-                })
-
-        # Personnummer
-        personal_id_patterns = [
-            r'\b[1-2][0-9]{3}(?:0[1-9]|1[0-2])(?:0[1-9]|[1-2][0-9]|3[0-1])[-]?[0-9]{4}\b',  # ÅÅÅÅMMDD-XXXX
-            r'\b(?:[0-9]{2})(?:0[1-9]|1[0-2])(?:0[1-9]|[1-2][0-9]|3[0-1])[-]?[0-9]{4}\b',   # ÅÅMMDD-XXXX
-        ]
-
-        for pattern in personal_id_patterns:
-            for match in re.finditer(pattern, plain_text):
-                personal_data.append({
-                    'start': match.start(),
-                    'end': match.end(),
-                    'word': match.group(0),
-                    'entity_type': 'PERSONUPPGIFT',
-                    'score': 1.0
-                })
-
-        # IP-adresser (IPv4)
-        ip_v4_pattern = r'\b(?:\d{1,3}\.){3}\d{1,3}\b'
-        for match in re.finditer(ip_v4_pattern, plain_text):
-            personal_data.append({
-                'start': match.start(),
-                'end': match.end(),
-                'word': match.group(0),
-                'entity_type': 'PERSONUPPGIFT',
-                'score': 1.0
-            })
+def ner_entities_to_plan(plain_text, all_entities, metrics=None):
+    """
+    Slå ihop och filtrera entiteter från run_ner och gör om dem till spann i
+    censurerings-planens format.
 
-        # IP-adresser (IPv6)
-        ip_v6_pattern = r'\b(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}\b'
-        for match in re.finditer(ip_v6_pattern, plain_text):
-            personal_data.append({
-                'start': match.start(),
-                'end': match.end(),
-                'word': match.group(0),
-                'entity_type': 'PERSONUPPGIFT',
-                'score': 1.0
-            })
+    Används av find_ner_entities, och direkt när NER körts för flera texter
+    på en gång (se run_ner_many i chunking.py).
 
-        # Kreditkort (förenklade mönster för vanliga format)
-        credit_card_pattern = r'\b(?:\d{4}[- ]?){3}\d{4}\b'
-        for match in re.finditer(credit_card_pattern, plain_text):
-            personal_data.append({
-                'start': match.start(),
-                'end': match.end(),
-                'word': match.group(0),
-                'entity_type': 'PERSONUPPGIFT',
-                'score': 1.0
-            })
+    Returns:
+        Lista med spann (start, end, word, entity_type, score)
+    """
+    if metrics is None:
+        metrics = Metrics()
 
-        # Lägg till personuppgifter i censurerings-planen
-        censoring_plan.extend(personal_data)
+    # Sammanslå närliggande entiteter och ta bort överlapp
+    merged_entities = merge_nearby_entities(all_entities)
+    filtered_entities = remove_overlapping_entities(merged_entities)
 
-        if personal_data:
-            print(f"Hittade {len(personal_data)} personuppgifter:")
-            for i, item in enumerate(personal_data[:5]):  # Visa max 5 exempel
-                print(f"  - '{item['word']}'")
-            if len(personal_data) > 5:
-                print(f"  ...och {len(personal_data) - 5} till")
-        else:
-            print("Inga personuppgifter hittades med regex-sökning.")
+    metrics.count('ner_entities', len(all_entities))
+    metrics.count('ner_entities_merged', len(all_entities) - len(merged_entities))
+    metrics.count('ner_overlaps_dropped', len(merged_entities) - len(filtered_entities))
 
-        # 2b. Kör NER för att identifiera entiteter
-        print("\n=== STEG 3: NER-ANALYS ===")
-        ner_pipeline = create_ner_pipeline()
+    # Lägg till NER-entiteter i planen
+    plan = []
+    for entity in filtered_entities:
+        start = max(0, min(entity['start'], len(plain_text)))
+        end = max(0, min(entity['end'], len(plain_text)))
 
-        # Dela texten i mindre bitar för att hantera långa texter
-        # och identifiera entiteter
-        all_entities = []
-        chunk_size = 512
-        stride = 384  # Överlappning mellan chunks
+        if start >= end:
+            continue  # Ogiltig position
 
-        # Behandla texten i överlappande fönster
-        for i in range(0, len(plain_text), stride):
-            chunk = plain_text[i:i+chunk_size]
-            chunk_start = i
+        word = plain_text[start:end]
+        plan.append({
+            'start': start,
+            'end': end,
+            'word': word,
+            'entity_type': entity['entity_group'],
+            'score': entity['score']
+        })
 
-            if not chunk.strip():  # Hoppa över tomma chunks
-                continue
+        # Logga vad som identifierades (för debugging)
+        logger.debug(f"Identifierat: '{word}' ({entity['entity_group']}) - confidence: {entity['score']:.2f}")
 
-            # Kör NER på den aktuella chunken
-            entities = ner_pipeline(chunk)
+    return plan
 
-            # Spara bara entiteter med tillräckligt hög confidence
-            for e in entities:
-                if e['score'] >= 0.7:  # Använd tröskelvärde 0.7
-                    # Justera start/end positioner relativt till hela texten
-                    e['start'] += chunk_start
-                    e['end'] += chunk_start
-                    all_entities.append(e)
+def build_censoring_plan(plain_text, ner_pipeline, confidence_threshold=NER_CONFIDENCE_THRESHOLD, batch_size=8,
+                         metrics=None, ner_entities=None, extra_spans=None):
+    """
+    Hitta personuppgifter (regex) och entiteter (NER) i en text och lös upp
+    överlapp mellan dem.
 
-        # Sammanslå närliggande entiteter och ta bort överlapp
-        merged_entities = merge_nearby_entities(all_entities)
-        filtered_entities = remove_overlapping_entities(merged_entities)
+    Args:
+        plain_text: Texten som ska analyseras
+        ner_pipeline: NER-pipeline från create_ner_pipeline, eller None för att
+            bara köra regex-steget (torch och transformers laddas då aldrig)
+        confidence_threshold: Lägsta score för NER-entiteter
+        batch_size: Antal tokenfönster per forward pass i NER-steget
+        metrics: Metrics som tid och räknare läggs till i
+        ner_entities: Entiteter från en NER-körning som redan gjorts för
+            texten (t.ex. med run_ner_many), används i stället för ner_pipeline
+        extra_spans: Spann från andra källor (t.ex. kända identifierare för en
+            tabellrad) som läggs till innan överlapp löses upp
 
-        # Lägg till NER-entiteter i censurerings-planen
-        for entity in filtered_entities:
-            start = max(0, min(entity['start'], len(plain_text)))
-            end = max(0, min(entity['end'], len(plain_text)))
+    Returns:
+        Lista med icke-överlappande spann (start, end, word, entity_type, score)
+        sorterad efter startposition
+    """
+    if metrics is None:
+        metrics = Metrics()
 
-            if start >= end:
-                continue  # Ogiltig position
+    # 2. Skapa en lista med alla ord som ska censureras/taggas
+    logger.info("=== STEG 2: IDENTIFIERA PERSONUPPGIFTER OCH ENTITETER ===")
 
-            word = plain_text[start:end]
-            censoring_plan.append({
-                'start': start,
-                'end': end,
-                'word': word,
-                'entity_type': entity['entity_group'],
-                'score': entity['score']
-            })
+    # Lista för att hålla alla positioner och ord som ska censureras
+    censoring_plan = []
 
-            # Skriv ut vad som censurerades (för debugging)
-            print(f"Identifierat: '{word}' ({entity['entity_group']}) - confidence: {entity['score']:.2f}")
+    # 2a. Identifiera personuppgifter först
+    # Detta innebär att vi letar efter personuppgifter i originaltexten:
+    # e-post, telefonnummer, personnummer, IP-adresser och kreditkort i ett pass
+    with metrics.stage('regex'):
+        personal_data = PII_SCANNER.scan(plain_text)
+    metrics.count('regex_matches', len(personal_data))
 
-        # 3. Skapa den censurerade och taggade texten från samma censurerings-plan
-        print("\n=== STEG 4: CENSURERING OCH TAGGNING ===")
+    # Lägg till personuppgifter i censurerings-planen
+    censoring_plan.extend(personal_data)
 
-        # Ta bort överlappande enheter genom att sortera efter score och sedan position
-        censoring_plan.sort(key=lambda x: (-x['score'], x['start']))
+    if personal_data:
+        logger.info(f"Hittade {len(personal_data)} personuppgifter")
+        for item in personal_data:
+            logger.debug(f"  - '{item['word']}'")
+    else:
+        logger.info("Inga personuppgifter hittades med regex-sökning.")
+
+    # Namn och adresser ur ordlistorna (om några är konfigurerade)
+    gazetteers = load_gazetteers()
+    if gazetteers:
+        with metrics.stage('gazetteer'):
+            gazetteer_spans = find_gazetteer_spans(plain_text, gazetteers)
+        metrics.count('gazetteer_matches', len(gazetteer_spans))
+        censoring_plan.extend(gazetteer_spans)
+
+    if extra_spans:
+        censoring_plan.extend(extra_spans)
+
+    # 2b. Kör NER för att identifiera entiteter (hoppas över i regex-läget)
+    if ner_entities is not None:
+        censoring_plan.extend(ner_entities_to_plan(plain_text, ner_entities, metrics))
+    elif ner_pipeline is not None:
+        censoring_plan.extend(find_ner_entities(plain_text, ner_pipeline, confidence_threshold, batch_size,
+                                                metrics=metrics))
+
+    if ner_pipeline is not None or ner_entities is not None:
+        # 2c. Sprid säkra träffar till alla förekomster i texten
+        with metrics.stage('propagate'):
+            propagated = propagate(plain_text, censoring_plan)
+        metrics.count('propagated', len(propagated))
+        censoring_plan.extend(propagated)
+
+    # Ta bort överlappande enheter genom att sortera efter score och sedan position
+    with metrics.stage('resolve'):
+        filtered_plan = resolve_overlaps(censoring_plan, key=lambda x: (-x['score'], x['start']))
+        filtered_plan.sort(key=lambda x: x['start'])
+    metrics.count('overlaps_dropped', len(censoring_plan) - len(filtered_plan))
+
+    return filtered_plan
+
+def render_plan(plain_text, filtered_plan, metrics=None, render_tagged=True):
+    """
+    Skapa censurerad text, taggad text och JSON-redaktioner från en plan.
 
-        # Lista för att hålla reda på vilka områden som redan är "täckta"
-        covered_ranges = []
-        filtered_plan = []
+    Args:
+        plain_text: Originaltexten
+        filtered_plan: Icke-överlappande spann från build_censoring_plan
+        metrics: Metrics som tid och räknare läggs till i
+        render_tagged: Bygg även den taggade vyen (annars blir tagged_text None)
 
-        for item in censoring_plan:
-            start = item['start']
-            end = item['end']
+    Returns:
+        (censored_text, tagged_text, redactions)
+    """
+    if metrics is None:
+        metrics = Metrics()
 
-            # Kontrollera om denna position överlappar med någon redan täckt
-            overlap = False
-            for cstart, cend in covered_ranges:
-                # Om det finns någon överlappning
-                if (start <= cend and end >= cstart):
-                    overlap = True
-                    break
+    views = {'censored': censored_replacement}
+    if render_tagged:
+        views['tagged'] = tagged_replacement
 
-            if not overlap:
-                filtered_plan.append(item)
-                covered_ranges.append((start, end))
+    # Skapa censurerad och eventuellt taggad text i ett enda pass
+    with metrics.stage('render'):
+        rendered = render_views(plain_text, filtered_plan, views)
+        censored_text, _ = rendered['censored']
+        tagged_text = rendered['tagged'][0] if render_tagged else None
 
-        # Sortera planen efter position (bakifrån för att undvika indexförskjutningar)
-        filtered_plan.sort(key=lambda x: x['start'], reverse=True)
+    # Redaktionerna byggs direkt från planen med samma spann som vyerna
+    with metrics.stage('json'):
+        redactions = generate_redactions_from_plan(plain_text, filtered_plan)
+    metrics.count('redactions', len(redactions))
 
-        # Skapa både censurerad och taggad text i en operation
-        censored_text = plain_text
-        tagged_text = plain_text
+    return censored_text, tagged_text, redactions
 
-        # Applicera censurering och taggning
-        for item in filtered_plan:
-            start = item['start']
-            end = item['end']
-            word = item['word']
+def analyze_text(plain_text, ner_pipeline=None, confidence_threshold=NER_CONFIDENCE_THRESHOLD, batch_size=8,
+                 metrics=None):
+    """
+    Analysera en redan extraherad text och returnera samma fält som main2
+    (utom markdown).
 
-            # Skapa ersättningar
-            censored = '*' * len(word)  # Censurerad version (stjärnor)
+    Utan ner_pipeline körs bara regex-steget, vilket är den snabba vägen som
+    aldrig importerar torch, transformers eller docling.
 
-            # Taggad version med både entitetstyp och confidence score
-            tagged = f"<{word}> ({item['entity_type']}) ({item['score']:.2f})"
+    Returns:
+        Dict med original_text, censored_text, tagged_text och redactions
+    """
+    filtered_plan = build_censoring_plan(plain_text, ner_pipeline, confidence_threshold, batch_size, metrics)
+    censored_text, tagged_text, redactions = render_plan(plain_text, filtered_plan, metrics)
+
+    return {
+        "original_text": plain_text,
+        "censored_text": censored_text,
+        "tagged_text": tagged_text,
+        "redactions": redactions,
+    }
 
-            # Ersätt i respektive version
-            censored_text = censored_text[:start] + censored + censored_text[end:]
-            tagged_text = tagged_text[:start] + tagged + tagged_text[end:]
+def main2(pdf_path, output_path=None, ner_pipeline=None, converter=None, batch_size=8,
+          confidence_threshold=NER_CONFIDENCE_THRESHOLD, metrics=None):
+    """
+    Konvertera en PDF och ta fram censurerad text, taggad text och redaktioner.
 
-            # Logga för användaren
-            print(f"Censurerat/taggat: '{word}' ({item['entity_type']}) - confidence: {item['score']:.2f}")
+    Args:
+        pdf_path: Sökväg till PDF-filen
+        output_path: Fil där originaltexten sparas (hoppas över om None)
+        ner_pipeline: Färdigladdad NER-pipeline (skapas om den inte anges)
+        converter: Färdig DocumentConverter (skapas om den inte anges)
+        batch_size: Antal tokenfönster per forward pass i NER-steget
+        confidence_threshold: Lägsta score för NER-entiteter
+        metrics: Metrics som tid per steg och räknare läggs till i (skapas
+            om den inte anges och rapporteras enligt ANONYMIZATION_METRICS)
 
-        # 4. Generera JSON-redaktioner från taggad text
-        print("\n=== STEG 4.5: GENERERA JSON-REDAKTIONER ===")
+    Returns:
+        Dict med texter, markdown och redaktioner, eller None vid fel
+    """
+    if metrics is None:
+        metrics = Metrics()
 
-        # Extrahera redaktioner direkt från taggad text för att säkerställa
-        # att vi använder exakt samma positioner och ord
-        redactions, extracted_text = generate_redactions_from_tagged(tagged_text)
+    # 1. Konvertera PDF till text
+    logger.info("=== STEG 1: PDF-KONVERTERING ===")
 
-        # Visa information om extraherade redaktioner
-        print(f"Extraherade {len(redactions)} redaktioner från taggad text")
+    # Om pdf_path inte är specificerad, använd default
+    if pdf_path is None:
+        pdf_path = Path("3.pdf")  # Använd relativ sökväg till filen i aktuell mapp
+    elif isinstance(pdf_path, str):
+        pdf_path = Path(pdf_path)
 
-        # 5. Skapa censurerad markdown också
-        # Extrahera text från markdown
-        from bs4 import BeautifulSoup
+    if not pdf_path.exists():
+        logger.error(f"ERROR: Filen '{pdf_path}' hittades inte!")
+        return
 
-        def extract_plain_text_from_markdown(markdown):
-            # För enkel markdown, ta bort vanliga markörer
-            text = markdown.replace('#', ' ').replace('*', ' ').replace('_', ' ')
-            text = text.replace('```', ' ').replace('`', ' ')
-            text = text.replace('>', ' ')
+    logger.info(f"Konverterar PDF: {pdf_path.absolute()}")
+    if converter is None:
+        converter = create_converter()
 
-            # Ta bort alla HTML-taggar med BeautifulSoup om det finns
-            if '<' in text and '>' in text:
-                try:
-                    soup = BeautifulSoup(text, 'html.parser')
-                    text = soup.get_text()
-                except:
-                    pass  # Fallback om det inte finns BeautifulSoup
+    try:
+        with profiling(metrics, pdf_path.stem):
+            result = _process_pdf(pdf_path, output_path, ner_pipeline, converter, batch_size,
+                                  confidence_threshold, metrics)
+    except Exception as e:
+        logger.exception(f"Ett fel uppstod vid bearbetning av PDF: {e}")
+        metrics.count('errors')
+        result = None
 
-            return text
+    report(metrics, pdf=str(pdf_path))
+    return result
 
-        markdown_censored = markdown_text
-        markdown_plain = extract_plain_text_from_markdown(markdown_text)
+def _process_pdf(pdf_path, output_path, ner_pipeline, converter, batch_size, confidence_threshold, metrics):
+    """Stegen i main2 efter att indata kontrollerats"""
+    with metrics.stage('convert'):
+        result = converter.convert(pdf_path)
 
-        # För varje censurerat ord, försök censurerad det i markdown också
+        # Hämta både text och markdown från docling
+        plain_text = result.document.export_to_text()
+        markdown_text = result.document.export_to_markdown()
+
+    metrics.count('pages', len(result.document.pages))
+    metrics.count('chars', len(plain_text))
+    logger.info(f"PDF konverterad: {len(result.document.pages)} sidor")
+
+    if ner_pipeline is None:
+        ner_pipeline = create_ner_pipeline()
+
+    # 2-3. Identifiera personuppgifter och entiteter
+    filtered_plan = build_censoring_plan(plain_text, ner_pipeline, confidence_threshold, batch_size, metrics)
+
+    # 3. Skapa den censurerade och taggade texten från samma censurerings-plan
+    logger.info("=== STEG 4: CENSURERING OCH TAGGNING ===")
+
+    # Sortera planen efter position (bakifrån för att undvika indexförskjutningar)
+    filtered_plan.sort(key=lambda x: x['start'], reverse=True)
+
+    # Logga för användaren
+    if logger.isEnabledFor(logging.DEBUG):
         for item in filtered_plan:
-            word = item['word']
-            if len(word) >= 3:  # Bara ersätt ord som är minst 3 tecken
-                markdown_censored = markdown_censored.replace(word, '*' * len(word))
+            logger.debug(f"Censurerat/taggat: '{item['word']}' ({item['entity_type']}) - confidence: {item['score']:.2f}")
 
-        # 6. Spara resultaten
-        print("\n=== STEG 5: SPARA RESULTAT ===")
+    # 4. Skapa censurerad och taggad text och generera JSON-redaktioner
+    logger.info("=== STEG 4.5: GENERERA JSON-REDAKTIONER ===")
+    censored_text, tagged_text, redactions = render_plan(plain_text, filtered_plan, metrics)
 
+    # Visa information om extraherade redaktioner
+    logger.info(f"Extraherade {len(redactions)} redaktioner från taggad text")
 
-        # Spara originaltexten
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(plain_text)
+    # 5. Skapa censurerad markdown också
+    with metrics.stage('markdown'):
+        # Projicera spannen in i markdown via dokumentmodellen i stället för
+        # att ersätta varje ord överallt i texten
+        offset_map = build_offset_map(result.document, plain_text, markdown_text)
+        markdown_ranges = project_spans(plain_text, filtered_plan, offset_map, markdown_text)
+        markdown_censored = censor_markdown(markdown_text, markdown_ranges)
 
+    # 6. Spara resultaten
+    logger.info("=== STEG 5: SPARA RESULTAT ===")
 
+    # Spara originaltexten
+    if output_path is not None:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(plain_text)
 
-        # 7. Visa exempelutdrag
-        print("\nExempel på censurerad text:")
-        print("-" * 50)
-        print(censored_text[:500] + "..." if len(censored_text) > 500 else censored_text)
-        print("-" * 50)
+    # 7. Visa exempelutdrag
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Exempel på censurerad text:\n" + "-" * 50)
+        logger.debug(censored_text[:500] + "..." if len(censored_text) > 500 else censored_text)
+        logger.debug("-" * 50)
 
-        print("\nExempel på taggad text:")
-        print("-" * 50)
-        print(tagged_text[:500] + "..." if len(tagged_text) > 500 else tagged_text)
-        print("-" * 50)
+        logger.debug("Exempel på taggad text:\n" + "-" * 50)
+        logger.debug(tagged_text[:500] + "..." if len(tagged_text) > 500 else tagged_text)
+        logger.debug("-" * 50)
 
         # Visa JSON-exempel på det exakta formatet
-        print("\nExempel på JSON redaktioner:")
-        print("-" * 50)
+        logger.debug("Exempel på JSON redaktioner:\n" + "-" * 50)
         if redactions:
             example_json = json.dumps(redactions[:3], indent=2, ensure_ascii=False)
-            print(example_json + "..." if len(redactions) > 3 else example_json)
+            logger.debug(example_json + "..." if len(redactions) > 3 else example_json)
         else:
-            print("Inga redaktioner hittades.")
-        print("-" * 50)
-
-
-        return {
-            "original_text": plain_text,
-            "censored_text": censored_text,
-            "original_markdown": markdown_text,
-            "censored_markdown": markdown_censored,
-            "tagged_text": tagged_text,
-            "redactions": redactions,
-        }
-
-    except Exception as e:
-        print(f"Ett fel uppstod vid bearbetning av PDF: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+            logger.debug("Inga redaktioner hittades.")
+        logger.debug("-" * 50)
+
+    return {
+        "original_text": plain_text,
+        "censored_text": censored_text,
+        "original_markdown": markdown_text,
+        "censored_markdown": markdown_censored,
+        "tagged_text": tagged_text,
+        "redactions": redactions,
+    }
@@ -0,0 +1,227 @@
+"""
+Tokenbaserad uppdelning av text i fönster för NER.
+
+I stället för att dela texten i fasta teckenfönster används tokenizerns
+offset-mappning (return_overflowing_tokens + stride) så att varje fönster
+fyller modellens kontext på 512 tokens. Fönstrens gränser justeras till
+ordgränser så att inga ord delas, och alla fönster skickas till pipelinen
+som en lista så att den kan köra dem i batchar.
+"""
+from contextlib import ExitStack
+
+
+def _is_word_boundary(text, pos):
+    """Sant om positionen inte ligger mitt i ett ord"""
+    if pos <= 0 or pos >= len(text):
+        return True
+    return not (text[pos - 1].isalnum() and text[pos].isalnum())
+
+
+def token_windows(text, tokenizer, max_length=512, stride=128):
+    """
+    Dela texten i överlappande fönster som vart och ett ryms i max_length tokens.
+
+    Args:
+        text: Texten som ska delas upp
+        tokenizer: En snabb (fast) tokenizer med stöd för offset-mappning
+        max_length: Max antal tokens per fönster (inklusive specialtokens)
+        stride: Antal tokens som överlappar mellan två fönster
+
+    Returns:
+        Lista med (start, end) teckenpositioner för varje fönster
+    """
+    if not text.strip():
+        return []
+
+    encoding = tokenizer(
+        text,
+        return_offsets_mapping=True,
+        return_overflowing_tokens=True,
+        truncation=True,
+        max_length=max_length,
+        stride=stride,
+    )
+
+    windows = []
+    offset_mappings = encoding['offset_mapping']
+    last = len(offset_mappings) - 1
+
+    for index, offsets in enumerate(offset_mappings):
+        # Specialtokens ([CLS], [SEP]) har offset (0, 0)
+        tokens = [(start, end) for start, end in offsets if end > start]
+        if not tokens:
+            continue
+
+        # Flytta fönstrets start till första token som börjar ett ord
+        start = 0 if index == 0 else next(
+            (s for s, _ in tokens if _is_word_boundary(text, s)), tokens[0][0]
+        )
+
+        # Flytta fönstrets slut till sista token som avslutar ett ord
+        end = len(text) if index == last else next(
+            (e for _, e in reversed(tokens) if _is_word_boundary(text, e)), tokens[-1][1]
+        )
+
+        if start < end:
+            windows.append((start, end))
+
+    return windows
+
+
+def reconcile_windows(windows, window_entities):
+    """
+    Slå ihop entiteter från överlappande fönster till en lista utan dubbletter.
+
+    En entitet i ett överlapp hittas oftast i båda fönstren. Den behålls bara
+    från det fönster där den ligger längst från fönstrets kant, vilket är
+    samma sak som att överlappet delas vid sin mittpunkt och varje fönster
+    äger sin halva. Exakta dubbletter tas bort med ett hash-set.
+
+    Args:
+        windows: Lista med (start, end) för varje fönster, sorterad efter start
+        window_entities: Lista med entiteter per fönster, med positioner
+            relativt till hela texten
+
+    Returns:
+        Lista med entiteter sorterad efter startposition
+    """
+    # Gränser för vilket teckenintervall varje fönster äger
+    cuts = []
+    for (_, end), (next_start, _) in zip(windows, windows[1:]):
+        cuts.append((next_start + end) / 2 if next_start < end else next_start)
+    lower_bounds = [float('-inf')] + cuts
+    upper_bounds = cuts + [float('inf')]
+
+    seen = set()
+    reconciled = []
+    for lower, upper, entities in zip(lower_bounds, upper_bounds, window_entities):
+        for e in entities:
+            # Entiteten tillhör fönstret som äger dess mittpunkt
+            middle = (e['start'] + e['end']) / 2
+            if not lower <= middle < upper:
+                continue
+
+            key = (e['start'], e['end'], e['entity_group'])
+            if key in seen:
+                continue
+            seen.add(key)
+            reconciled.append(e)
+
+    reconciled.sort(key=lambda x: x['start'])
+    return reconciled
+
+
+def run_ner(text, ner_pipeline, confidence_threshold=0.5, callback=None,
+            batch_size=8, max_length=512, stride=128, metrics=None):
+    """
+    Kör NER över hela texten i tokenfönster och returnera entiteter med
+    positioner relativt till hela texten.
+
+    Args:
+        text: Texten som ska analyseras
+        ner_pipeline: NER-pipeline från create_ner_pipeline
+        confidence_threshold: Lägsta score för att en entitet ska behållas
+        callback: Anropas för varje entitet som passerar tröskeln
+        batch_size: Antal fönster per forward pass
+        max_length: Max antal tokens per fönster
+        stride: Antal tokens som överlappar mellan fönster
+        metrics: Metrics där antalet fönster räknas (valfritt)
+
+    Om ner_pipeline är en models.ModelRouter lånas modellen för texten först,
+    och modellens egen max_length och tröskel används.
+
+    Returns:
+        Lista med entiteter (entity_group, score, start, end, word), utan
+        dubbletter från överlappen mellan fönstren
+    """
+    if hasattr(ner_pipeline, 'lease'):
+        # Modellen lånas under hela körningen så att routern inte stänger den
+        with ner_pipeline.lease(text) as (config, model_pipeline):
+            if metrics is not None:
+                metrics.count('ner_model_' + config.name.replace('-', '_'))
+            return run_ner(text, model_pipeline, config.threshold, callback, batch_size,
+                           config.max_length, stride, metrics)
+
+    windows = token_windows(text, ner_pipeline.tokenizer, max_length, stride)
+    if metrics is not None:
+        metrics.count('ner_chunks', len(windows))
+    if not windows:
+        return []
+
+    chunks = [text[start:end] for start, end in windows]
+    outputs = ner_pipeline(chunks, batch_size=batch_size)
+    return _collect_entities(windows, outputs, confidence_threshold, callback)
+
+
+def run_ner_many(texts, ner_pipeline, confidence_threshold=0.5, batch_size=8,
+                 max_length=512, stride=128, metrics=None):
+    """
+    Kör NER över flera texter i samma anrop till pipelinen.
+
+    Fönstren från alla texter skickas i en lista, så många korta texter (t.ex.
+    celler i en tabell) fyller batcharna i stället för att ge ett forward pass
+    var. Med en models.ModelRouter grupperas texterna efter vald modell.
+
+    Returns:
+        Lista med entiteter per text, i samma format som run_ner
+    """
+    results = [[] for _ in texts]
+
+    if hasattr(ner_pipeline, 'lease'):
+        with ExitStack() as leases:
+            groups = {}
+            for index, text in enumerate(texts):
+                config, model_pipeline = leases.enter_context(ner_pipeline.lease(text))
+                groups.setdefault(config.name, (config, model_pipeline, []))[2].append(index)
+            return _run_groups(texts, groups, batch_size, stride, metrics)
+
+    text_windows = [token_windows(text, ner_pipeline.tokenizer, max_length, stride) for text in texts]
+    chunks = [text[start:end] for text, windows in zip(texts, text_windows) for start, end in windows]
+    if metrics is not None:
+        metrics.count('ner_chunks', len(chunks))
+    if not chunks:
+        return results
+
+    outputs = ner_pipeline(chunks, batch_size=batch_size)
+
+    position = 0
+    for index, windows in enumerate(text_windows):
+        if windows:
+            results[index] = _collect_entities(windows, outputs[position:position + len(windows)],
+                                               confidence_threshold)
+            position += len(windows)
+
+    return results
+
+
+def _run_groups(texts, groups, batch_size, stride, metrics):
+    """Kör run_ner_many per modell för texter som grupperats av en ModelRouter"""
+    results = [[] for _ in texts]
+    for config, model_pipeline, indices in groups.values():
+        if metrics is not None:
+            metrics.count('ner_model_' + config.name.replace('-', '_'), len(indices))
+        entities = run_ner_many([texts[i] for i in indices], model_pipeline, config.threshold,
+                                batch_size, config.max_length, stride, metrics)
+        for index, text_entities in zip(indices, entities):
+            results[index] = text_entities
+    return results
+
+
+def _collect_entities(windows, outputs, confidence_threshold, callback=None):
+    """Filtrera fönstrens entiteter på tröskeln och flytta dem till hela textens positioner"""
+    window_entities = []
+    for (chunk_start, _), entities in zip(windows, outputs):
+        kept = []
+        for e in entities:
+            if e['score'] >= confidence_threshold:
+                # Anropa callback-funktionen om den är angiven
+                if callback:
+                    callback(e)
+
+                # Justera start/end positioner relativt till hela texten
+                e['start'] += chunk_start
+                e['end'] += chunk_start
+                kept.append(e)
+        window_entities.append(kept)
+
+    return reconcile_windows(windows, window_entities)
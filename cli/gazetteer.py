@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Stora ordlistor (t.ex. namn- och gaturegister) som minnesmappade index.
+
+En ordlista kompileras en gång till en indexfil: varje post viks (gemener,
+utan diakritiska tecken, blanksteg normaliserade) och hashas med BLAKE2b
+till 64 bitar, och hasharna läggs i en hashtabell med öppen adressering
+(linjär sondering, högst halvfull). Vid körning mappas filen in med mmap,
+så en uppslagning är en hash och i regel en enda läsning i tabellen, och
+flera arbetsprocesser delar samma sidor i sidcachen. Med 64-bitars hashar
+är risken för en falsk träff försumbar även för register med miljontals
+poster.
+
+Indexfilerna som ska användas anges i ANONYMIZATION_GAZETTEERS (separerade
+med os.pathsep). De används av identify_pii_subtype och som en egen källa
+till spann i build_censoring_plan.
+
+Användning:
+    python cli/gazetteer.py compile --type name --output fornamn.gaz fornamn.txt [efternamn.txt ...]
+    python cli/gazetteer.py compile --type address --column 2 --delimiter ';' --output gator.gaz gator.csv
+    python cli/gazetteer.py lookup gator.gaz "Drottninggatan"
+"""
+import os
+import re
+import csv
+import mmap
+import struct
+import hashlib
+import argparse
+from functools import lru_cache
+from pathlib import Path
+
+from atomic import atomic_write
+from propagation import fold
+
+MAGIC = b"ANGZ"
+FORMAT_VERSION = 1
+# magic, version, antal platser, antal poster, max antal ord per post, PII-typ
+HEADER = struct.Struct("<4sIQQI36s")
+SLOT = struct.Struct("<Q")
+
+# PII-typ i schemas.ts -> entitetstyp för spann i censurerings-planen
+ENTITY_TYPES = {'name': 'PER', 'address': 'LOC'}
+GAZETTEER_SCORE = 0.8
+
+# Ord och tal, så att poster med siffror (t.ex. "Lilla Nygatan 12") kan hittas
+WORD_PATTERN = re.compile(r"[^\W_]+(?:[-'][^\W_]+)*")
+
+
+def normalize(entry):
+    """Formen som hashas: vikt och med ett blanksteg mellan orden"""
+    return ' '.join(fold(entry).split())
+
+
+def entry_hash(normalized):
+    """64-bitars hash av en normaliserad post (0 betyder tom plats i tabellen)"""
+    value = int.from_bytes(hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+def compile_gazetteer(entries, output_path, pii_type):
+    """
+    Kompilera poster till en indexfil.
+
+    Args:
+        entries: Iterable med poster (strängar)
+        output_path: Indexfilen som skrivs
+        pii_type: PII-typen som träffar får ('name' eller 'address')
+
+    Returns:
+        Antal unika poster
+    """
+    if pii_type not in ENTITY_TYPES:
+        raise ValueError(f"Okänd typ '{pii_type}', välj en av {', '.join(ENTITY_TYPES)}")
+
+    hashes = set()
+    max_words = 0
+    for entry in entries:
+        normalized = normalize(entry)
+        if normalized:
+            hashes.add(entry_hash(normalized))
+            max_words = max(max_words, normalized.count(' ') + 1)
+
+    size = 1
+    while size < 2 * len(hashes):
+        size *= 2
+    mask = size - 1
+
+    table = [0] * size
+    for value in hashes:
+        slot = value & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = value
+
+    with atomic_write(output_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, size, len(hashes), max_words, pii_type.encode('ascii')))
+        f.write(struct.pack(f"<{size}Q", *table))
+
+    return len(hashes)
+
+
+class Gazetteer:
+    """En minnesmappad indexfil från compile_gazetteer"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, size, count, max_words, pii_type = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} är inte en ordlista i format {FORMAT_VERSION}")
+
+        self.size = size
+        self.count = count
+        self.max_words = max_words
+        self.pii_type = pii_type.rstrip(b"\0").decode('ascii')
+        self.entity_type = ENTITY_TYPES[self.pii_type]
+        self._mask = size - 1
+        self._table = memoryview(self._mmap)[HEADER.size:HEADER.size + size * SLOT.size].cast('Q')
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, entry):
+        return self.contains_normalized(normalize(entry))
+
+    def contains_normalized(self, normalized):
+        """Uppslagning av en redan normaliserad post"""
+        if not normalized:
+            return False
+        value = entry_hash(normalized)
+        table, mask = self._table, self._mask
+        slot = value & mask
+        while True:
+            current = table[slot]
+            if current == value:
+                return True
+            if not current:
+                return False
+            slot = (slot + 1) & mask
+
+    @property
+    def key(self):
+        """Identifierar ordlistans innehåll i cachenycklar"""
+        return f"{self.path.name}:{self.count}:{self.size}"
+
+
+@lru_cache(maxsize=None)
+def _load(paths):
+    return tuple(Gazetteer(path) for path in paths)
+
+
+def load_gazetteers():
+    """Ordlistorna i ANONYMIZATION_GAZETTEERS (mappas in en gång per process)"""
+    configured = os.environ.get('ANONYMIZATION_GAZETTEERS', '')
+    return _load(tuple(path for path in configured.split(os.pathsep) if path))
+
+
+def gazetteer_key():
+    """Del av cachenyckeln för de konfigurerade ordlistorna ('' om inga finns)"""
+    return '+'.join(gazetteer.key for gazetteer in load_gazetteers())
+
+
+def classify(text, gazetteers=None):
+    """
+    PII-typen för en text om den, eller något av orden i den, finns i en ordlista.
+
+    Returns:
+        'name', 'address' eller None
+    """
+    if gazetteers is None:
+        gazetteers = load_gazetteers()
+    if not gazetteers:
+        return None
+
+    candidates = [normalize(text)] + [fold(word) for word in WORD_PATTERN.findall(text)]
+    for gazetteer in gazetteers:
+        if any(gazetteer.contains_normalized(candidate) for candidate in candidates):
+            return gazetteer.pii_type
+    return None
+
+
+def find_spans(text, gazetteers=None):
+    """
+    Hitta poster ur ordlistorna i en text.
+
+    Varje ord med stor begynnelsebokstav prövas som början på en post med upp
+    till max_words ord (åtskilda av bara blanksteg), och den längsta träffen
+    behålls. Träffar överlappar inte varandra.
+
+    Returns:
+        Spann (start, end, word, entity_type, score) sorterade efter position
+    """
+    if gazetteers is None:
+        gazetteers = load_gazetteers()
+    if not gazetteers:
+        return []
+
+    max_words = max(gazetteer.max_words for gazetteer in gazetteers)
+    words = list(WORD_PATTERN.finditer(text))
+    folded = [fold(word.group()) for word in words]
+    spans = []
+
+    i = 0
+    while i < len(words):
+        if not words[i].group()[0].isupper():
+            i += 1
+            continue
+
+        best = None
+        candidate = folded[i]
+        for j in range(i, min(len(words), i + max_words)):
+            if j > i:
+                if not text[words[j - 1].end():words[j].start()].isspace():
+                    break
+                candidate += ' ' + folded[j]
+            for gazetteer in gazetteers:
+                if j - i < gazetteer.max_words and gazetteer.contains_normalized(candidate):
+                    best = (j, gazetteer)
+                    break
+
+        if best is None:
+            i += 1
+            continue
+
+        j, gazetteer = best
+        start, end = words[i].start(), words[j].end()
+        spans.append({
+            'start': start,
+            'end': end,
+            'word': text[start:end],
+            'entity_type': gazetteer.entity_type,
+            'score': GAZETTEER_SCORE,
+        })
+        i = j + 1
+
+    return spans
+
+
+def _read_entries(paths, column=None, delimiter=','):
+    """Poster från textfiler (en per rad) eller en kolumn i CSV-filer"""
+    for path in paths:
+        with open(path, encoding="utf-8", newline="") as f:
+            if column is None:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        yield line
+            else:
+                for row in csv.reader(f, delimiter=delimiter):
+                    if len(row) > column:
+                        yield row[column]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Kompilera och testa ordlistor.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = commands.add_parser('compile', help='Kompilera ordlistor till en indexfil')
+    compile_parser.add_argument('inputs', nargs='+', help='Textfiler med en post per rad, eller CSV-filer')
+    compile_parser.add_argument('--output', required=True, help='Indexfilen som skrivs')
+    compile_parser.add_argument('--type', required=True, choices=sorted(ENTITY_TYPES), help='PII-typ för träffar')
+    compile_parser.add_argument('--column', type=int, help='Kolumn (från 0) att läsa i CSV-filer')
+    compile_parser.add_argument('--delimiter', default=',', help='Avgränsare i CSV-filer')
+
+    lookup_parser = commands.add_parser('lookup', help='Slå upp poster i en indexfil')
+    lookup_parser.add_argument('index', help='Indexfil')
+    lookup_parser.add_argument('entries', nargs='+', help='Poster att slå upp')
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        count = compile_gazetteer(_read_entries(args.inputs, args.column, args.delimiter), args.output, args.type)
+        print(f"Skrev {count} poster till {args.output}")
+    else:
+        gazetteer = Gazetteer(args.index)
+        for entry in args.entries:
+            print(f"{entry}: {'ja' if entry in gazetteer else 'nej'} ({gazetteer.pii_type})")
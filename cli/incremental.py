@@ -0,0 +1,138 @@
+"""
+Inkrementell omdetektering när en redan analyserad text redigeras.
+
+I stället för att köra regex och NER på hela dokumentet efter varje ändring
+körs de bara på ett område runt ändringen: den ändrade texten plus
+context_chars tecken på varje sida (avklippt vid blanksteg), utökat så att
+det täcker hela redaktioner som korsar områdets kanter. Redaktioner utanför
+området behålls med sina id:n och flyttas med ändringens längdskillnad.
+Spridningen av säkra träffar (propagation.py) ser bara området, så en
+spridd träff kan få en annan score än vid en analys av hela texten.
+
+Området mäts i tecken och inte i NER:s tokenfönster. Fönstren vid en analys
+av hela texten räknas från dokumentets början, så en ändring som ändrar
+antalet tokens flyttar gränserna för alla fönster efter den, och det finns
+ingen fast mängd "påverkade fönster" att köra om. Området körs i stället
+genom run_ner som en egen text. Med default context_chars ryms det i ett
+enda fönster på 512 tokens, så ändringen hamnar aldrig nära en fönstergräns
+inuti området (en större ändring delas upp med run_ner:s vanliga
+överlappande fönster). Det som garanteras är:
+
+    - En regex-träff som berör ändringen och är kortare än context_chars
+      ligger helt inom området och hittas precis som vid en full analys.
+    - Varje ord inom context_chars från ändringen analyseras av NER med
+      minst context_chars tecken sammanhang på båda sidor, så långt texten
+      räcker.
+    - Redaktioner utanför området behålls oförändrade.
+
+Ett ord nära områdets kanter kan ändå få en annan NER-score än i en full
+analys, eftersom modellen inte ser texten bortom kanten.
+
+En ändring anges i den tidigare textens koordinater som
+{"start": ..., "end": ..., "text": "..."}, dvs. prev_text[start:end]
+ersätts med text.
+"""
+from censurering import build_censoring_plan, generate_redactions_from_plan, NER_CONFIDENCE_THRESHOLD
+
+# Redaktioner som användaren lagt till själv i editorn
+MANUAL_TYPE = "MANUAL_PII"
+
+
+def apply_edit(text, edit):
+    """Returnera texten efter ändringen, efter att ha kontrollerat positionerna"""
+    start, end = edit['start'], edit['end']
+    if not 0 <= start <= end <= len(text):
+        raise ValueError(f"Ogiltig ändring {start}-{end} för en text med {len(text)} tecken")
+    return text[:start] + edit['text'] + text[end:]
+
+
+def _snap_left(text, position):
+    """Flytta positionen bakåt till början av ordet den ligger i"""
+    while position > 0 and not text[position - 1].isspace():
+        position -= 1
+    return position
+
+
+def _snap_right(text, position):
+    """Flytta positionen framåt till slutet av ordet den ligger i"""
+    while position < len(text) and not text[position].isspace():
+        position += 1
+    return position
+
+
+def dirty_region(prev_text, prev_redactions, edit, context_chars=256):
+    """
+    Området som måste analyseras om, i den tidigare textens koordinater.
+
+    Returns:
+        (start, end) i prev_text
+    """
+    start = _snap_left(prev_text, max(0, edit['start'] - context_chars))
+    end = _snap_right(prev_text, min(len(prev_text), edit['end'] + context_chars))
+
+    # Redaktioner överlappar inte varandra, så ett varv räcker för att
+    # täcka de som korsar kanterna
+    for redaction in prev_redactions:
+        if redaction['start'] < start < redaction['end']:
+            start = redaction['start']
+        if redaction['start'] < end < redaction['end']:
+            end = redaction['end']
+
+    return start, end
+
+
+def redetect(prev_text, prev_redactions, edit, ner_pipeline=None,
+             confidence_threshold=NER_CONFIDENCE_THRESHOLD, batch_size=8, context_chars=256):
+    """
+    Uppdatera redaktionerna efter en ändring utan att analysera om hela texten.
+
+    Args:
+        prev_text: Texten som prev_redactions gäller
+        prev_redactions: Redaktioner i schemas.ts-format för prev_text
+        edit: Dict med start, end och text (i prev_text:s koordinater)
+        ner_pipeline: NER-pipeline, eller None för att bara köra regex
+        confidence_threshold: Lägsta score för NER-entiteter
+        batch_size: Antal tokenfönster per forward pass i NER-steget
+        context_chars: Antal tecken runt ändringen som analyseras om
+
+    Returns:
+        Dict med original_text (den nya texten), redactions och region (det
+        omanalyserade området i den nya texten)
+    """
+    text = apply_edit(prev_text, edit)
+    delta = len(edit['text']) - (edit['end'] - edit['start'])
+
+    region_start, prev_region_end = dirty_region(prev_text, prev_redactions, edit, context_chars)
+    region_end = prev_region_end + delta
+
+    # Behåll redaktioner utanför området, och manuella redaktioner som inte
+    # rör själva ändringen, med positioner i den nya texten
+    kept = []
+    for redaction in prev_redactions:
+        if redaction['end'] <= region_start:
+            kept.append(redaction)
+        elif redaction['start'] >= prev_region_end:
+            kept.append({**redaction, 'start': redaction['start'] + delta, 'end': redaction['end'] + delta})
+        elif redaction['type'] == MANUAL_TYPE and (redaction['end'] <= edit['start'] or redaction['start'] >= edit['end']):
+            shift = delta if redaction['start'] >= edit['end'] else 0
+            kept.append({**redaction, 'start': redaction['start'] + shift, 'end': redaction['end'] + shift})
+
+    # Analysera bara området och flytta träffarna till den nya textens koordinater
+    plan = build_censoring_plan(text[region_start:region_end], ner_pipeline, confidence_threshold, batch_size)
+    manual = [r for r in kept if r['type'] == MANUAL_TYPE and r['end'] > region_start and r['start'] < region_end]
+    for item in plan:
+        item['start'] += region_start
+        item['end'] += region_start
+    plan = [
+        item for item in plan
+        if not any(item['start'] < r['end'] and r['start'] < item['end'] for r in manual)
+    ]
+
+    redactions = kept + generate_redactions_from_plan(text, plan)
+    redactions.sort(key=lambda r: r['start'])
+
+    return {
+        'original_text': text,
+        'redactions': redactions,
+        'region': [region_start, region_end],
+    }
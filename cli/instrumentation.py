@@ -0,0 +1,207 @@
+"""
+Tidtagning, räknare och profilering för anonymiseringspipelinen.
+
+Ett Metrics-objekt följer med genom main2 och samlar tiden för varje steg
+(konvertering, regex, NER, överlappsupplösning, rendering och JSON) samt
+räknare som antal tokenfönster, entiteter och spann som tagits bort som
+överlapp. report() skriver mätvärdena som en JSON-rad per dokument eller
+som en Prometheus-textdump med summor för hela processen.
+
+Konfiguration via miljövariabler:
+    ANONYMIZATION_LOG_LEVEL     Loggnivå (default INFO, DEBUG visar varje entitet)
+    ANONYMIZATION_METRICS       'jsonl' eller 'prometheus' (av om den inte är satt)
+    ANONYMIZATION_METRICS_FILE  Fil för mätvärdena (default stderr)
+    ANONYMIZATION_PROFILE       'cprofile', 'tracemalloc' eller båda kommaseparerade
+    ANONYMIZATION_PROFILE_DIR   Katalog för .prof-filer (default aktuell katalog)
+"""
+import os
+import sys
+import json
+import time
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+
+from atomic import atomic_write
+
+logger = logging.getLogger("anonymization")
+
+METRICS_PREFIX = "anonymization"
+
+
+def configure_logging(stream, level=None):
+    """
+    Skicka pipelinens logg till stream (normalt den riktiga stderr, eftersom
+    censurering.py ersätter sys.stderr med NullWriter).
+    """
+    if level is None:
+        level = os.environ.get('ANONYMIZATION_LOG_LEVEL', 'INFO').upper()
+
+    if not logger.handlers:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(level)
+
+
+class Metrics:
+    """Tider per steg och räknare för en körning"""
+
+    def __init__(self):
+        self.timings = {}
+        self.calls = {}
+        self.counters = {}
+        self.gauges = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Mät tiden för ett steg, flera anrop med samma namn summeras"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """Spara ett toppvärde, t.ex. minnesanvändning (högsta värdet behålls)"""
+        self.gauges[name] = max(self.gauges.get(name, value), value)
+
+    def merge(self, other):
+        """Lägg till mätvärdena från en annan körning"""
+        for name, seconds in other.timings.items():
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+        for name, calls in other.calls.items():
+            self.calls[name] = self.calls.get(name, 0) + calls
+        for name, value in other.counters.items():
+            self.count(name, value)
+        for name, value in other.gauges.items():
+            self.gauge(name, value)
+
+    def as_dict(self):
+        return {
+            'stages_ms': {name: round(seconds * 1000, 3) for name, seconds in self.timings.items()},
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+        }
+
+    def to_json_line(self, **labels):
+        """En JSON-rad med mätvärdena, plus valfria fält som identifierar körningen"""
+        return json.dumps({**labels, **self.as_dict()}, ensure_ascii=False)
+
+    def to_prometheus(self, prefix=METRICS_PREFIX):
+        """Mätvärdena i Prometheus textformat"""
+        lines = [
+            f"# TYPE {prefix}_stage_seconds_total counter",
+            *(f'{prefix}_stage_seconds_total{{stage="{name}"}} {seconds:.6f}'
+              for name, seconds in sorted(self.timings.items())),
+            f"# TYPE {prefix}_stage_calls_total counter",
+            *(f'{prefix}_stage_calls_total{{stage="{name}"}} {calls}'
+              for name, calls in sorted(self.calls.items())),
+        ]
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Summor för alla körningar i processen, används av Prometheus-dumpen
+PROCESS_METRICS = Metrics()
+
+
+def report(metrics, **labels):
+    """
+    Skriv mätvärdena för en körning enligt ANONYMIZATION_METRICS.
+
+    I jsonl-läget läggs en rad till per körning. I prometheus-läget skrivs
+    hela processens summor om, så filen kan läsas av node_exporters
+    textfile-collector.
+    """
+    PROCESS_METRICS.merge(metrics)
+
+    output_format = os.environ.get('ANONYMIZATION_METRICS', '').lower()
+    if not output_format:
+        return
+
+    path = os.environ.get('ANONYMIZATION_METRICS_FILE')
+
+    if output_format == 'prometheus':
+        dump = PROCESS_METRICS.to_prometheus()
+        if path is None:
+            _log_stream().write(dump)
+            return
+        with atomic_write(path, 'w', encoding='utf-8') as f:
+            f.write(dump)
+        return
+
+    line = metrics.to_json_line(**labels) + "\n"
+    if path is None:
+        _log_stream().write(line)
+    else:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def _log_stream():
+    """Strömmen som loggen skrivs till, så att mätvärden inte hamnar på sys.stderr (NullWriter)"""
+    for handler in logger.handlers:
+        stream = getattr(handler, 'stream', None)
+        if stream is not None:
+            return stream
+    return sys.__stderr__
+
+
+@contextmanager
+def profiling(metrics, name):
+    """
+    Profilera blocket om ANONYMIZATION_PROFILE är satt.
+
+    cProfile-statistik sparas som <name>-<tid>.prof i ANONYMIZATION_PROFILE_DIR.
+    Med tracemalloc sparas den högsta minnesanvändningen under blocket som
+    mätvärdet tracemalloc_peak_bytes.
+    """
+    modes = {m.strip().lower() for m in os.environ.get('ANONYMIZATION_PROFILE', '').split(',') if m.strip()}
+    if not modes:
+        yield
+        return
+
+    profiler = None
+    if 'cprofile' in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    tracing = False
+    if 'tracemalloc' in modes:
+        import tracemalloc
+        tracing = not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            directory = Path(os.environ.get('ANONYMIZATION_PROFILE_DIR', '.'))
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof"
+            profiler.dump_stats(path)
+            logger.info(f"cProfile-statistik sparad: {path}")
+
+        if 'tracemalloc' in modes:
+            import tracemalloc
+            _, peak = tracemalloc.get_traced_memory()
+            metrics.gauge('tracemalloc_peak_bytes', peak)
+            if tracing:
+                tracemalloc.stop()
@@ -0,0 +1,172 @@
+"""
+Offset-mappning mellan doclings text- och markdown-export.
+
+Båda exporterna byggs från samma dokumentmodell: elementen (rubriker,
+stycken, listpunkter, tabellceller) skrivs i samma ordning, men markdown
+lägger till markörer (#, -, |) och kan escapa tecken. Genom att gå igenom
+dokumentets element en gång och hitta varje elements text i båda exporterna
+(framåt från förra elementet) fås en lista med segment där texten är
+identisk. De upplösta spannen i den vanliga texten kan sedan projiceras in i
+markdown i ett enda linjärt pass, i stället för en global str.replace per
+entitet.
+
+Spannen maskeras i markdown med escapade asterisker (\\*), så att masken
+aldrig tolkas som betoning eller en horisontell linje, och escape-tecken
+inuti ett spann maskeras bort i stället för att lämnas kvar mellan
+asteriskerna.
+"""
+import re
+
+from render import clip_spans
+
+# Hur många markdown-tecken (escape-tecken, entiteter) som får hoppas över
+# mellan två tecken i ett element som inte finns ordagrant i markdown
+MAX_ALIGN_SKIP = 8
+
+# Escape-tecken framför ASCII-skiljetecken, som markdown skriver ut för t.ex. '_'
+ESCAPE_PATTERN = re.compile(r'\\([!-/:-@\[-`{-~])')
+
+
+def _item_texts(document):
+    """Texterna i dokumentets element, i läsordning"""
+    for item, _level in document.iterate_items():
+        text = getattr(item, 'text', None)
+        if text:
+            yield text
+            continue
+
+        # Tabeller har ingen egen text, men varje cell skrivs ut i båda exporterna
+        data = getattr(item, 'data', None)
+        for cell in getattr(data, 'table_cells', None) or []:
+            if cell.text:
+                yield cell.text
+
+
+def _align(text, markdown_text, md_pos):
+    """
+    Matcha ett elements text tecken för tecken mot markdown från md_pos, när
+    texten inte finns ordagrant (t.ex. för att '_' skrivits som '\\_').
+
+    Returns:
+        (segment, md_end) där segment är (textens offset, md_start, längd),
+        eller None om texten inte kunde matchas
+    """
+    segments = []
+    cursor = md_pos
+    for offset, char in enumerate(text):
+        found = markdown_text.find(char, cursor, cursor + MAX_ALIGN_SKIP + 1)
+        if found < 0:
+            return None
+
+        if segments and found == cursor and segments[-1][0] + segments[-1][2] == offset:
+            text_offset, md_start, length = segments[-1]
+            segments[-1] = (text_offset, md_start, length + 1)
+        else:
+            segments.append((offset, found, 1))
+        cursor = found + 1
+
+    return segments, cursor
+
+
+def build_offset_map(document, plain_text, markdown_text):
+    """
+    Bygg offset-mappningen mellan text- och markdown-exporten av ett dokument.
+
+    Returns:
+        Sorterad lista med (plain_start, md_start, längd) för segment som är
+        identiska i båda exporterna
+    """
+    offset_map = []
+    plain_pos = md_pos = 0
+
+    for text in _item_texts(document):
+        plain_start = plain_text.find(text, plain_pos)
+        if plain_start < 0:
+            continue
+
+        md_start = markdown_text.find(text, md_pos)
+        if md_start >= 0:
+            offset_map.append((plain_start, md_start, len(text)))
+            md_end = md_start + len(text)
+        else:
+            aligned = _align(text, markdown_text, md_pos)
+            if aligned is None:
+                continue
+            segments, md_end = aligned
+            offset_map.extend((plain_start + offset, start, length) for offset, start, length in segments)
+
+        plain_pos = plain_start + len(text)
+        md_pos = md_end
+
+    return offset_map
+
+
+def project_spans(plain_text, spans, offset_map, markdown_text):
+    """
+    Projicera spann i den vanliga texten till intervall i markdown.
+
+    Spannen och segmenten gås igenom i ordning samtidigt. Ett spann som inte
+    täcks av något segment (texten hittades inte i båda exporterna) söks upp i
+    markdown, men bara mellan de närmaste segmenten runt spannet.
+
+    Returns:
+        Lista med (md_start, md_end), sorterad efter position
+    """
+    ranges = []
+    i = 0
+
+    for _span, start, end in clip_spans(plain_text, spans):
+        while i < len(offset_map) and offset_map[i][0] + offset_map[i][2] <= start:
+            i += 1
+
+        span_ranges = []
+        j = i
+        while j < len(offset_map) and offset_map[j][0] < end:
+            plain_start, md_start, length = offset_map[j]
+            overlap_start = max(start, plain_start)
+            overlap_end = min(end, plain_start + length)
+            if overlap_start < overlap_end:
+                md_range = (md_start + overlap_start - plain_start, md_start + overlap_end - plain_start)
+                # Ta med escape-tecknet om spannet börjar på ett escapat tecken
+                if md_range[0] > 0 and ESCAPE_PATTERN.match(markdown_text, md_range[0] - 1):
+                    md_range = (md_range[0] - 1, md_range[1])
+                # Segment som bara skiljs åt av escape-tecken slås ihop, så att
+                # t.ex. 'my\\_dog' maskeras som ett intervall
+                if span_ranges and markdown_text[span_ranges[-1][1]:md_range[0]].strip('\\') == '':
+                    md_range = (span_ranges[-1][0], md_range[1])
+                    span_ranges.pop()
+                span_ranges.append(md_range)
+            j += 1
+        ranges.extend(span_ranges)
+
+        if not span_ranges:
+            low = offset_map[i - 1][1] + offset_map[i - 1][2] if i > 0 else 0
+            high = offset_map[j][1] if j < len(offset_map) else len(markdown_text)
+            word = plain_text[start:end]
+            found = markdown_text.find(word, low, high)
+            if found >= 0:
+                ranges.append((found, found + len(word)))
+
+    ranges.sort()
+    return ranges
+
+
+def censor_markdown(markdown_text, ranges):
+    """
+    Ersätt intervallen i markdown med escapade asterisker i ett pass.
+
+    Varje intervall får en asterisk per tecken i den vanliga texten, dvs.
+    escape-tecken i intervallet räknas inte.
+    """
+    parts = []
+    cursor = 0
+    for start, end in ranges:
+        start = max(start, cursor)
+        if start >= end:
+            continue
+        parts.append(markdown_text[cursor:start])
+        parts.append('\\*' * len(ESCAPE_PATTERN.sub(r'\1', markdown_text[start:end])))
+        cursor = end
+
+    parts.append(markdown_text[cursor:])
+    return ''.join(parts)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Lokalt, versionerat lager för NER-modeller och doclings layoutmodeller.
+
+prefetch-models laddar ner alla modeller i models.MODEL_REGISTRY och
+doclings modeller en gång (på en maskin med nätverk) och sparar dem under
+ANONYMIZATION_MODEL_STORE/v<STORE_VERSION>/. Lagret kan sedan kopieras till
+noder utan nätverk.
+
+När lagret finns laddas modellerna bara därifrån (local_files_only), och
+vikterna mappas in i minnet i stället för att läsas in: safetensors-filer
+öppnas med mmap och PyTorch-filer med torch.load(mmap=True), och
+load_state_dict(assign=True) låter modellens parametrar peka direkt på de
+mappade sidorna. Flera arbetsprocesser som laddar samma modell delar då
+samma fysiska kopia via sidcachen.
+
+Med ANONYMIZATION_OFFLINE=1 är lagret ett krav, annars hämtas modeller
+från Hugging Face Hub som tidigare om lagret saknas.
+
+Användning:
+    python cli/model_store.py prefetch-models [--models bert-large-en,kb-bert-sv] [--no-docling] [--no-safetensors]
+    python cli/model_store.py list
+"""
+import os
+import json
+import re
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+from datetime import datetime, timezone
+
+from atomic import atomic_write, atomic_directory
+
+STORE_VERSION = 1
+DEFAULT_STORE_DIR = Path.home() / ".cache" / "cillers-anonymization" / "models"
+MANIFEST_FILE = "manifest.json"
+DOCLING_DIR = "docling"
+
+
+class ModelNotInStore(Exception):
+    pass
+
+
+def store_dir():
+    """Katalogen för den aktuella versionen av lagret"""
+    root = Path(os.environ.get('ANONYMIZATION_MODEL_STORE', DEFAULT_STORE_DIR))
+    return root / f"v{STORE_VERSION}"
+
+
+def offline_required():
+    return os.environ.get('ANONYMIZATION_OFFLINE', '') not in ('', '0')
+
+
+def load_manifest(directory=None):
+    """Lagrets manifest, eller None om inget lager har skapats"""
+    path = (directory or store_dir()) / MANIFEST_FILE
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        if offline_required():
+            raise ModelNotInStore(f"ANONYMIZATION_OFFLINE är satt men modellagret saknas: {path.parent}")
+        return None
+
+
+def resolve_model(model_id):
+    """
+    Sökväg i lagret för en modell.
+
+    Returns:
+        Path till modellens katalog, eller None om lagret inte finns (då
+        laddas modellen från Hugging Face Hub)
+
+    Raises:
+        ModelNotInStore om lagret finns men modellen inte har förhämtats
+    """
+    manifest = load_manifest()
+    if manifest is None:
+        return None
+
+    for entry in manifest['models'].values():
+        if entry['model_id'] == model_id:
+            return store_dir() / entry['path']
+
+    raise ModelNotInStore(
+        f"Modellen '{model_id}' finns inte i {store_dir()}, kör 'python cli/model_store.py prefetch-models'")
+
+
+def resolve_docling():
+    """Katalog med doclings modeller i lagret, eller None"""
+    manifest = load_manifest()
+    if manifest is None or not manifest.get('docling'):
+        return None
+    return store_dir() / manifest['docling']
+
+
+@contextmanager
+def _parameters_on_meta():
+    """
+    Skapa modulers parametrar på meta-enheten men buffertar som vanligt.
+
+    torch.device("meta") räcker inte, eftersom även buffertar som inte sparas
+    i viktfilen (t.ex. position_ids) då skulle sakna data.
+    """
+    import torch
+
+    register_parameter = torch.nn.Module.register_parameter
+
+    def register_on_meta(module, name, parameter):
+        if parameter is not None and not parameter.is_meta:
+            parameter = torch.nn.Parameter(parameter.to("meta"), requires_grad=parameter.requires_grad)
+        register_parameter(module, name, parameter)
+
+    torch.nn.Module.register_parameter = register_on_meta
+    try:
+        yield
+    finally:
+        torch.nn.Module.register_parameter = register_parameter
+
+
+def _unexpected_keys(model, unexpected):
+    """Nycklar i viktfilen som modellen inte har, utom de transformers själv ignorerar"""
+    ignored = [re.compile(pattern) for pattern in getattr(model, '_keys_to_ignore_on_load_unexpected', None) or []]
+    # Äldre viktfiler kan innehålla buffertar som inte längre sparas (t.ex. position_ids)
+    buffers = {name for name, _ in model.named_buffers()}
+    return [key for key in unexpected if key not in buffers and not any(p.search(key) for p in ignored)]
+
+
+def load_mapped_model(path):
+    """
+    Ladda en token classification-modell från lagret med minnesmappade vikter.
+
+    Modellens parametrar skapas först utan data (på meta-enheten) och får
+    sedan de mappade tensorerna direkt, så inga vikter kopieras till
+    processens eget minne. Buffertar (t.ex. position_ids) skapas som vanligt
+    eftersom de inte alltid finns i viktfilen.
+
+    Raises:
+        ModelNotInStore om viktfilen saknar parametrar eller har nycklar som
+        modellen inte känner till (t.ex. ett annat prefix)
+    """
+    import torch
+    from transformers import AutoConfig, AutoModelForTokenClassification
+
+    path = Path(path)
+    config = AutoConfig.from_pretrained(path, local_files_only=True)
+
+    safetensors_file = path / "model.safetensors"
+    if safetensors_file.exists():
+        from safetensors.torch import load_file
+        state_dict = load_file(safetensors_file)  # mmap, tensorerna pekar in i filen
+    else:
+        state_dict = torch.load(path / "pytorch_model.bin", mmap=True, weights_only=True, map_location="cpu")
+
+    with _parameters_on_meta():
+        model = AutoModelForTokenClassification.from_config(config)
+
+    # Vikter som delas med andra (t.ex. embeddings) saknas i filen och knyts ihop efteråt
+    result = model.load_state_dict(state_dict, strict=False, assign=True)
+    model.tie_weights()
+
+    unexpected = _unexpected_keys(model, result.unexpected_keys)
+    if unexpected:
+        raise ModelNotInStore(f"Viktfilen i {path} har okända nycklar: {', '.join(unexpected[:5])}")
+
+    missing = [name for name, parameter in model.named_parameters() if parameter.is_meta]
+    if missing:
+        raise ModelNotInStore(f"Viktfilen i {path} saknar {', '.join(missing[:5])}")
+
+    model.eval()
+    return model
+
+
+def prefetch_models(names=None, include_docling=True, safetensors=True):
+    """
+    Ladda ner modeller till lagret och skriv manifestet.
+
+    Args:
+        names: Namn i MODEL_REGISTRY (default alla)
+        include_docling: Hämta även doclings layout- och tabellmodeller
+        safetensors: Spara vikterna som safetensors (annars pytorch_model.bin)
+
+    Returns:
+        Manifestet som skrevs
+    """
+    from transformers import AutoTokenizer, AutoModelForTokenClassification
+    from models import MODEL_REGISTRY
+
+    directory = store_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(directory) or {'version': STORE_VERSION, 'models': {}, 'docling': None}
+
+    for name in names or MODEL_REGISTRY:
+        config = MODEL_REGISTRY[name]
+        target = directory / "hf" / name
+        print(f"Hämtar {name} ({config.model_id})...")
+
+        tokenizer = AutoTokenizer.from_pretrained(config.model_id)
+        model = AutoModelForTokenClassification.from_pretrained(config.model_id)
+
+        with atomic_directory(target) as temp:
+            tokenizer.save_pretrained(temp)
+            model.save_pretrained(temp, safe_serialization=safetensors)
+
+        manifest['models'][name] = {
+            'model_id': config.model_id,
+            'revision': getattr(model.config, '_commit_hash', None),
+            'format': 'safetensors' if safetensors else 'pytorch',
+            'path': str(target.relative_to(directory)),
+        }
+
+    if include_docling:
+        from docling.utils.model_downloader import download_models
+        print("Hämtar doclings modeller...")
+        download_models(output_dir=directory / DOCLING_DIR, progress=True)
+        manifest['docling'] = DOCLING_DIR
+
+    manifest['updated'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    with atomic_write(directory / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Hantera det lokala modellagret.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    prefetch = commands.add_parser('prefetch-models', help='Ladda ner modellerna till lagret')
+    prefetch.add_argument('--models', help='Kommaseparerade namn ur modellregistret (default alla)')
+    prefetch.add_argument('--no-docling', action='store_true', help='Hoppa över doclings modeller')
+    prefetch.add_argument('--no-safetensors', action='store_true', help='Spara vikterna som pytorch_model.bin')
+
+    commands.add_parser('list', help='Visa vad som finns i lagret')
+    args = parser.parse_args()
+
+    if args.command == 'prefetch-models':
+        names = args.models.split(',') if args.models else None
+        manifest = prefetch_models(names, not args.no_docling, not args.no_safetensors)
+    else:
+        manifest = load_manifest()
+
+    print(json.dumps({'store': str(store_dir()), 'manifest': manifest}, indent=2))
@@ -0,0 +1,314 @@
+"""
+Register över NER-modeller och routning av dokument till rätt modell.
+
+Varje modell beskrivs av en NerModelConfig med modell-id, mappning av
+modellens etiketter till PER/LOC/ORG/MISC (som map_entity_type_to_pii_type
+förstår), max antal tokens per fönster och confidence-tröskel.
+
+Modellen väljs med ANONYMIZATION_NER_MODEL: ett namn ur MODEL_REGISTRY, eller
+'auto' för att välja modell per dokument. I auto-läget avgör en snabb
+språkdetektering (å/ä/ö och vanliga småord) om texten är svensk eller
+engelsk: svensk text går till den svenska modellen, korta engelska texter
+till den destillerade modellen och längre engelska texter till bert-large.
+Laddade modeller hålls i en LRU-cache som begränsas av en minnesbudget
+(ANONYMIZATION_MODEL_MEMORY_BYTES, default 3 GB).
+"""
+import os
+import re
+import threading
+from collections import namedtuple, OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from instrumentation import logger
+from ner_backends import selected_backend, load_model
+from model_store import resolve_model
+from wordlists import ENGLISH_STOPWORDS, SWEDISH_STOPWORDS, WORD_PATTERN
+
+# name: namn i registret (och i ANONYMIZATION_NER_MODEL)
+# model_id: modellen på Hugging Face Hub
+# label_map: modellens etiketter -> PER/LOC/ORG/MISC (tom om de redan stämmer)
+# max_length: max antal tokens per fönster i run_ner
+# threshold: lägsta score för att en entitet ska behållas
+# approx_bytes: uppskattad minnesåtgång, används innan modellen laddats
+NerModelConfig = namedtuple('NerModelConfig',
+                            ['name', 'model_id', 'label_map', 'max_length', 'threshold', 'approx_bytes'])
+
+MODEL_REGISTRY = {
+    config.name: config for config in [
+        NerModelConfig('bert-large-en', 'dslim/bert-large-NER', {}, 512, 0.7, 1_340_000_000),
+        NerModelConfig('distilbert-en', 'dslim/distilbert-NER', {}, 512, 0.7, 270_000_000),
+        # KB:s modell använder SUC-etiketter, och ibland kombinationer som 'LOC/ORG'
+        # där den första delen avgör
+        NerModelConfig('kb-bert-sv', 'KB/bert-base-swedish-cased-ner', {
+            'PRS': 'PER',
+            'LOC': 'LOC',
+            'ORG': 'ORG',
+            'EVN': 'MISC',
+            'OBJ': 'MISC',
+            'WRK': 'MISC',
+            'TME': 'MISC',
+            'MSR': 'MISC',
+        }, 512, 0.7, 500_000_000),
+    ]
+}
+
+DEFAULT_MODEL = 'bert-large-en'
+AUTO_MODEL = 'auto'
+
+# Modell per språk i auto-läget, och gränsen för vad som räknas som en kort text
+LANGUAGE_MODELS = {'sv': 'kb-bert-sv', 'en': 'bert-large-en'}
+SHORT_TEXT_MODELS = {'en': 'distilbert-en'}
+SHORT_TEXT_CHARS = 5000
+
+DEFAULT_MEMORY_BYTES = 3 * 1024 ** 3
+
+SWEDISH_LETTERS = re.compile(r'[åäöÅÄÖ]')
+
+
+def detect_language(text, sample_chars=5000):
+    """
+    Gissa om en text är svensk eller engelsk.
+
+    Räknar vanliga småord för båda språken i början av texten, och ger
+    svenskan extra vikt för varje å, ä och ö.
+
+    Returns:
+        'sv' eller 'en'
+    """
+    sample = text[:sample_chars]
+    swedish = english = 0
+    for word in WORD_PATTERN.findall(sample.lower()):
+        if word in SWEDISH_STOPWORDS:
+            swedish += 1
+        elif word in ENGLISH_STOPWORDS:
+            english += 1
+
+    swedish += len(SWEDISH_LETTERS.findall(sample)) / 2
+    return 'sv' if swedish > english else 'en'
+
+
+def choose_model(text):
+    """Namnet på modellen som ett dokument ska köras med i auto-läget"""
+    language = detect_language(text)
+    if len(text) < SHORT_TEXT_CHARS and language in SHORT_TEXT_MODELS:
+        return SHORT_TEXT_MODELS[language]
+    return LANGUAGE_MODELS[language]
+
+
+def selected_model(name=None):
+    """Modellnamn från argumentet eller ANONYMIZATION_NER_MODEL, kontrollerat mot registret"""
+    if name is None:
+        name = os.environ.get('ANONYMIZATION_NER_MODEL', DEFAULT_MODEL)
+    if name != AUTO_MODEL and name not in MODEL_REGISTRY:
+        raise ValueError(f"Okänd NER-modell '{name}', välj 'auto' eller en av {', '.join(MODEL_REGISTRY)}")
+    return name
+
+
+class LabelMappedPipeline:
+    """Pipeline som översätter modellens etiketter med en NerModelConfig.label_map"""
+
+    def __init__(self, pipeline, label_map):
+        self.pipeline = pipeline
+        self.label_map = label_map
+
+    @property
+    def tokenizer(self):
+        return self.pipeline.tokenizer
+
+    def _map(self, entities):
+        for entity in entities:
+            label = entity['entity_group'].split('/')[0]
+            entity['entity_group'] = self.label_map.get(label, 'MISC')
+        return entities
+
+    def __call__(self, inputs, **kwargs):
+        outputs = self.pipeline(inputs, **kwargs)
+        if isinstance(inputs, str):
+            return self._map(outputs)
+        return [self._map(entities) for entities in outputs]
+
+
+def load_pipeline(config, backend=None):
+    """Ladda en NER-pipeline för en modell i registret"""
+    from transformers import AutoTokenizer, pipeline
+
+    backend = selected_backend(backend)
+    logger.info(f"Laddar NER-modell {config.name} ({config.model_id}, {backend})...")
+
+    # Från modellagret om det finns, annars från Hugging Face Hub
+    local_path = resolve_model(config.model_id)
+    if local_path is not None:
+        tokenizer = AutoTokenizer.from_pretrained(local_path, local_files_only=True)
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(config.model_id, local_files_only=False)
+    model, device = load_model(config.model_id, backend)
+
+    if device is not None:
+        logger.info("NER använder GPU" if device >= 0 else "NER använder CPU")
+
+    # Skapa pipeline med explicit modell och tokenizer
+    options = {} if device is None else {'device': device}
+    ner_pipeline = pipeline(
+        'ner',
+        model=model,
+        tokenizer=tokenizer,
+        aggregation_strategy="simple",
+        **options
+    )
+
+    if config.label_map:
+        return LabelMappedPipeline(ner_pipeline, config.label_map)
+    return ner_pipeline
+
+
+def _model_bytes(ner_pipeline, config):
+    """Minnesåtgången för en laddad pipeline (parametrarnas storlek om det går att räkna)"""
+    model = getattr(getattr(ner_pipeline, 'pipeline', ner_pipeline), 'model', None)
+    try:
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    except (AttributeError, TypeError):
+        return config.approx_bytes
+
+
+class _LoadedModel:
+    """En laddad pipeline i ModelRouter med antal pågående lån"""
+
+    def __init__(self, pipeline, size):
+        self.pipeline = pipeline
+        self.size = size
+        self.leases = 0
+        self.evicted = False
+
+
+class ModelRouter:
+    """
+    Väljer modell per dokument och håller laddade modeller i en LRU-cache
+    med minnesbudget.
+
+    run_ner känner igen routern på metoden lease() och kör då texten med den
+    valda modellens pipeline, max_length och tröskel. Pipelinen lånas under
+    anropet: en modell som släpps ur cachen medan någon tråd använder den
+    stängs först när det sista lånet lämnats tillbaka.
+    """
+
+    def __init__(self, backend=None, memory_budget=None, wrap=None):
+        """
+        Args:
+            backend: Inferens-backend för alla modeller (se ner_backends.py)
+            memory_budget: Max antal bytes för laddade modeller
+            wrap: Funktion som läggs runt varje laddad pipeline (t.ex. MicroBatcher)
+        """
+        if memory_budget is None:
+            memory_budget = int(os.environ.get('ANONYMIZATION_MODEL_MEMORY_BYTES', DEFAULT_MEMORY_BYTES))
+
+        self.backend = backend
+        self.memory_budget = memory_budget
+        self.wrap = wrap
+        self._loaded = OrderedDict()  # namn -> _LoadedModel
+        self._loading = {}  # namn -> Future för modeller som håller på att laddas
+        self._lock = threading.Lock()
+
+    def _acquire(self, name):
+        """Låna pipelinen för en modell, laddad vid behov"""
+        while True:
+            with self._lock:
+                entry = self._loaded.get(name)
+                if entry is not None:
+                    self._loaded.move_to_end(name)
+                    entry.leases += 1
+                    return entry
+
+                future = self._loading.get(name)
+                loader = future is None
+                if loader:
+                    future = self._loading[name] = Future()
+                    self._evict(MODEL_REGISTRY[name].approx_bytes)
+
+            if not loader:
+                # En annan tråd laddar modellen, försök igen när den är klar
+                # (den kan hinna släppas ur cachen innan vi får den)
+                future.result()
+                continue
+
+            # Laddningen görs utanför låset så att routning till redan
+            # laddade modeller inte väntar på den
+            try:
+                entry = self._load(name)
+            except BaseException as e:
+                with self._lock:
+                    del self._loading[name]
+                future.set_exception(e)
+                raise
+
+            with self._lock:
+                self._evict(entry.size)
+                self._loaded[name] = entry
+                del self._loading[name]
+                entry.leases += 1
+            future.set_result(None)
+            return entry
+
+    def _load(self, name):
+        config = MODEL_REGISTRY[name]
+        ner_pipeline = load_pipeline(config, self.backend)
+        size = _model_bytes(ner_pipeline, config)
+        if self.wrap is not None:
+            ner_pipeline = self.wrap(ner_pipeline)
+        return _LoadedModel(ner_pipeline, size)
+
+    def _release(self, entry):
+        """Lämna tillbaka ett lån och stäng pipelinen om den släppts och inte används"""
+        with self._lock:
+            entry.leases -= 1
+            close_now = entry.evicted and entry.leases == 0
+        if close_now:
+            _close(entry.pipeline)
+
+    def _evict(self, incoming_bytes):
+        """
+        Släpp de minst nyligen använda modellerna tills den nya ryms i budgeten.
+        Anropas med låset taget.
+        """
+        used = sum(entry.size for entry in self._loaded.values())
+        while self._loaded and used + incoming_bytes > self.memory_budget:
+            name, entry = self._loaded.popitem(last=False)
+            logger.info(f"Släpper NER-modell {name} för att hålla minnesbudgeten")
+            entry.evicted = True
+            if entry.leases == 0:
+                _close(entry.pipeline)
+            used -= entry.size
+
+    @contextmanager
+    def lease(self, text):
+        """
+        Välj modell för en text och låna dess pipeline under with-blocket.
+
+        Yields:
+            (NerModelConfig, pipeline)
+        """
+        name = choose_model(text)
+        entry = self._acquire(name)
+        try:
+            yield MODEL_REGISTRY[name], entry.pipeline
+        finally:
+            self._release(entry)
+
+    @property
+    def loaded(self):
+        return list(self._loaded)
+
+    @property
+    def stats(self):
+        """Statistik från de laddade pipelinerna som har sådan (t.ex. MicroBatcher)"""
+        return {
+            name: entry.pipeline.stats
+            for name, entry in self._loaded.items()
+            if hasattr(entry.pipeline, 'stats')
+        }
+
+
+def _close(ner_pipeline):
+    close = getattr(ner_pipeline, 'close', None)
+    if close is not None:
+        close()
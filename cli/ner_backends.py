@@ -0,0 +1,120 @@
+"""
+Inferens-backends för NER-modellen.
+
+Vilken backend som används väljs med miljövariabeln ANONYMIZATION_NER_BACKEND
+(eller argumentet backend till create_ner_pipeline):
+
+    torch       PyTorch fp32, GPU om den finns (default, samma som tidigare)
+    onnx        Modellen exporterad till ONNX och körd med ONNX Runtime på CPU
+    onnx-int8   ONNX-exporten dynamiskt kvantiserad till int8
+
+ONNX-varianterna kräver optimum[onnxruntime]. Exporten och kvantiseringen
+görs första gången och sparas under ANONYMIZATION_ONNX_DIR (default
+~/.cache/cillers-anonymization/onnx), så senare starter laddar filerna direkt.
+Alla backends används genom samma transformers-pipeline och ger därför samma
+entitetsformat (entity_group, score, start, end, word).
+
+ANONYMIZATION_ORT_THREADS begränsar antalet trådar som ONNX Runtime
+använder per modell (intra-op), t.ex. när flera arbetsprocesser i
+batch.py delar på kärnorna.
+"""
+import os
+import platform
+from pathlib import Path
+
+from model_store import resolve_model, load_mapped_model
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = "torch"
+DEFAULT_ONNX_DIR = Path.home() / ".cache" / "cillers-anonymization" / "onnx"
+
+QUANTIZED_FILE_NAME = "model_quantized.onnx"
+
+
+def selected_backend(backend=None):
+    """Backend från argumentet eller ANONYMIZATION_NER_BACKEND, kontrollerad mot BACKENDS"""
+    if backend is None:
+        backend = os.environ.get('ANONYMIZATION_NER_BACKEND', DEFAULT_BACKEND)
+    backend = backend.lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Okänd NER-backend '{backend}', välj en av {', '.join(BACKENDS)}")
+    return backend
+
+
+def onnx_dir(model_id, quantized=False):
+    """Katalog där ONNX-exporten av en modell sparas"""
+    root = Path(os.environ.get('ANONYMIZATION_ONNX_DIR', DEFAULT_ONNX_DIR))
+    name = model_id.replace('/', '--')
+    return root / (f"{name}-int8" if quantized else name)
+
+
+def load_model(model_id, backend):
+    """
+    Ladda modellen för en backend, från det lokala modellagret om det finns
+    (se model_store.py) och annars från Hugging Face Hub.
+
+    Returns:
+        (model, device) där device skickas vidare till transformers.pipeline
+        (None för ONNX Runtime, som alltid kör på CPU här)
+    """
+    local_path = resolve_model(model_id)
+
+    if backend == "torch":
+        import torch
+        from transformers import AutoModelForTokenClassification
+
+        if local_path is not None:
+            model = load_mapped_model(local_path)
+        else:
+            model = AutoModelForTokenClassification.from_pretrained(model_id, local_files_only=False)
+        device = 0 if torch.cuda.is_available() else -1
+        return model, device
+
+    source = local_path if local_path is not None else model_id
+    return _load_onnx_model(model_id, source, quantized=(backend == "onnx-int8")), None
+
+
+def _session_options():
+    """SessionOptions med trådgränsen från ANONYMIZATION_ORT_THREADS, eller None"""
+    threads = os.environ.get('ANONYMIZATION_ORT_THREADS')
+    if not threads:
+        return None
+
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = int(threads)
+    options.inter_op_num_threads = 1
+    return options
+
+
+def _load_onnx_model(model_id, source, quantized):
+    from optimum.onnxruntime import ORTModelForTokenClassification
+
+    session_options = _session_options()
+
+    export_dir = onnx_dir(model_id)
+    if not (export_dir / "model.onnx").exists():
+        # Exportera från PyTorch-vikterna en gång (från modellagret om det finns)
+        model = ORTModelForTokenClassification.from_pretrained(source, export=True)
+        model.save_pretrained(export_dir)
+
+    if not quantized:
+        return ORTModelForTokenClassification.from_pretrained(export_dir, session_options=session_options)
+
+    quantized_dir = onnx_dir(model_id, quantized=True)
+    if not (quantized_dir / QUANTIZED_FILE_NAME).exists():
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        # Dynamisk kvantisering: vikterna lagras som int8, aktiveringarna
+        # kvantiseras vid körning, så ingen kalibreringsdata behövs
+        if platform.machine().lower() in ("arm64", "aarch64"):
+            config = AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+        else:
+            config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        quantizer.quantize(save_dir=quantized_dir, quantization_config=config)
+
+    return ORTModelForTokenClassification.from_pretrained(quantized_dir, file_name=QUANTIZED_FILE_NAME,
+                                                          session_options=session_options)
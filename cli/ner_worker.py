@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Långlivad worker som laddar NER-pipelinen och DocumentConverter en gång och
+sedan tar emot jobb som JSON-rader på stdin. Varje svar skrivs som en
+JSON-rad på stdout, så modell- och importkostnaden betalas bara vid start.
+
+Protokoll (ett JSON-objekt per rad):
+    -> {"id": "1", "pdf_path": "/tmp/input.pdf"}
+    <- {"id": "1", "ok": true, "result": {...}}   # samma dict som main2 returnerar
+    <- {"id": "1", "ok": false, "error": "..."}
+
+Redan extraherad text kan analyseras direkt, och med "regex_only" körs bara
+regex-steget utan att modellen laddas:
+    -> {"id": "3", "text": "Ring 070-123 45 67", "regex_only": true}
+    <- {"id": "3", "ok": true, "result": {"original_text": ..., "redactions": [...]}}
+
+När texten redigeras i editorn analyseras bara området runt ändringen om
+(se incremental.py). "text" och "redactions" är det tidigare resultatet och
+"edit" ersätter text[start:end]:
+    -> {"id": "4", "text": "...", "redactions": [...], "edit": {"start": 5, "end": 9, "text": "Anna"}}
+    <- {"id": "4", "ok": true, "result": {"original_text": ..., "redactions": [...], "region": [0, 120]}}
+
+Med "metrics": true skickas även tiden per steg och räknarna från main2 med
+i svaret under "metrics".
+
+Resultat för PDF:er cachas på disk med SHA-256 av PDF:en, pipelinens
+version, modell, backend, tröskel och ordlistor som nyckel (se
+result_cache.py), så en PDF som redan bearbetats returneras direkt utan att
+modellen behöver laddas. Svaret har då "cached": true, och originaltexten
+skrivs ändå till "output_path" om den anges.
+
+Med "stream": true konverteras PDF:en sida för sida och en händelse skickas
+för varje färdig sida innan det slutliga svaret:
+    -> {"id": "2", "pdf_path": "/tmp/input.pdf", "stream": true}
+    <- {"id": "2", "event": "page", "data": {"page": 1, "redactions": [...], ...}}
+    <- {"id": "2", "ok": true, "result": {"original_text": "...", "redactions": [...]}}
+
+Användning:
+    python cli/ner_worker.py [--lazy] [--no-cache]
+"""
+import sys
+import json
+import argparse
+import threading
+
+from censurering import (
+    main2, analyze_text, create_ner_pipeline, create_converter, original_stderr,
+    ner_model_key, NER_CONFIDENCE_THRESHOLD,
+)
+from gazetteer import gazetteer_key
+from instrumentation import Metrics
+from incremental import redetect
+from result_cache import ResultCache
+from streaming import stream_pdf, PAGE_SEPARATOR
+
+
+class NerWorker:
+    """Håller NER-pipelinen och DocumentConverter varma mellan jobb"""
+
+    def __init__(self, cache=None, pipeline_factory=create_ner_pipeline):
+        """
+        Args:
+            cache: ResultCache för PDF-resultat, eller None
+            pipeline_factory: Funktion som skapar NER-pipelinen (t.ex. en som
+                lägger en MicroBatcher framför den)
+        """
+        self.pipeline_factory = pipeline_factory
+        self._ner_pipeline = None
+        self.cache = cache
+        # Jobb kan köras från flera trådar (se ai_backend_python/server.py).
+        # Modellen laddas ändå bara en gång, men varje tråd får en egen
+        # konverterare eftersom DocumentConverter inte är trådsäker
+        self._load_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def ner_pipeline(self):
+        if self._ner_pipeline is None:
+            with self._load_lock:
+                if self._ner_pipeline is None:
+                    self._ner_pipeline = self.pipeline_factory()
+        return self._ner_pipeline
+
+    @property
+    def converter(self):
+        """Konverteraren för den anropande tråden"""
+        converter = getattr(self._local, 'converter', None)
+        if converter is None:
+            converter = self._local.converter = create_converter()
+        return converter
+
+    @property
+    def loaded(self):
+        """Om NER-modellen redan är laddad"""
+        return self._ner_pipeline is not None
+
+    def warm(self):
+        """Ladda modell och konverterare (för den anropande tråden) direkt i stället för vid första jobbet"""
+        self.ner_pipeline
+        self.converter
+
+    def handle(self, job, emit=None):
+        """
+        Kör ett jobb och returnera svaret som ska skickas tillbaka.
+
+        Args:
+            job: Dict med 'pdf_path' eller 'text' (och valfritt 'id', 'stream',
+                'regex_only' samt 'redactions' och 'edit' för en redigering)
+            emit: Funktion som skickar en mellanliggande händelse (vid 'stream')
+
+        Returns:
+            Dict enligt protokollet ovan
+        """
+        job_id = job.get('id')
+        pdf_path = job.get('pdf_path')
+
+        if 'edit' in job:
+            ner_pipeline = None if job.get('regex_only') else self.ner_pipeline
+            try:
+                result = redetect(job['text'], job.get('redactions', []), job['edit'], ner_pipeline)
+            except (KeyError, TypeError, ValueError) as e:
+                return {'id': job_id, 'ok': False, 'error': f"Ogiltig ändring: {e}"}
+            return {'id': job_id, 'ok': True, 'result': result}
+
+        if 'text' in job:
+            ner_pipeline = None if job.get('regex_only') else self.ner_pipeline
+            return {'id': job_id, 'ok': True, 'result': analyze_text(job['text'], ner_pipeline)}
+
+        if not pdf_path:
+            return {'id': job_id, 'ok': False, 'error': "Jobbet saknar 'pdf_path' eller 'text'"}
+
+        if job.get('stream'):
+            return self.handle_stream(job_id, pdf_path, emit)
+
+        metrics = Metrics()
+        cache_key = None
+        if self.cache is not None:
+            with open(pdf_path, 'rb') as f:
+                cache_key = ResultCache.key_for(f.read(), ner_model_key(), NER_CONFIDENCE_THRESHOLD,
+                                                gazetteer_key())
+
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics.count('cache_hits')
+                # Samma sidoeffekt som main2: originaltexten sparas i output_path
+                if job.get('output_path'):
+                    with open(job['output_path'], "w", encoding="utf-8") as f:
+                        f.write(cached['original_text'])
+                return self._response(job, cached, metrics, cached=True)
+        result = main2(
+            pdf_path,
+            job.get('output_path'),
+            ner_pipeline=self.ner_pipeline,
+            converter=self.converter,
+            metrics=metrics,
+        )
+
+        if result is None:
+            return {'id': job_id, 'ok': False, 'error': f"Kunde inte bearbeta '{pdf_path}'"}
+
+        if cache_key is not None:
+            self.cache.put(cache_key, result)
+
+        return self._response(job, result, metrics)
+
+    def _response(self, job, result, metrics, cached=False):
+        """Svaret för ett PDF-jobb, med mätvärden om jobbet bad om dem"""
+        response = {'id': job.get('id'), 'ok': True, 'result': result, 'cached': cached}
+        if job.get('metrics'):
+            response['metrics'] = metrics.as_dict()
+        return response
+
+    def handle_stream(self, job_id, pdf_path, emit):
+        """Bearbeta PDF:en sida för sida och skicka en händelse per sida"""
+        page_texts = []
+        redactions = []
+
+        for page in stream_pdf(pdf_path, ner_pipeline=self.ner_pipeline, converter=self.converter):
+            if page['text']:
+                page_texts.append(page['text'])
+            redactions.extend(page['redactions'])
+            if emit:
+                emit({'id': job_id, 'event': 'page', 'data': page})
+
+        result = {
+            'original_text': PAGE_SEPARATOR.join(page_texts),
+            'redactions': redactions,
+        }
+        return {'id': job_id, 'ok': True, 'result': result}
+
+
+def serve(worker, stdin, stdout):
+    """Läs jobb rad för rad från stdin och skriv svaren till stdout"""
+    def emit(message):
+        stdout.write(json.dumps(message, ensure_ascii=False) + '\n')
+        stdout.flush()
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            response = {'id': None, 'ok': False, 'error': f"Ogiltig JSON: {e}"}
+        else:
+            try:
+                response = worker.handle(job, emit)
+            except Exception as e:
+                response = {'id': job.get('id'), 'ok': False, 'error': str(e)}
+
+        emit(response)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Långlivad worker för PDF-konvertering och NER.')
+    parser.add_argument('--lazy', action='store_true', help='Ladda modellen först vid första jobbet')
+    parser.add_argument('--no-cache', action='store_true', help='Stäng av resultatcachen')
+    args = parser.parse_args()
+
+    # stdout är reserverat för protokollet, så eventuella utskrifter går till stderr
+    protocol_out = sys.stdout
+    sys.stdout = original_stderr
+
+    worker = NerWorker(cache=None if args.no_cache else ResultCache())
+    if not args.lazy:
+        worker.warm()
+
+    serve(worker, sys.stdin, protocol_out)
@@ -0,0 +1,120 @@
+"""
+Gemensam regeltabell för personuppgifter som hittas med regex.
+
+Tabellen används både för att söka igenom en hel text (PiiScanner, som
+kompilerar alla sökregler till ett enda reguljärt uttryck med namngivna
+grupper och hittar alla träffar i ett pass) och för att klassificera ett
+redan hittat ord (classify_pii).
+"""
+import re
+from collections import namedtuple
+
+# name: gruppnamn i det kombinerade uttrycket
+# category: typ av personuppgift
+# pii_type: PII_TYPE enligt schemas.ts
+# scan: används när en text söks igenom
+# classify: används när ett enskilt ord klassificeras
+PiiRule = namedtuple('PiiRule', ['name', 'category', 'pii_type', 'pattern', 'scan', 'classify'])
+
+# Ordningen spelar roll: vid sökning vinner den första regeln som matchar på
+# en given position, och vid klassificering testas reglerna uppifrån och ned.
+PII_RULES = [
+    # E-postadresser, format: namn@domän.tld
+    PiiRule('email', 'email', 'email',
+            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b', True, True),
+
+    # Telefonnummer (svenska format), t.ex.
+    # 07X-XXX XX XX, 07XXXXXXXX, 07X XXX XX XX, +467XXXXXXXX, +46 7X XXX XX XX
+    PiiRule('phone_mobile', 'phone', 'phone',
+            r'\b(?:\+46|0)(?:[\s-])?7[0-9](?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b', True, False),
+    PiiRule('phone_landline', 'phone', 'phone',
+            r'\b(?:\+46|0)(?:[\s-])?[1-9][0-9]{0,2}(?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b', True, False),
+    PiiRule('phone_switchboard', 'phone', 'phone',
+            r'\b(?:\+46|0)(?:[\s-])?[1-9](?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b', True, False),
+    # Mer tillåtande mönster som bara används för att klassificera enskilda ord
+    PiiRule('phone', 'phone', 'phone',
+            r'\b(?:\+46|0)(?:[\s-])?[0-9]{1,3}(?:[\s-])?[0-9]{2,3}(?:[\s-])?[0-9]{2,3}(?:[\s-])?[0-9]{2,3}\b', False, True),
+
+    # Personnummer, format: ÅÅÅÅMMDD-XXXX eller ÅÅMMDD-XXXX, även utan bindestreck
+    PiiRule('personnummer_long', 'personnummer', 'other',
+            r'\b[1-2][0-9]{3}(?:0[1-9]|1[0-2])(?:0[1-9]|[1-2][0-9]|3[0-1])[-]?[0-9]{4}\b', True, False),
+    PiiRule('personnummer_short', 'personnummer', 'other',
+            r'\b(?:[0-9]{2})(?:0[1-9]|1[0-2])(?:0[1-9]|[1-2][0-9]|3[0-1])[-]?[0-9]{4}\b', True, False),
+
+    # IP-adresser
+    PiiRule('ipv4', 'ip', 'ip', r'\b(?:\d{1,3}\.){3}\d{1,3}\b', True, True),
+    PiiRule('ipv6', 'ip', 'ip', r'\b(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}\b', True, True),
+
+    # Kreditkort (förenklade mönster för vanliga format)
+    PiiRule('credit_card', 'credit-card', 'credit-card', r'\b(?:\d{4}[- ]?){3}\d{4}\b', True, True),
+
+    # Personnummer vid klassificering (hanteras som "other" för att passa PII_TYPES)
+    PiiRule('personnummer', 'personnummer', 'other', r'\b(?:\d{6,8})[-]?\d{4}\b', False, True),
+]
+
+RULES_BY_NAME = {rule.name: rule for rule in PII_RULES}
+
+_CLASSIFY_RULES = [(re.compile(rule.pattern), rule) for rule in PII_RULES if rule.classify]
+
+
+class PiiScanner:
+    """
+    Hittar alla regex-personuppgifter i en text i ett enda pass.
+
+    Alla regler kompileras en gång till ett uttryck av formen
+    (?P<email>...)|(?P<phone_mobile>...)|... och match.lastgroup talar om
+    vilken regel som träffade.
+    """
+
+    def __init__(self, rules):
+        self.rules = {rule.name: rule for rule in rules}
+        self._regex = re.compile('|'.join(f'(?P<{rule.name}>{rule.pattern})' for rule in rules))
+
+    def finditer(self, text):
+        """Iterera över (match, regel) för varje träff i texten"""
+        for match in self._regex.finditer(text):
+            yield match, self.rules[match.lastgroup]
+
+    def scan(self, text):
+        """
+        Returnera alla träffar som spann i samma format som censurerings-planen.
+
+        Args:
+            text: Texten som ska sökas igenom
+
+        Returns:
+            Lista med spann (start, end, word, entity_type, score, rule)
+        """
+        return [
+            {
+                'start': match.start(),
+                'end': match.end(),
+                'word': match.group(0),
+                'entity_type': 'PERSONUPPGIFT',
+                'score': 1.0,
+                'rule': rule.name,
+            }
+            for match, rule in self.finditer(text)
+        ]
+
+    def sub(self, replace, text):
+        """Ersätt alla träffar med replace(match) i ett pass"""
+        return self._regex.sub(replace, text)
+
+
+def classify_pii(word):
+    """Returnera första klassificeringsregeln som matchar ordet, eller None"""
+    for regex, rule in _CLASSIFY_RULES:
+        if regex.match(word):
+            return rule
+    return None
+
+
+# Skanner med alla sökregler, byggd en gång vid import
+PII_SCANNER = PiiScanner([rule for rule in PII_RULES if rule.scan])
+
+# Skanner för censor_personal_data, som bara hanterar e-post, telefon och personnummer
+PERSONAL_DATA_SCANNER = PiiScanner([
+    rule for rule in PII_RULES
+    if rule.scan and rule.category in ('email', 'phone', 'personnummer')
+])
@@ -0,0 +1,208 @@
+"""
+Spridning av säkra träffar till alla förekomster i dokumentet.
+
+När NER hittar "Samuel" med hög confidence i ett stycke kan samma namn på
+andra ställen få lägre score och falla under tröskeln. Här byggs en
+Aho–Corasick-automat av alla säkra träffars ytformer, och dokumentet
+genomsöks en gång efter alla förekomster. Automaten för de statiska
+ordlistorna (COMMON_NAMES och CITY_NAMES) byggs en gång per process.
+Gatunamn hittas på sina efterled (STREET_SUFFIXES), men bara inuti
+sammansatta ord med stor begynnelsebokstav som "Drottninggatan", så att
+vanliga substantiv som "vägen" inte censureras.
+
+Sökningen görs på en vikt version av texten (gemener, diakritiska tecken
+borttagna) där varje tecken motsvarar exakt ett tecken i originalet, så
+positionerna gäller direkt i originaltexten. Träffar måste ligga på
+ordgränser. Tiden är linjär i textens längd plus antalet träffar, oavsett
+hur många ord ordlistorna innehåller.
+"""
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+# Ordlistor som också används av identify_pii_subtype
+COMMON_NAMES = ("johan", "andersson", "erik", "larsson", "svensson", "marie", "anna", "nils", "olsson", "karlsson")
+CITY_NAMES = ("malmö", "stockholm", "göteborg", "köpenhamn", "oslo")
+STREET_SUFFIXES = ("vägen", "gatan")
+ADDRESS_INDICATORS = STREET_SUFFIXES + ("avenue", "street") + CITY_NAMES
+
+# Sammansatt ord med stor begynnelsebokstav som slutar på ett gatuefterled
+STREET_PATTERN = re.compile(r'\b[^\W\d_a-zåäö][^\W\d_]*?(?:' + '|'.join(STREET_SUFFIXES) + r')\b')
+
+# Lägsta score för att en träff ska spridas, kortaste ytform som sprids och
+# score för träffar från ordlistorna
+PROPAGATION_THRESHOLD = 0.9
+MIN_SURFACE_CHARS = 3
+GAZETTEER_SCORE = 0.75
+
+
+class _FoldTable(dict):
+    """Översättningstabell för str.translate som fylls på vid behov"""
+
+    def __missing__(self, code):
+        char = chr(code)
+        base = ''.join(c for c in unicodedata.normalize('NFD', char) if not unicodedata.combining(c)).lower()
+        if len(base) != 1:
+            # Tecknet kan inte vikas till ett enda tecken, behåll längden
+            lower = char.lower()
+            base = lower if len(lower) == 1 else char
+        self[code] = base
+        return base
+
+
+_FOLD_TABLE = _FoldTable()
+
+
+def fold(text):
+    """Gemener utan diakritiska tecken, med samma längd som texten"""
+    return text.translate(_FOLD_TABLE)
+
+
+class DictionaryMatcher:
+    """
+    Aho–Corasick-automat över vikta ytformer.
+
+    Varje ytform har en payload (t.ex. entitetstyp och score). Finns samma
+    vikta form flera gånger behålls den första payloaden.
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries: Iterable med (ytform, payload)
+        """
+        self._goto = [{}]
+        self._output = [None]  # (längd, payload) för den längsta formen som slutar i noden
+        for surface, payload in entries:
+            self._add(fold(surface), payload)
+        self._build()
+
+    def __len__(self):
+        return sum(1 for output in self._output if output is not None)
+
+    def _add(self, folded, payload):
+        if not folded:
+            return
+        node = 0
+        for char in folded:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._output.append(None)
+            node = child
+        if self._output[node] is None:
+            self._output[node] = (len(folded), payload)
+
+    def _build(self):
+        """Räkna ut fail-länkar och länkar till närmaste nod med en utdata (bredden först)"""
+        self._fail = [0] * len(self._goto)
+        self._link = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                state = self._fail[node]
+                while state and char not in self._goto[state]:
+                    state = self._fail[state]
+                fail = self._goto[state].get(char, 0)
+                self._fail[child] = fail
+                self._link[child] = fail if self._output[fail] is not None else self._link[fail]
+                queue.append(child)
+
+    def finditer(self, text, folded=None):
+        """
+        Hitta alla förekomster som ligger på ordgränser.
+
+        Args:
+            text: Originaltexten
+            folded: fold(text) om den redan räknats ut
+
+        Yields:
+            (start, end, payload)
+        """
+        if folded is None:
+            folded = fold(text)
+
+        goto, fail, output, link = self._goto, self._fail, self._output, self._link
+        length = len(text)
+        node = 0
+
+        for i, char in enumerate(folded):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            match = node if output[node] is not None else link[node]
+            while match:
+                size, payload = output[match]
+                start, end = i + 1 - size, i + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == length or not text[end].isalnum()):
+                    yield start, end, payload
+                match = link[match]
+
+
+@lru_cache(maxsize=1)
+def gazetteer_matcher():
+    """Automaten för de statiska ordlistorna, byggd en gång"""
+    entries = [(name, ('PER', GAZETTEER_SCORE)) for name in COMMON_NAMES]
+    entries += [(place, ('LOC', GAZETTEER_SCORE)) for place in CITY_NAMES]
+    return DictionaryMatcher(entries)
+
+
+def propagate(text, plan, threshold=PROPAGATION_THRESHOLD, gazetteers=True):
+    """
+    Hitta alla förekomster av säkra träffars ytformer (och ordlistornas ord).
+
+    Args:
+        text: Texten som analyserats
+        plan: Spann från regex och NER (start, end, word, entity_type, score)
+        threshold: Lägsta score för att ett spann ska spridas
+        gazetteers: Sök även efter orden i de statiska ordlistorna och efter
+            gatunamn
+
+    Returns:
+        Nya spann i samma format som inte redan finns i planen
+    """
+    # Högst score först så att den formen får behålla sin entitetstyp
+    sources = sorted(
+        (item for item in plan if item['score'] >= threshold and len(item['word'].strip()) >= MIN_SURFACE_CHARS),
+        key=lambda item: -item['score'],
+    )
+    matchers = [DictionaryMatcher((item['word'].strip(), (item['entity_type'], item['score'])) for item in sources)]
+    if gazetteers:
+        matchers.append(gazetteer_matcher())
+
+    existing = {(item['start'], item['end']) for item in plan}
+    folded = fold(text)
+    spans = []
+
+    for matcher in matchers:
+        for start, end, (entity_type, score) in matcher.finditer(text, folded):
+            if (start, end) in existing:
+                continue
+            existing.add((start, end))
+            spans.append({
+                'start': start,
+                'end': end,
+                'word': text[start:end],
+                'entity_type': entity_type,
+                'score': score,
+            })
+
+    if gazetteers:
+        for match in STREET_PATTERN.finditer(text):
+            if (match.start(), match.end()) not in existing:
+                existing.add((match.start(), match.end()))
+                spans.append({
+                    'start': match.start(),
+                    'end': match.end(),
+                    'word': match.group(),
+                    'entity_type': 'LOC',
+                    'score': GAZETTEER_SCORE,
+                })
+
+    return spans
@@ -0,0 +1,94 @@
+"""
+Rendering av censurerade vyer av en text i ett enda pass.
+
+I stället för att ersätta varje spann med text[:start] + ersättning + text[end:]
+(vilket kopierar hela texten en gång per entitet) gås de upplösta spannen
+igenom en gång i ordning, och varje vy byggs med ''.join över segment.
+Samtidigt skapas en offset-mappning mellan originaltexten och varje vy.
+"""
+
+
+def censored_replacement(span, word):
+    """Ersätt ordet med lika många asterisker"""
+    return '*' * len(word)
+
+
+def tagged_replacement(span, word):
+    """Taggad version med både entitetstyp och confidence score"""
+    return f"<{word}> ({span['entity_type']}) ({span['score']:.2f})"
+
+
+def info_replacement(span, word):
+    """Beskrivande ersättning med ord, entitetstyp och confidence"""
+    return f"Censurerat: '{word}' ({span['entity_type']}) - confidence: {span['score']:.2f}"
+
+
+def clip_spans(text, spans):
+    """
+    Gå igenom spannen i textordning med samma regler som render_views.
+
+    Spann utanför texten klipps och spann som överlappar ett tidigare spann
+    hoppas över, så att redaktioner som byggs härifrån alltid motsvarar
+    exakt det som ersätts i de renderade vyerna.
+
+    Yields:
+        (span, start, end) med klippta positioner
+    """
+    cursor = 0
+    text_length = len(text)
+
+    for span in sorted(spans, key=lambda x: x['start']):
+        # Kontrollera att start/end positioner är inom textens gränser
+        start = max(0, min(span['start'], text_length))
+        end = max(0, min(span['end'], text_length))
+
+        if start >= end or start < cursor:
+            continue  # Ogiltig position eller överlapp
+
+        yield span, start, end
+        cursor = end
+
+
+def render_views(text, spans, views):
+    """
+    Bygg flera vyer av texten där spannen ersätts, i ett enda pass.
+
+    Args:
+        text: Originaltexten
+        spans: Icke-överlappande spann (dicts med 'start' och 'end'). Spann
+            utanför texten klipps, och spann som överlappar ett tidigare
+            spann hoppas över.
+        views: Dict med vynamn -> funktion(span, word) som ger ersättningen
+
+    Returns:
+        Dict med vynamn -> (renderad text, offset-mappning). Offset-mappningen
+        är en lista med (orig_start, orig_end, view_start, view_end) för varje
+        ersatt spann, sorterad efter position.
+    """
+    parts = {name: [] for name in views}
+    offsets = {name: [] for name in views}
+    lengths = {name: 0 for name in views}
+
+    cursor = 0
+
+    for span, start, end in clip_spans(text, spans):
+        word = text[start:end]
+        between = text[cursor:start]
+
+        for name, replace in views.items():
+            replacement = replace(span, word)
+            view_start = lengths[name] + len(between)
+
+            parts[name].append(between)
+            parts[name].append(replacement)
+            offsets[name].append((start, end, view_start, view_start + len(replacement)))
+            lengths[name] = view_start + len(replacement)
+
+        cursor = end
+
+    tail = text[cursor:]
+    return {
+        name: (''.join(parts[name]) + tail, offsets[name])
+        for name in views
+    }
+
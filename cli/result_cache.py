@@ -0,0 +1,113 @@
+"""
+Diskcache för färdigbearbetade dokument.
+
+Nyckeln är SHA-256 av indatafilens bytes tillsammans med PIPELINE_VERSION,
+modell, confidence-tröskel, ordlistorna och övriga inställningar som
+påverkar resultatet, så samma PDF med samma inställningar aldrig behöver
+köras genom docling och NER igen. Resultatet (dict:en från main2) sparas
+som gzip-komprimerad JSON, och när cachen blir större än max_bytes tas de
+minst nyligen använda posterna bort (LRU via filernas mtime).
+
+Konfiguration via miljövariabler:
+    ANONYMIZATION_CACHE_DIR        Katalog för cachen
+    ANONYMIZATION_CACHE_MAX_BYTES  Maxstorlek i bytes (default 512 MB)
+"""
+import os
+import gzip
+import json
+import hashlib
+from pathlib import Path
+
+from atomic import atomic_write
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "cillers-anonymization"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Höjs när detekteringen ändras (regler, spridning, rendering) så att
+# resultat från en äldre version inte återanvänds
+PIPELINE_VERSION = 2
+
+
+class ResultCache:
+    """Diskbaserad LRU-cache för resultat från main2"""
+
+    def __init__(self, directory=None, max_bytes=None):
+        if directory is None:
+            directory = os.environ.get('ANONYMIZATION_CACHE_DIR', DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('ANONYMIZATION_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key_for(data, model_id, confidence_threshold, gazetteers='', options=None):
+        """
+        Beräkna cachenyckeln för ett dokument.
+
+        Args:
+            data: Indatafilens bytes
+            model_id: NER-modellen som används (se ner_model_key)
+            confidence_threshold: Tröskeln för NER-entiteter
+            gazetteers: Nyckeln för de konfigurerade ordlistorna (se gazetteer_key)
+            options: Dict med övriga inställningar som påverkar resultatet,
+                t.ex. {'regex_only': True}
+
+        Returns:
+            Hex-sträng som identifierar kombinationen
+        """
+        digest = hashlib.sha256(data)
+        settings = json.dumps(options or {}, sort_keys=True)
+        digest.update(f"\0{PIPELINE_VERSION}\0{model_id}\0{confidence_threshold}\0{gazetteers}\0{settings}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json.gz"
+
+    def get(self, key):
+        """Returnera det cachade resultatet, eller None om det saknas"""
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                result = json.load(f)
+        except (FileNotFoundError, OSError, json.JSONDecodeError):
+            return None
+
+        # Markera posten som nyligen använd
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """Spara ett resultat och rensa bort gamla poster om cachen är full"""
+        with atomic_write(self._path(key), 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, separators=(',', ':'))
+
+        self.evict()
+
+    def evict(self):
+        """Ta bort de minst nyligen använda posterna tills cachen ryms i max_bytes"""
+        entries = []
+        total = 0
+        for path in self.directory.glob('*.json.gz'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
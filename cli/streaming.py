@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Strömmande bearbetning av stora PDF:er sida för sida.
+
+I stället för att vänta på att hela dokumentet konverterats konverteras en
+sida i taget, och regex- och NER-stegen körs direkt på sidan. Slutet av
+föregående sida skickas med som kontext så att entiteter nära sidbrytningar
+inte förlorar sitt sammanhang. Redaktionerna för varje sida lämnas ut så
+fort sidan är klar.
+
+Ett namn som delas av en sidbrytning redigeras som två spann, ett
+per sida, där den icke-strömmande planen kan ha ett spann över separatorn.
+Samma tecken i sidornas text redigeras i båda fallen.
+
+Användning:
+    python cli/streaming.py <input_pdf>
+"""
+import sys
+import json
+from pathlib import Path
+
+from censurering import (
+    create_ner_pipeline, build_censoring_plan, generate_redactions_from_plan,
+    create_converter, original_stderr, NER_CONFIDENCE_THRESHOLD,
+)
+
+# Texten från olika sidor sätts ihop på samma sätt som docling gör med stycken
+PAGE_SEPARATOR = "\n\n"
+
+
+def count_pdf_pages(pdf_path):
+    """Räkna antalet sidor utan att konvertera dokumentet"""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _context_tail(text, context_chars):
+    """Returnera slutet av texten, avklippt vid ett blanksteg så att inga ord delas"""
+    if len(text) <= context_chars:
+        return text
+
+    tail = text[-context_chars:]
+    space = tail.find(' ')
+    return tail[space + 1:] if space >= 0 else tail
+
+
+def stream_pdf(pdf_path, ner_pipeline=None, converter=None,
+               confidence_threshold=NER_CONFIDENCE_THRESHOLD, batch_size=8, context_chars=256):
+    """
+    Konvertera och analysera en PDF sida för sida.
+
+    Args:
+        pdf_path: Sökväg till PDF-filen
+        ner_pipeline: Färdigladdad NER-pipeline (skapas om den inte anges)
+        converter: Färdig DocumentConverter (skapas om den inte anges)
+        confidence_threshold: Lägsta score för NER-entiteter
+        batch_size: Antal tokenfönster per forward pass i NER-steget
+        context_chars: Antal tecken från föregående sida som används som kontext
+
+    Yields:
+        Dict per sida med 'page', 'page_count', 'offset' (sidans startposition
+        i hela dokumentets text), 'text' och 'redactions' (med positioner
+        relativt till hela dokumentet)
+    """
+    pdf_path = Path(pdf_path)
+    if converter is None:
+        converter = create_converter()
+    if ner_pipeline is None:
+        ner_pipeline = create_ner_pipeline()
+
+    page_count = count_pdf_pages(pdf_path)
+    document_length = 0
+    carry = ""
+
+    for page_no in range(1, page_count + 1):
+        result = converter.convert(pdf_path, page_range=(page_no, page_no))
+        page_text = result.document.export_to_text()
+
+        # Sidans position i dokumentets sammanfogade text
+        if page_text and document_length > 0:
+            page_offset = document_length + len(PAGE_SEPARATOR)
+        else:
+            page_offset = document_length
+
+        redactions = []
+        if page_text.strip():
+            # Kör regex och NER på sidan med slutet av föregående sida som kontext
+            prefix = carry + PAGE_SEPARATOR if carry else ""
+            plan = build_censoring_plan(prefix + page_text, ner_pipeline,
+                                        confidence_threshold, batch_size)
+
+            # Behåll bara spann på den här sidan, i sidans koordinater. Delen
+            # av ett spann som ligger i kontexten har redan rapporterats för
+            # föregående sida, men ett spann som fortsätter över sidbrytningen
+            # (t.ex. ett namn som NER slagit ihop över separatorn) behåller
+            # sin del på den här sidan.
+            page_plan = []
+            for item in plan:
+                start = item['start'] - len(prefix)
+                end = item['end'] - len(prefix)
+                if start < 0:
+                    if end <= 0:
+                        continue
+                    # Hoppa över blanksteg i början av sidan
+                    start = len(page_text[:end]) - len(page_text[:end].lstrip())
+                    if start >= end:
+                        continue
+                    item['word'] = page_text[start:end]
+                item['start'] = start
+                item['end'] = end
+                page_plan.append(item)
+
+            redactions = generate_redactions_from_plan(page_text, page_plan)
+
+            for redaction in redactions:
+                redaction['start'] += page_offset
+                redaction['end'] += page_offset
+
+        if page_text:
+            document_length = page_offset + len(page_text)
+            carry = _context_tail(page_text, context_chars)
+
+        yield {
+            'page': page_no,
+            'page_count': page_count,
+            'offset': page_offset,
+            'text': page_text,
+            'redactions': redactions,
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python streaming.py <input_pdf>")
+        sys.exit(1)
+
+    # stdout används för resultatet, all loggning från pipelinen går till stderr
+    output = sys.stdout
+    sys.stdout = original_stderr
+
+    for page in stream_pdf(sys.argv[1]):
+        output.write(json.dumps(page, ensure_ascii=False) + '\n')
+        output.flush()
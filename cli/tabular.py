@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Anonymisering av tabellexporter (CSV och Parquet) i radbatchar.
+
+Filen läses batch för batch så att minnesåtgången inte beror på filens
+storlek. I varje batch hanteras två sorters kolumner:
+
+    Strukturerade kolumner (t.ex. FirstName, LastName) innehåller bara
+    personuppgifter och maskeras direkt, kolumnvis: varje unikt värde i
+    batchen maskeras en gång (för Parquet via dictionary-kodning i pyarrow).
+
+    Fritextkolumner (t.ex. TextValue) körs genom samma regex- och NER-steg
+    som PDF:erna. Unika celler som inte redan finns i LRU-cachen samlas
+    från alla fritextkolumner i batchen och körs genom NER i ett anrop
+    (run_ner_many), så fönstren från många korta celler delar forward passes.
+
+    Radens identifierare (t.ex. FirstName, LastName, NationalAssociation)
+    söks först upp i fritexten. Celler där inga tvetydiga ord med stor
+    begynnelsebokstav finns kvar efter det körs inte genom NER alls.
+
+Utdata skrivs med samma kolumner, avgränsare och schema som indata.
+Parquet kräver pyarrow, som inte ingår i requirements.txt.
+
+Användning:
+    python cli/tabular.py resources/example-data.csv anonymized.csv --encoding cp1252
+    python cli/tabular.py export.parquet anonymized.parquet [--mask-columns FirstName,LastName]
+        [--text-columns TextValue] [--context-columns FirstName,LastName,NationalAssociation]
+        [--batch-rows 2000] [--regex-only] [--verbose]
+"""
+import sys
+import csv
+import logging
+import argparse
+from pathlib import Path
+from collections import OrderedDict
+
+from censurering import build_censoring_plan, create_ner_pipeline, logger, NER_CONFIDENCE_THRESHOLD
+from chunking import run_ner_many
+from instrumentation import Metrics, report
+from propagation import DictionaryMatcher
+from render import render_views, censored_replacement
+from wordlists import ENGLISH_STOPWORDS, SWEDISH_STOPWORDS, WORD_PATTERN
+
+DEFAULT_DELIMITER = ';'
+DEFAULT_MASK_COLUMNS = ('FirstName', 'LastName')
+DEFAULT_TEXT_COLUMNS = ('TextValue',)
+DEFAULT_CONTEXT_COLUMNS = ('FirstName', 'LastName', 'NationalAssociation')
+DEFAULT_BATCH_ROWS = 2000
+DEFAULT_CACHE_SIZE = 100_000
+MATCHER_CACHE_SIZE = 1024
+
+# Entitetstyp för träffar på identifierarna i respektive kolumn
+CONTEXT_ENTITY_TYPES = {'FirstName': 'PER', 'LastName': 'PER', 'NationalAssociation': 'ORG'}
+MIN_LITERAL_CHARS = 2
+
+# Småord som ofta står först i en mening och då inte gör texten tvetydig
+COMMON_WORDS = ENGLISH_STOPWORDS | SWEDISH_STOPWORDS | frozenset([
+    'i', 'we', 'our', 'you', 'your', 'my', 'there', 'when', 'if', 'but', 'no', 'yes', 'some', 'all',
+])
+
+
+def mask_value(value):
+    """Maskera ett helt värde med lika många asterisker (tomma värden lämnas)"""
+    return '*' * len(value) if value else value
+
+
+class TextAnonymizer:
+    """
+    Censurerar fritextceller med deduplicering och begränsade LRU-cacher.
+
+    Varje cell kan ha en kontext med radens kända identifierare (se
+    row_context). De söks upp i cellen med en DictionaryMatcher innan NER,
+    och om inga tvetydiga ord med stor begynnelsebokstav finns kvar hoppas
+    NER över för cellen. NER-resultat cachas per text, eftersom de inte
+    beror på radens kontext, och färdiga censurerade celler per (text, kontext).
+    """
+
+    def __init__(self, ner_pipeline=None, confidence_threshold=NER_CONFIDENCE_THRESHOLD, batch_size=8,
+                 cache_size=DEFAULT_CACHE_SIZE, metrics=None):
+        """
+        Args:
+            ner_pipeline: NER-pipeline, eller None för att bara köra regex
+            confidence_threshold: Lägsta score för NER-entiteter
+            batch_size: Antal tokenfönster per forward pass
+            cache_size: Max antal poster i varje cache
+            metrics: Metrics som tid och räknare läggs till i
+        """
+        self.ner_pipeline = ner_pipeline
+        self.confidence_threshold = confidence_threshold
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._censored = OrderedDict()  # (text, kontext) -> censurerad text
+        self._entities = OrderedDict()  # text -> NER-entiteter
+        self._matchers = OrderedDict()  # kontext -> DictionaryMatcher
+
+    def _get(self, cache, key):
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+    def _put(self, cache, key, value, size=None):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > (size or self.cache_size):
+            cache.popitem(last=False)
+
+    def literal_spans(self, text, context):
+        """Förekomster av radens identifierare i texten, som spann i planens format"""
+        if not context:
+            return []
+
+        matcher = self._get(self._matchers, context)
+        if matcher is None:
+            matcher = DictionaryMatcher(context_literals(context))
+            self._put(self._matchers, context, matcher, MATCHER_CACHE_SIZE)
+
+        return [
+            {'start': start, 'end': end, 'word': text[start:end], 'entity_type': entity_type, 'score': 1.0}
+            for start, end, entity_type in matcher.finditer(text)
+        ]
+
+    def censor(self, text, ner_entities=None, literal_spans=None):
+        """Censurera en text med redan framtagna NER-entiteter och identifierare"""
+        plan = build_censoring_plan(text, None, self.confidence_threshold, self.batch_size, self.metrics,
+                                    ner_entities=ner_entities, extra_spans=literal_spans)
+        rendered = render_views(text, plan, {'censored': censored_replacement})
+        return rendered['censored'][0]
+
+    def censor_many(self, cells):
+        """
+        Censurera en lista med celler.
+
+        Args:
+            cells: Lista med (text, kontext) där kontext kommer från
+                row_context (eller är None)
+
+        Returns:
+            Dict med varje unik (text, kontext) med icke-tom text -> censurerad text
+        """
+        results = {}
+        missing = []
+        for key in dict.fromkeys(cells):
+            if not key[0]:
+                continue
+            censored = self._get(self._censored, key)
+            if censored is None:
+                missing.append(key)
+            else:
+                results[key] = censored
+
+        self.metrics.count('text_unique', len(results) + len(missing))
+        self.metrics.count('text_cache_hits', len(results))
+        if not missing:
+            return results
+
+        # Radens identifierare först, NER bara för texter där något är oklart
+        with self.metrics.stage('literals'):
+            literals = {key: self.literal_spans(*key) for key in missing}
+        self.metrics.count('literal_matches', sum(len(spans) for spans in literals.values()))
+
+        entities = {}
+        if self.ner_pipeline is not None:
+            ner_texts = list(dict.fromkeys(
+                text for text, context in missing if has_ambiguous_words(text, literals[(text, context)])
+            ))
+            self.metrics.count('ner_skipped', len(missing) - len(ner_texts))
+
+            pending = []
+            for text in ner_texts:
+                cached = self._get(self._entities, text)
+                if cached is None:
+                    pending.append(text)
+                else:
+                    entities[text] = cached
+            self.metrics.count('ner_cache_hits', len(ner_texts) - len(pending))
+
+            if pending:
+                with self.metrics.stage('ner'):
+                    outputs = run_ner_many(pending, self.ner_pipeline, self.confidence_threshold, self.batch_size,
+                                           metrics=self.metrics)
+                for text, text_entities in zip(pending, outputs):
+                    entities[text] = text_entities
+                    self._put(self._entities, text, text_entities)
+
+        for key in missing:
+            text = key[0]
+            if self.ner_pipeline is None:
+                ner_entities = None
+            else:
+                # Texter utan tvetydiga ord räknas som NER-körda utan träffar
+                ner_entities = entities.get(text, [])
+            censored = self.censor(text, ner_entities, literals[key])
+            results[key] = censored
+            self._put(self._censored, key, censored)
+
+        return results
+
+
+def row_context(values, context_columns):
+    """
+    Radens identifierare som en hashbar kontext.
+
+    Args:
+        values: Dict med kolumnnamn -> värde för raden
+        context_columns: Kolumner med identifierare
+
+    Returns:
+        Tuple med (entitetstyp, värde), eller None om raden saknar identifierare
+    """
+    context = tuple(
+        (CONTEXT_ENTITY_TYPES.get(name, 'MISC'), values[name].strip())
+        for name in context_columns if values[name] and values[name].strip()
+    )
+    return context or None
+
+
+def context_literals(context):
+    """
+    Ytformerna som söks upp för en kontext: hela värdet, och för namn även
+    varje del av det (så att 'Anna Karin' också hittar 'Karin')
+    """
+    for entity_type, value in context:
+        yield value, entity_type
+        if entity_type == 'PER':
+            for part in WORD_PATTERN.findall(value):
+                if len(part) >= MIN_LITERAL_CHARS and part != value:
+                    yield part, entity_type
+
+
+def has_ambiguous_words(text, spans):
+    """
+    Sant om texten har ord med stor begynnelsebokstav som inte täcks av ett
+    spann och inte är vanliga småord, dvs. ord som kan vara namn som bara
+    NER kan avgöra
+    """
+    for match in WORD_PATTERN.finditer(text):
+        word = match.group()
+        if not word[0].isupper() or word.lower() in COMMON_WORDS:
+            continue
+        if any(span['start'] <= match.start() and match.end() <= span['end'] for span in spans):
+            continue
+        return True
+    return False
+
+
+def anonymize_columns(columns, mask_columns, text_columns, anonymizer, metrics, context_columns=()):
+    """
+    Anonymisera en batch där varje kolumn är en lista med värden.
+
+    Returns:
+        Samma dict med de maskerade och censurerade kolumnerna utbytta
+    """
+    # Identifierarna läses innan kolumnerna maskeras
+    rows = len(next(iter(columns.values()), []))
+    contexts = [
+        row_context({name: columns[name][row] for name in context_columns}, context_columns)
+        for row in range(rows)
+    ] if context_columns else [None] * rows
+
+    with metrics.stage('mask'):
+        for name in mask_columns:
+            values = columns[name]
+            masked = {value: mask_value(value) for value in set(values)}
+            columns[name] = [masked[value] for value in values]
+            metrics.count('masked_cells', sum(1 for value in values if value))
+
+    with metrics.stage('text'):
+        censored = anonymizer.censor_many(
+            [(value, context) for name in text_columns for value, context in zip(columns[name], contexts)])
+        for name in text_columns:
+            columns[name] = [censored.get((value, context), value) for value, context in zip(columns[name], contexts)]
+            metrics.count('text_cells', len(columns[name]))
+
+    return columns
+
+
+def _check_columns(available, *column_groups):
+    missing = [name for columns in column_groups for name in columns if name not in available]
+    if missing:
+        raise ValueError(f"Kolumnerna {', '.join(missing)} finns inte i filen")
+
+
+def _csv_batches(reader, width, batch_rows):
+    """Läs rader från en csv.reader och ge dem kolumnvis i batchar"""
+    rows = []
+    for row in reader:
+        # Korta rader fylls ut så att alla kolumner har lika många värden
+        rows.append(row + [''] * (width - len(row)) if len(row) < width else row[:width])
+        if len(rows) >= batch_rows:
+            yield [list(column) for column in zip(*rows)]
+            rows = []
+    if rows:
+        yield [list(column) for column in zip(*rows)]
+
+
+def anonymize_csv(input_path, output_path, mask_columns, text_columns, anonymizer, metrics,
+                  delimiter=DEFAULT_DELIMITER, encoding='utf-8', batch_rows=DEFAULT_BATCH_ROWS, context_columns=()):
+    """Anonymisera en CSV-fil batch för batch"""
+    csv.field_size_limit(sys.maxsize)
+
+    with open(input_path, encoding=encoding, newline='') as source, \
+            open(output_path, 'w', encoding=encoding, newline='') as target:
+        reader = csv.reader(source, delimiter=delimiter)
+        writer = csv.writer(target, delimiter=delimiter, lineterminator='\n')
+
+        header = next(reader, None)
+        if header is None:
+            return
+        _check_columns(header, mask_columns, text_columns, context_columns)
+        writer.writerow(header)
+
+        for values in _csv_batches(reader, len(header), batch_rows):
+            columns = anonymize_columns(dict(zip(header, values)), mask_columns, text_columns, anonymizer, metrics,
+                                        context_columns)
+            writer.writerows(zip(*(columns[name] for name in header)))
+            metrics.count('rows', len(values[0]))
+
+
+def _map_arrow(column, mapping):
+    """Byt ut värdena i en strängkolumn via dess unika värden (nulls lämnas)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    encoded = pc.dictionary_encode(column)
+    dictionary = encoded.dictionary.to_pylist()
+    replaced = pa.array([mapping(value) for value in dictionary], type=column.type)
+    return pc.take(replaced, encoded.indices)
+
+
+def anonymize_parquet(input_path, output_path, mask_columns, text_columns, anonymizer, metrics,
+                      batch_rows=DEFAULT_BATCH_ROWS, context_columns=()):
+    """Anonymisera en Parquet-fil batch för batch med pyarrow"""
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet kräver pyarrow, som inte är installerat (pip install pyarrow)") from e
+
+    source = pq.ParquetFile(input_path)
+    schema = source.schema_arrow
+    _check_columns(schema.names, mask_columns, text_columns, context_columns)
+    for name in (*mask_columns, *text_columns, *context_columns):
+        field_type = schema.field(name).type
+        if not (pa.types.is_string(field_type) or pa.types.is_large_string(field_type)):
+            raise ValueError(f"Kolumnen {name} är inte en strängkolumn ({field_type})")
+
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for batch in source.iter_batches(batch_size=batch_rows):
+            arrays = {name: batch.column(name) for name in schema.names}
+
+            # Identifierarna läses innan kolumnerna maskeras
+            if context_columns:
+                context_values = [arrays[name].to_pylist() for name in context_columns]
+                contexts = [row_context(dict(zip(context_columns, row)), context_columns)
+                            for row in zip(*context_values)]
+            else:
+                contexts = [None] * batch.num_rows
+
+            with metrics.stage('mask'):
+                for name in mask_columns:
+                    arrays[name] = _map_arrow(arrays[name], mask_value)
+                    metrics.count('masked_cells', len(arrays[name]) - arrays[name].null_count)
+
+            with metrics.stage('text'):
+                if context_columns:
+                    # Resultatet beror på raden, så kolumnerna byts ut rad för rad
+                    texts = {name: arrays[name].to_pylist() for name in text_columns}
+                    censored = anonymizer.censor_many(
+                        [(value, context) for name in text_columns for value, context in zip(texts[name], contexts)])
+                    for name in text_columns:
+                        arrays[name] = pa.array(
+                            [censored.get((value, context), value) for value, context in zip(texts[name], contexts)],
+                            type=arrays[name].type)
+                else:
+                    unique = [(value, None) for name in text_columns
+                              for value in pc.unique(arrays[name]).to_pylist() if value is not None]
+                    censored = anonymizer.censor_many(unique)
+                    for name in text_columns:
+                        arrays[name] = _map_arrow(arrays[name], lambda value: censored.get((value, None), value))
+                for name in text_columns:
+                    metrics.count('text_cells', len(arrays[name]))
+
+            writer.write_batch(pa.RecordBatch.from_arrays([arrays[name] for name in schema.names], schema=schema))
+            metrics.count('rows', batch.num_rows)
+
+
+def anonymize_table(input_path, output_path, mask_columns=DEFAULT_MASK_COLUMNS, text_columns=DEFAULT_TEXT_COLUMNS,
+                    ner_pipeline=None, delimiter=DEFAULT_DELIMITER, encoding='utf-8',
+                    batch_rows=DEFAULT_BATCH_ROWS, cache_size=DEFAULT_CACHE_SIZE,
+                    confidence_threshold=NER_CONFIDENCE_THRESHOLD, metrics=None,
+                    context_columns=DEFAULT_CONTEXT_COLUMNS):
+    """
+    Anonymisera en CSV- eller Parquet-fil (väljs på filändelsen).
+
+    Args:
+        input_path: Filen som ska anonymiseras
+        output_path: Filen som skrivs, med samma kolumner som indata
+        mask_columns: Kolumner som maskeras helt
+        text_columns: Fritextkolumner som körs genom regex och NER
+        ner_pipeline: NER-pipeline, eller None för att bara köra regex
+        delimiter: Avgränsare i CSV-filer
+        encoding: Teckenkodning för CSV-filer
+        batch_rows: Antal rader per batch
+        cache_size: Max antal censurerade fritextceller i LRU-cachen
+        confidence_threshold: Lägsta score för NER-entiteter
+        metrics: Metrics som tid och räknare läggs till i
+        context_columns: Kolumner med radens identifierare, som söks upp i
+            fritexten före NER
+
+    Returns:
+        Metrics för körningen
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    anonymizer = TextAnonymizer(ner_pipeline, confidence_threshold, cache_size=cache_size, metrics=metrics)
+    if Path(input_path).suffix.lower() == '.parquet':
+        anonymize_parquet(input_path, output_path, mask_columns, text_columns, anonymizer, metrics, batch_rows,
+                          context_columns)
+    else:
+        anonymize_csv(input_path, output_path, mask_columns, text_columns, anonymizer, metrics,
+                      delimiter, encoding, batch_rows, context_columns)
+
+    report(metrics, input=str(input_path))
+    return metrics
+
+
+def _column_list(value):
+    return tuple(name.strip() for name in value.split(',') if name.strip())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Anonymisera en CSV- eller Parquet-export.')
+    parser.add_argument('input', help='CSV- eller Parquet-fil')
+    parser.add_argument('output', help='Utdatafil i samma format')
+    parser.add_argument('--mask-columns', type=_column_list, default=DEFAULT_MASK_COLUMNS,
+                        help='Kommaseparerade kolumner som maskeras helt')
+    parser.add_argument('--text-columns', type=_column_list, default=DEFAULT_TEXT_COLUMNS,
+                        help='Kommaseparerade fritextkolumner')
+    parser.add_argument('--context-columns', type=_column_list, default=DEFAULT_CONTEXT_COLUMNS,
+                        help='Kommaseparerade kolumner med radens identifierare (tom sträng stänger av)')
+    parser.add_argument('--delimiter', default=DEFAULT_DELIMITER, help='Avgränsare i CSV-filer')
+    parser.add_argument('--encoding', default='utf-8', help='Teckenkodning för CSV-filer')
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help='Antal rader per batch')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='Max antal fritextceller i cachen')
+    parser.add_argument('--regex-only', action='store_true', help='Kör bara regex-steget, ingen NER-modell')
+    parser.add_argument('--verbose', action='store_true', help='Visa stegloggen för varje cell')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+
+    ner_pipeline = None if args.regex_only else create_ner_pipeline()
+    try:
+        metrics = anonymize_table(args.input, args.output, args.mask_columns, args.text_columns, ner_pipeline,
+                                  args.delimiter, args.encoding, args.batch_rows, args.cache_size,
+                                  context_columns=args.context_columns)
+    except UnicodeDecodeError as e:
+        # sys.stderr är ersatt med NullWriter, så felet måste loggas för att synas
+        logger.error(f"Kunde inte läsa {args.input} som {args.encoding} ({e}). "
+                     f"Ange filens teckenkodning med --encoding, t.ex. --encoding cp1252")
+        sys.exit(1)
+    except (ImportError, OSError, ValueError) as e:
+        logger.error(f"Kunde inte anonymisera {args.input}: {e}")
+        sys.exit(1)
+    print(metrics.to_json_line(input=args.input))
@@ -0,0 +1,19 @@
+"""
+Ordlistor och ordmönster som delas av språkdetekteringen i models.py och
+tabellanonymiseringen i tabular.py.
+"""
+import re
+
+SWEDISH_STOPWORDS = frozenset([
+    'och', 'att', 'det', 'som', 'är', 'på', 'för', 'med', 'har', 'inte', 'jag',
+    'till', 'av', 'om', 'den', 'var', 'vi', 'de', 'ett', 'men', 'hon', 'han',
+    'kan', 'så', 'sig', 'hade', 'från', 'eller', 'vid', 'efter', 'också',
+])
+ENGLISH_STOPWORDS = frozenset([
+    'the', 'and', 'to', 'of', 'in', 'is', 'that', 'for', 'it', 'with', 'was',
+    'on', 'as', 'he', 'she', 'be', 'at', 'by', 'have', 'not', 'this', 'are',
+    'his', 'her', 'from', 'or', 'they', 'has', 'had', 'also', 'after',
+])
+
+# Ord som bara består av bokstäver (siffror och understreck avgränsar)
+WORD_PATTERN = re.compile(r'[^\W\d_]+')
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Modulerna i cli/ och benchmarks/ importeras som toppnivåmoduler, precis som när skripten körs
+sys.path.insert(0, str(REPO_DIR / "benchmarks"))
+sys.path.insert(0, str(REPO_DIR / "cli"))
+
+import re
+
+import pytest
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+NAME_PATTERN = re.compile(r"\b[A-ZÅÄÖ][a-zåäö]+\b")
+
+
+class FakeTokenizer:
+    """Ordtokenizer med samma utdata som en snabb tokenizer med overflow och stride"""
+
+    def __call__(self, text, return_offsets_mapping=True, return_overflowing_tokens=True,
+                 truncation=True, max_length=512, stride=128):
+        tokens = [match.span() for match in TOKEN_PATTERN.finditer(text)]
+        size = max_length - 2
+        windows = []
+        start = 0
+        while True:
+            windows.append([(0, 0)] + tokens[start:start + size] + [(0, 0)])
+            if start + size >= len(tokens):
+                break
+            start += size - stride
+        return {'offset_mapping': windows}
+
+
+class FakeNerPipeline:
+    """Hittar ord med stor begynnelsebokstav som PER, oberoende av sammanhanget"""
+
+    def __init__(self, score=0.95):
+        self.tokenizer = FakeTokenizer()
+        self.score = score
+        self.calls = []
+
+    def entities(self, text):
+        return [
+            {'entity_group': 'PER', 'score': self.score, 'start': match.start(),
+             'end': match.end(), 'word': match.group()}
+            for match in NAME_PATTERN.finditer(text)
+        ]
+
+    def __call__(self, chunks, batch_size=8):
+        self.calls.append(len(chunks))
+        return [self.entities(chunk) for chunk in chunks]
+
+
+@pytest.fixture
+def fake_ner():
+    return FakeNerPipeline()
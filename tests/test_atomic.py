@@ -0,0 +1,51 @@
+import pytest
+
+from atomic import atomic_directory, atomic_write
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text("gammal", encoding="utf-8")
+
+    with atomic_write(path, encoding="utf-8") as f:
+        f.write("ny")
+        assert path.read_text(encoding="utf-8") == "gammal"
+
+    assert path.read_text(encoding="utf-8") == "ny"
+    assert [p.name for p in tmp_path.iterdir()] == ["manifest.json"]
+
+
+def test_failed_atomic_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "index.gaz"
+    path.write_bytes(b"gammal")
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(path, "wb") as f:
+            f.write(b"halv")
+            raise RuntimeError("avbruten")
+
+    assert path.read_bytes() == b"gammal"
+    assert [p.name for p in tmp_path.iterdir()] == ["index.gaz"]
+
+
+def test_atomic_directory_replaces_the_directory(tmp_path):
+    target = tmp_path / "hf" / "modell"
+    target.mkdir(parents=True)
+    (target / "gammal.bin").write_bytes(b"x")
+    # Rest från en tidigare avbruten skrivning
+    (tmp_path / "hf" / ".modell.tmp").mkdir()
+
+    with atomic_directory(target) as temp:
+        (temp / "model.safetensors").write_bytes(b"y")
+        assert (target / "gammal.bin").exists()
+
+    assert [p.name for p in target.iterdir()] == ["model.safetensors"]
+    assert [p.name for p in (tmp_path / "hf").iterdir()] == ["modell"]
+
+    with pytest.raises(RuntimeError):
+        with atomic_directory(target) as temp:
+            (temp / "halv.bin").write_bytes(b"z")
+            raise RuntimeError("avbruten")
+
+    assert [p.name for p in target.iterdir()] == ["model.safetensors"]
+    assert [p.name for p in (tmp_path / "hf").iterdir()] == ["modell"]
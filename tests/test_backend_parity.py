@@ -0,0 +1,38 @@
+"""
+Paritet mellan ONNX-backends och PyTorch fp32 på resources/txt.
+
+Hoppas över om torch, transformers eller optimum[onnxruntime] saknas.
+"""
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("optimum.onnxruntime")
+
+from bench_backends import load_texts, compare
+from censurering import create_ner_pipeline, NER_CONFIDENCE_THRESHOLD
+from chunking import run_ner
+
+# Lägsta F1 mot referensen: ONNX fp32 ska ge samma entiteter, int8 får avvika lite
+MIN_F1 = {'onnx': 0.99, 'onnx-int8': 0.95}
+
+
+def _entities(backend, texts):
+    ner_pipeline = create_ner_pipeline(backend)
+    return {name: run_ner(text, ner_pipeline, NER_CONFIDENCE_THRESHOLD) for name, text in texts.items()}
+
+
+@pytest.fixture(scope="module")
+def texts():
+    return load_texts()
+
+
+@pytest.fixture(scope="module")
+def reference(texts):
+    return _entities('torch', texts)
+
+
+@pytest.mark.parametrize("backend", sorted(MIN_F1))
+def test_entities_match_torch(backend, texts, reference):
+    parity = compare(reference, _entities(backend, texts))
+    assert parity['f1'] >= MIN_F1[backend], parity
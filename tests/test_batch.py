@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+import batch
+from batch import load_completed, output_path_for, run_batch, PROGRESS_FILE
+
+
+class ThreadExecutor(ThreadPoolExecutor):
+    """ProcessPoolExecutor-ersättare som kör jobben i trådar i testprocessen"""
+
+    def __init__(self, max_workers, mp_context=None, initializer=None, initargs=()):
+        super().__init__(max_workers=max_workers)
+
+
+@pytest.fixture
+def fake_processing(monkeypatch):
+    """Ersätt arbetsprocesserna och main2 med en fil per jobb och räkna samtidiga jobb"""
+    state = {'running': 0, 'max_running': 0, 'files': [], 'fail': set()}
+    lock = threading.Lock()
+
+    def process_file(pdf_path, output_path):
+        with lock:
+            state['running'] += 1
+            state['max_running'] = max(state['max_running'], state['running'])
+            state['files'].append(Path(pdf_path).name)
+        try:
+            time.sleep(0.02)
+            if Path(pdf_path).name in state['fail']:
+                raise RuntimeError("trasig pdf")
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(output_path).write_text("[]", encoding="utf-8")
+            return 0
+        finally:
+            with lock:
+                state['running'] -= 1
+
+    monkeypatch.setattr(batch, 'ProcessPoolExecutor', ThreadExecutor)
+    monkeypatch.setattr(batch, '_process_file', process_file)
+    return state
+
+
+def make_pdfs(directory, names):
+    for name in names:
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"%PDF-1.4")
+
+
+def test_output_path_keeps_directory_structure(tmp_path):
+    root = tmp_path / "in"
+    output = tmp_path / "out"
+    assert output_path_for(root / "a" / "b.pdf", root, output) == output / "a" / "b.redactions.json"
+
+
+def test_output_path_outside_root_is_unique(tmp_path):
+    root = tmp_path / "in"
+    output = tmp_path / "out"
+    first = output_path_for(tmp_path / "x" / "report.pdf", root, output)
+    second = output_path_for(tmp_path / "y" / "report.pdf", root, output)
+
+    assert first.parent == second.parent == output
+    assert first.name.startswith("report-") and first.name.endswith(".redactions.json")
+    assert first != second
+    assert first == output_path_for(tmp_path / "x" / "report.pdf", root, output)
+
+
+def test_load_completed_only_counts_successful_files(tmp_path):
+    progress = tmp_path / PROGRESS_FILE
+    assert load_completed(progress) == set()
+
+    progress.write_text(
+        json.dumps({'file': 'a.pdf', 'status': 'ok'}) + '\n'
+        + json.dumps({'file': 'b.pdf', 'status': 'error', 'error': 'trasig'}) + '\n'
+        + '{"file": "c.pdf", "sta',  # Avbruten mitt i raden
+        encoding="utf-8")
+    assert load_completed(progress) == {'a.pdf'}
+
+
+def test_pending_queue_is_bounded(tmp_path, fake_processing):
+    source = tmp_path / "in"
+    make_pdfs(source, [f"{index:02}.pdf" for index in range(12)])
+
+    stats = run_batch(source, tmp_path / "out", workers=4, max_pending=2)
+
+    assert stats == {'ok': 12, 'skipped': 0, 'error': 0}
+    assert fake_processing['max_running'] <= 2
+    assert len(list((tmp_path / "out").glob("*.redactions.json"))) == 12
+
+
+def test_resume_skips_completed_and_retries_failed(tmp_path, fake_processing):
+    source = tmp_path / "in"
+    output = tmp_path / "out"
+    make_pdfs(source, ["a.pdf", "b.pdf", "sub/c.pdf"])
+
+    fake_processing['fail'] = {"b.pdf"}
+    assert run_batch(source, output, workers=2) == {'ok': 2, 'skipped': 0, 'error': 1}
+    assert (output / "sub" / "c.redactions.json").exists()
+
+    fake_processing['fail'] = set()
+    fake_processing['files'] = []
+    assert run_batch(source, output, workers=2) == {'ok': 1, 'skipped': 2, 'error': 0}
+    assert fake_processing['files'] == ["b.pdf"]
+
+    entries = [json.loads(line) for line in (output / PROGRESS_FILE).read_text(encoding="utf-8").splitlines()]
+    assert [entry['status'] for entry in entries].count('ok') == 3
+    assert load_completed(output / PROGRESS_FILE) == {str(source / name) for name in ["a.pdf", "b.pdf", "sub/c.pdf"]}
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from batching import MicroBatcher
+
+
+class RecordingPipeline:
+    """Ger en entitet per text och sparar storleken på varje anrop"""
+
+    tokenizer = object()
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    @staticmethod
+    def entities(text):
+        return [{'entity_group': 'PER', 'score': 0.9, 'start': 0, 'end': len(text), 'word': text}]
+
+    def __call__(self, texts, batch_size=None):
+        self.batches.append(len(texts))
+        if self.gate is not None:
+            self.gate.wait()
+        return [self.entities(text) for text in texts]
+
+
+def run_in_thread(function, *args):
+    result = {}
+
+    def target():
+        try:
+            result['value'] = function(*args)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, result
+
+
+def test_concurrent_calls_get_their_own_results():
+    pipeline = RecordingPipeline()
+    batcher = MicroBatcher(pipeline, max_windows=16, max_wait_ms=20)
+    inputs = [[f"text {caller} {index}" for index in range(caller % 5 + 1)] for caller in range(20)]
+
+    calls = [run_in_thread(batcher, texts) for texts in inputs]
+    for thread, _ in calls:
+        thread.join(5)
+    batcher.close()
+
+    for texts, (_, result) in zip(inputs, calls):
+        assert result['value'] == [pipeline.entities(text) for text in texts]
+    assert batcher.stats['windows'] == sum(map(len, inputs))
+    assert max(pipeline.batches) <= 16 and len(pipeline.batches) < len(inputs)
+
+
+def test_single_string_gives_a_single_list():
+    batcher = MicroBatcher(RecordingPipeline())
+    assert batcher("Anna") == RecordingPipeline.entities("Anna")
+    assert batcher([]) == []
+    batcher.close()
+
+
+def test_full_batch_is_flushed_without_waiting():
+    pipeline = RecordingPipeline()
+    batcher = MicroBatcher(pipeline, max_windows=4, max_wait_ms=10_000)
+
+    started = time.monotonic()
+    batcher(["a", "b", "c", "d"])
+    assert time.monotonic() - started < 5
+    assert pipeline.batches == [4]
+    batcher.close()
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    pipeline = RecordingPipeline()
+    batcher = MicroBatcher(pipeline, max_windows=100, max_wait_ms=50)
+
+    started = time.monotonic()
+    batcher(["a"])
+    assert 0.04 <= time.monotonic() - started < 5
+    assert pipeline.batches == [1]
+    batcher.close()
+
+
+def test_pipeline_errors_reach_every_caller_in_the_batch():
+    class FailingPipeline(RecordingPipeline):
+        def __call__(self, texts, batch_size=None):
+            raise ValueError("trasig modell")
+
+    batcher = MicroBatcher(FailingPipeline(), max_windows=2, max_wait_ms=1000)
+    calls = [run_in_thread(batcher, ["a"]) for _ in range(2)]
+    for thread, _ in calls:
+        thread.join(5)
+    assert all(isinstance(result['error'], ValueError) for _, result in calls)
+    batcher.close()
+
+
+def test_close_fails_queued_callers_instead_of_hanging():
+    gate = threading.Event()
+    pipeline = RecordingPipeline(gate)
+    batcher = MicroBatcher(pipeline, max_windows=1, max_wait_ms=0)
+
+    # Det första anropet körs (och blockeras i pipelinen), det andra ligger i kön
+    running, running_result = run_in_thread(batcher, ["a"])
+    while not pipeline.batches:
+        time.sleep(0.001)
+    queued, queued_result = run_in_thread(batcher, ["b"])
+    while batcher._queue.empty():
+        time.sleep(0.001)
+
+    closing, _ = run_in_thread(batcher.close)
+    queued.join(5)
+    assert isinstance(queued_result['error'], RuntimeError)
+
+    gate.set()
+    running.join(5)
+    closing.join(5)
+    assert running_result['value'] == [RecordingPipeline.entities("a")]
+    assert not closing.is_alive()
+
+    with pytest.raises(RuntimeError):
+        batcher(["c"])
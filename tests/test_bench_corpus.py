@@ -0,0 +1,25 @@
+from bench_utils import percentile
+from bench_corpus import label_recall, load_corpus, run_stages
+from censurering import build_censoring_plan
+
+
+def test_run_stages_times_the_production_plan(fake_ner):
+    text = load_corpus()[0]['text']
+    timings, plan = run_stages(text, fake_ner, 0.5)
+
+    assert plan == build_censoring_plan(text, fake_ner, 0.5)
+    assert {'regex', 'ner', 'propagate', 'resolve', 'render', 'json', 'plan'} <= set(timings)
+
+
+def test_label_recall_counts_repeated_labels_in_order():
+    text = "Anna och Anna och Erik"
+    plan = [{'start': 0, 'end': 4}]
+    assert label_recall(text, ["Anna", "Anna", "Bo"], plan) == {
+        'found': 1, 'total': 2, 'not_in_text': 1, 'recall': 0.5,
+    }
+
+
+def test_percentile_uses_nearest_rank():
+    samples = [5, 1, 4, 2, 3]
+    assert [percentile(samples, fraction) for fraction in (0.0, 0.2, 0.5, 0.99, 1.0)] == [1, 1, 3, 5, 5]
+    assert percentile([7], 0.5) == 7
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from chunking import reconcile_windows, run_ner, token_windows
+
+WORDS = ["och", "att", "det", "Anna", "Svensson", "i", "Malmö", "som", "har", "Erik", "en", "hund", "."]
+
+
+def random_text(seed, words=3000):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def is_word_boundary(text, pos):
+    return pos in (0, len(text)) or not (text[pos - 1].isalnum() and text[pos].isalnum())
+
+
+def keys(entities):
+    return [(e['start'], e['end'], e['entity_group']) for e in entities]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_windows_cover_the_text_on_word_boundaries(fake_ner, seed):
+    text = random_text(seed)
+    windows = token_windows(text, fake_ner.tokenizer, max_length=64, stride=16)
+
+    assert len(windows) > 1
+    assert windows[0][0] == 0 and windows[-1][1] == len(text)
+    for (_, end), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start <= end
+    for start, end in windows:
+        assert is_word_boundary(text, start) and is_word_boundary(text, end)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_run_ner_matches_one_pass_over_the_whole_text(fake_ner, seed):
+    text = random_text(seed)
+    entities = run_ner(text, fake_ner, max_length=64, stride=16)
+    assert keys(entities) == keys(fake_ner.entities(text))
+    assert all(text[e['start']:e['end']] == e['word'] for e in entities)
+
+
+def test_reconcile_keeps_one_copy_of_every_entity_the_old_concatenation_found(fake_ner):
+    text = random_text(0)
+    windows = token_windows(text, fake_ner.tokenizer, max_length=64, stride=16)
+    window_entities = []
+    for start, end in windows:
+        entities = fake_ner.entities(text[start:end])
+        for e in entities:
+            e['start'] += start
+            e['end'] += start
+        window_entities.append(entities)
+
+    # Tidigare lades fönstrens entiteter bara efter varandra, med dubbletter i överlappen
+    concatenated = [e for entities in window_entities for e in entities]
+    reconciled = reconcile_windows(windows, window_entities)
+
+    assert len(concatenated) > len(reconciled)
+    assert keys(reconciled) == sorted(set(keys(concatenated)))
+
+
+def test_overlap_is_split_at_its_midpoint():
+    windows = [(0, 100), (60, 200)]
+    first = {'start': 70, 'end': 75, 'entity_group': 'PER', 'window': 0}
+    second = {'start': 90, 'end': 95, 'entity_group': 'PER', 'window': 0}
+    window_entities = [[first, second], [dict(first, window=1), dict(second, window=1)]]
+
+    reconciled = reconcile_windows(windows, window_entities)
+    assert [(e['start'], e['window']) for e in reconciled] == [(70, 0), (90, 1)]
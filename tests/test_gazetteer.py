@@ -0,0 +1,64 @@
+import random
+import string
+
+import pytest
+
+from gazetteer import Gazetteer, classify, compile_gazetteer, find_spans, normalize
+
+
+@pytest.fixture
+def gazetteers(tmp_path):
+    names = tmp_path / "namn.gaz"
+    streets = tmp_path / "gator.gaz"
+    compile_gazetteer(["Åsa", "Lindqvist", "Per  Olof", "åsa"], names, 'name')
+    compile_gazetteer(["Sankt Eriksgatan", "Lilla Nygatan 12"], streets, 'address')
+    return (Gazetteer(names), Gazetteer(streets))
+
+
+def test_lookup_uses_the_normalized_form(gazetteers):
+    names, streets = gazetteers
+    assert len(names) == 3 and names.max_words == 2
+    assert "ÅSA" in names and "asa" in names and "Per Olof" in names
+    assert "Per" not in names and "Olof Per" not in names
+    assert "sankt  eriksgatan" in streets and streets.pii_type == 'address'
+    assert normalize("  Sankt\tEriksgatan ") == "sankt eriksgatan"
+
+
+def test_lookup_matches_a_set_of_the_entries(tmp_path):
+    rng = random.Random(0)
+    words = {''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randrange(2, 10))) for _ in range(20000)}
+    entries = sorted(words)[:10000]
+    path = tmp_path / "ord.gaz"
+    assert compile_gazetteer(entries, path, 'name') == len(entries)
+
+    gazetteer = Gazetteer(path)
+    assert all(word in gazetteer for word in entries)
+    assert not any(word in gazetteer for word in sorted(words)[10000:])
+
+
+def test_unknown_type_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        compile_gazetteer(["x"], tmp_path / "x.gaz", 'city')
+
+
+def test_classify_tries_the_whole_text_and_each_word(gazetteers):
+    assert classify("Sankt Eriksgatan", gazetteers) == 'address'
+    assert classify("fru Lindqvist", gazetteers) == 'name'
+    assert classify("ingen träff", gazetteers) is None
+    assert classify("Åsa", ()) is None
+
+
+def test_find_spans_keeps_the_longest_capitalized_match(gazetteers):
+    text = "Per Olof och åsa bor på Sankt Eriksgatan hos Lindqvist, inte på Lindqvist-gården."
+    spans = find_spans(text, gazetteers)
+    assert [(s['word'], s['entity_type']) for s in spans] == [
+        ("Per Olof", 'PER'), ("Sankt Eriksgatan", 'LOC'), ("Lindqvist", 'PER'),
+    ]
+    assert all(text[s['start']:s['end']] == s['word'] for s in spans)
+
+
+def test_find_spans_matches_entries_with_digits(gazetteers):
+    text = "Hon bor på Lilla Nygatan 12 sedan 2019, inte på Lilla Nygatan 14."
+    spans = find_spans(text, gazetteers)
+    assert [(s['word'], s['entity_type']) for s in spans] == [("Lilla Nygatan 12", 'LOC')]
+    assert classify("Lilla Nygatan 12", gazetteers) == 'address'
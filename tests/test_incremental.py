@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from censurering import analyze_text
+from incremental import MANUAL_TYPE, apply_edit, redetect
+
+WORDS = ["och", "att", "det", "Anna", "Svensson", "i", "Malmö", "som", "ringde", "070-123", "45", "67",
+         "anna@example.se", "19850101-1234", "från", "en", "hund", "."]
+
+
+def random_text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def random_edit(rng, text):
+    start = rng.randrange(len(text) + 1)
+    end = min(len(text), start + rng.randrange(0, 30))
+    return {'start': start, 'end': end, 'text': rng.choice(['', ' ', 'x', random_text(rng, rng.randrange(1, 6))])}
+
+
+def comparable(redactions, confidence=True):
+    return [(r['start'], r['end'], r['type'], r['text']) + ((r['confidence'],) if confidence else ())
+            for r in redactions]
+
+
+@pytest.mark.parametrize('use_ner', [False, True])
+def test_redetect_matches_a_full_analysis(fake_ner, use_ner):
+    rng = random.Random(1)
+    pipeline = fake_ner if use_ner else None
+
+    for _ in range(150):
+        text = random_text(rng, rng.randrange(50, 400))
+        previous = analyze_text(text, pipeline)['redactions']
+        edit = random_edit(rng, text)
+
+        result = redetect(text, previous, edit, pipeline, context_chars=rng.choice([16, 64, 256]))
+        expected = analyze_text(apply_edit(text, edit), pipeline)['redactions']
+
+        assert result['original_text'] == apply_edit(text, edit)
+        # Spridda träffar får score från säkra träffar i hela dokumentet, så med
+        # NER kan bara deras score skilja sig när källan ligger utanför området
+        assert comparable(result['redactions'], not use_ner) == comparable(expected, not use_ner)
+
+
+def test_redactions_outside_the_region_keep_their_ids():
+    text = "Ring 070-123 45 67. " + "och det " * 100 + "Mejla anna@example.se."
+    previous = analyze_text(text)['redactions']
+    edit = {'start': len(text) - 1, 'end': len(text), 'text': '!'}
+
+    result = redetect(text, previous, edit, context_chars=16)
+    assert result['redactions'][0]['id'] == previous[0]['id']
+    assert result['redactions'][-1]['id'] != previous[-1]['id']
+
+
+def test_manual_redactions_survive_unless_the_edit_touches_them():
+    text = "Hej från kontoret, ring 070-123 45 67 i morgon."
+    manual = {'id': 'manual', 'type': MANUAL_TYPE, 'confidence': 1.0, 'start': 0, 'end': 3,
+              'replacement': '***', 'text': 'Hej'}
+    previous = analyze_text(text)['redactions'] + [manual]
+
+    edit = {'start': 9, 'end': 17, 'text': 'hemmet'}
+    kept = redetect(text, previous, edit)['redactions']
+    assert any(r['id'] == 'manual' and (r['start'], r['end']) == (0, 3) for r in kept)
+
+    edit = {'start': 1, 'end': 2, 'text': 'a'}
+    assert all(r['id'] != 'manual' for r in redetect(text, previous, edit)['redactions'])
+
+
+def test_invalid_edit_is_rejected():
+    with pytest.raises(ValueError):
+        redetect("kort text", [], {'start': 5, 'end': 50, 'text': ''})
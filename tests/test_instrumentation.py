@@ -0,0 +1,95 @@
+import json
+import pstats
+
+import pytest
+
+import instrumentation
+from instrumentation import Metrics, profiling, report
+
+
+@pytest.fixture
+def metrics_file(tmp_path, monkeypatch):
+    """Mätvärdesfil och nollställda processummor"""
+    monkeypatch.setattr(instrumentation, 'PROCESS_METRICS', Metrics())
+    path = tmp_path / "metrics.out"
+    monkeypatch.setenv('ANONYMIZATION_METRICS_FILE', str(path))
+    return path
+
+
+def sample_metrics(windows):
+    metrics = Metrics()
+    metrics.timings['ner'] = 0.25
+    metrics.calls['ner'] = 1
+    metrics.count('ner_windows', windows)
+    metrics.gauge('peak_bytes', 1000 * windows)
+    return metrics
+
+
+def parse_prometheus(dump):
+    values = {}
+    for line in dump.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            values[name] = float(value)
+    return values
+
+
+def test_report_is_off_by_default(metrics_file, monkeypatch):
+    monkeypatch.delenv('ANONYMIZATION_METRICS', raising=False)
+    report(sample_metrics(3), file="a.pdf")
+    assert not metrics_file.exists()
+    assert instrumentation.PROCESS_METRICS.counters == {'ner_windows': 3}
+
+
+def test_report_jsonl_appends_one_line_per_run(metrics_file, monkeypatch):
+    monkeypatch.setenv('ANONYMIZATION_METRICS', 'jsonl')
+    report(sample_metrics(3), file="a.pdf")
+    report(sample_metrics(5), file="b.pdf")
+
+    lines = [json.loads(line) for line in metrics_file.read_text(encoding="utf-8").splitlines()]
+    assert lines == [
+        {'file': "a.pdf", 'stages_ms': {'ner': 250.0}, 'counters': {'ner_windows': 3},
+         'gauges': {'peak_bytes': 3000}},
+        {'file': "b.pdf", 'stages_ms': {'ner': 250.0}, 'counters': {'ner_windows': 5},
+         'gauges': {'peak_bytes': 5000}},
+    ]
+
+
+def test_report_prometheus_rewrites_the_process_totals(metrics_file, monkeypatch):
+    monkeypatch.setenv('ANONYMIZATION_METRICS', 'prometheus')
+    report(sample_metrics(3), file="a.pdf")
+    report(sample_metrics(5), file="b.pdf")
+
+    dump = metrics_file.read_text(encoding="utf-8")
+    assert parse_prometheus(dump) == {
+        'anonymization_stage_seconds_total{stage="ner"}': 0.5,
+        'anonymization_stage_calls_total{stage="ner"}': 2,
+        'anonymization_ner_windows_total': 8,
+        'anonymization_peak_bytes': 5000,
+    }
+    assert "# TYPE anonymization_ner_windows_total counter" in dump
+    assert "# TYPE anonymization_peak_bytes gauge" in dump
+    # Inga temporära filer blir kvar bredvid dumpen
+    assert [path.name for path in metrics_file.parent.iterdir()] == [metrics_file.name]
+
+
+def test_profiling_is_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv('ANONYMIZATION_PROFILE', raising=False)
+    monkeypatch.setenv('ANONYMIZATION_PROFILE_DIR', str(tmp_path / "prof"))
+    metrics = Metrics()
+    with profiling(metrics, "dokument"):
+        pass
+    assert not (tmp_path / "prof").exists() and metrics.gauges == {}
+
+
+def test_profiling_writes_cprofile_stats_and_tracemalloc_peak(tmp_path, monkeypatch):
+    monkeypatch.setenv('ANONYMIZATION_PROFILE', 'cprofile, tracemalloc')
+    monkeypatch.setenv('ANONYMIZATION_PROFILE_DIR', str(tmp_path / "prof"))
+    metrics = Metrics()
+    with profiling(metrics, "dokument"):
+        data = [bytes(1000) for _ in range(100)]
+    del data
+
+    [path] = (tmp_path / "prof").glob("dokument-*.prof")
+    assert pstats.Stats(str(path)).total_calls > 0
+    assert metrics.gauges['tracemalloc_peak_bytes'] >= 100 * 1000
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+from markdown_offsets import build_offset_map, censor_markdown, project_spans
+
+
+class FakeDocument:
+    """Dokument med samma iterate_items som doclings DoclingDocument"""
+
+    def __init__(self, texts, table=None):
+        self.items = [SimpleNamespace(text=text) for text in texts]
+        if table:
+            cells = [SimpleNamespace(text=cell) for row in table for cell in row]
+            self.items.append(SimpleNamespace(text='', data=SimpleNamespace(table_cells=cells)))
+
+    def iterate_items(self):
+        for item in self.items:
+            yield item, 0
+
+
+def span(text, word, occurrence=0):
+    start = -1
+    for _ in range(occurrence + 1):
+        start = text.index(word, start + 1)
+    return {'start': start, 'end': start + len(word), 'word': word, 'entity_type': 'PER', 'score': 1.0}
+
+
+def censor(document, plain_text, markdown_text, spans):
+    offset_map = build_offset_map(document, plain_text, markdown_text)
+    return censor_markdown(markdown_text, project_spans(plain_text, spans, offset_map, markdown_text))
+
+
+def test_spans_are_projected_past_markdown_markers():
+    document = FakeDocument(["Anteckning om Anna", "Anna Svensson ringde", "Anna mådde bra"],
+                            table=[["Namn", "Ort"], ["Anna", "Malmö"]])
+    plain_text = "Anteckning om Anna\n\nAnna Svensson ringde\n\n- Anna mådde bra\n\nNamn Ort\nAnna Malmö"
+    markdown_text = ("## Anteckning om Anna\n\nAnna Svensson ringde\n\n- Anna mådde bra\n\n"
+                     "| Namn | Ort |\n|---|---|\n| Anna | Malmö |")
+    spans = [span(plain_text, "Anna", 1), span(plain_text, "Svensson"), span(plain_text, "Malmö")]
+
+    assert censor(document, plain_text, markdown_text, spans) == (
+        "## Anteckning om Anna\n\n\\*\\*\\*\\* \\*\\*\\*\\*\\*\\*\\*\\* ringde\n\n- Anna mådde bra\n\n"
+        "| Namn | Ort |\n|---|---|\n| Anna | \\*\\*\\*\\*\\* |"
+    )
+
+
+def test_escaped_characters_are_masked_with_their_escapes():
+    document = FakeDocument(["Hunden heter my_dog och bor hos *Erik*"])
+    plain_text = "Hunden heter my_dog och bor hos *Erik*"
+    markdown_text = "Hunden heter my\\_dog och bor hos \\*Erik\\*"
+
+    censored = censor(document, plain_text, markdown_text, [span(plain_text, "my_dog"), span(plain_text, "*Erik*")])
+    assert censored == "Hunden heter " + "\\*" * 6 + " och bor hos " + "\\*" * 6
+
+
+@pytest.mark.parametrize('word, expected', [
+    ("_dog", "my" + "\\*" * 4),
+    ("my_", "\\*" * 3 + "dog"),
+    ("_", "my\\*dog"),
+])
+def test_span_starting_or_ending_at_an_escape(word, expected):
+    # Escape-tecknet maskeras med tecknet, så ingen ensam backslash blir kvar framför masken
+    assert censor(FakeDocument(["my_dog"]), "my_dog", "my\\_dog", [span("my_dog", word)]) == expected
+
+
+def test_span_outside_the_items_is_searched_between_neighbouring_segments():
+    document = FakeDocument(["Första stycket", "Tredje stycket"])
+    plain_text = "Första stycket\n\nSidfot Anna\n\nTredje stycket"
+    markdown_text = "# Första stycket\n\nSidfot Anna\n\nTredje stycket"
+
+    assert censor(document, plain_text, markdown_text, [span(plain_text, "Anna")]) == (
+        "# Första stycket\n\nSidfot \\*\\*\\*\\*\n\nTredje stycket"
+    )
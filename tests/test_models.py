@@ -0,0 +1,156 @@
+import threading
+
+import pytest
+
+import models
+from models import ModelRouter, MODEL_REGISTRY, choose_model, detect_language, SHORT_TEXT_CHARS
+
+SWEDISH_TEXT = "Det här är ett protokoll från mötet, och han som skrev det var inte på plats. "
+ENGLISH_TEXT = "This is the report from the meeting, and she was not at the office that day. "
+
+
+class FakePipeline:
+    """Pipeline utan modell: routern räknar då med approx_bytes från registret"""
+
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Ersätt load_pipeline och räkna laddningarna per modell"""
+    counts = {}
+    gate = threading.Event()
+    gate.set()
+
+    def fake_load_pipeline(config, backend=None):
+        gate.wait(5)
+        counts[config.name] = counts.get(config.name, 0) + 1
+        return FakePipeline(config.name)
+
+    monkeypatch.setattr(models, 'load_pipeline', fake_load_pipeline)
+    counts['gate'] = gate
+    return counts
+
+
+def size(*names):
+    return sum(MODEL_REGISTRY[name].approx_bytes for name in names)
+
+
+def test_detect_language():
+    assert detect_language(SWEDISH_TEXT) == 'sv'
+    assert detect_language(ENGLISH_TEXT) == 'en'
+    # Å, ä och ö räcker för att tippa över en text utan småord
+    assert detect_language("Åsa Öberg, Växjö") == 'sv'
+
+
+def test_choose_model_routes_by_language_and_length():
+    long_english = ENGLISH_TEXT * (SHORT_TEXT_CHARS // len(ENGLISH_TEXT) + 1)
+    assert len(long_english) >= SHORT_TEXT_CHARS
+
+    assert choose_model(SWEDISH_TEXT) == 'kb-bert-sv'
+    assert choose_model(SWEDISH_TEXT * 100) == 'kb-bert-sv'
+    assert choose_model(ENGLISH_TEXT) == 'distilbert-en'
+    assert choose_model(long_english) == 'bert-large-en'
+
+
+def test_concurrent_acquires_load_once(loads):
+    router = ModelRouter(memory_budget=size('kb-bert-sv'))
+    gate = loads['gate']
+    gate.clear()
+
+    pipelines = []
+    errors = []
+
+    def lease():
+        try:
+            with router.lease(SWEDISH_TEXT) as (config, pipeline):
+                pipelines.append((config.name, pipeline))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=lease) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert not errors
+    assert loads['kb-bert-sv'] == 1
+    assert {name for name, _ in pipelines} == {'kb-bert-sv'}
+    assert len({id(pipeline) for _, pipeline in pipelines}) == 1
+    assert router.loaded == ['kb-bert-sv']
+
+
+def test_eviction_respects_memory_budget(loads):
+    router = ModelRouter(memory_budget=size('kb-bert-sv', 'bert-large-en'))
+
+    with router.lease(SWEDISH_TEXT) as (_, swedish):
+        pass
+    with router.lease(ENGLISH_TEXT) as (_, distilled):
+        pass
+    assert router.loaded == ['kb-bert-sv', 'distilbert-en']
+
+    # Den svenska modellen används senast, så bara den destillerade behöver
+    # släppas för att bert-large ska rymmas
+    with router.lease(SWEDISH_TEXT):
+        pass
+    with router.lease(ENGLISH_TEXT * 100) as (_, large):
+        pass
+
+    assert router.loaded == ['kb-bert-sv', 'bert-large-en']
+    assert distilled.closed and not swedish.closed and not large.closed
+    assert size(*router.loaded) <= router.memory_budget
+
+    # En modell som släppts laddas om vid nästa användning
+    with router.lease(ENGLISH_TEXT):
+        pass
+    assert loads['distilbert-en'] == 2
+    assert router.loaded == ['bert-large-en', 'distilbert-en']
+    assert swedish.closed and not large.closed
+
+
+def test_evicted_model_is_closed_on_last_release(loads):
+    router = ModelRouter(memory_budget=size('kb-bert-sv'))
+
+    first = router.lease(SWEDISH_TEXT)
+    second = router.lease(SWEDISH_TEXT)
+    _, swedish = first.__enter__()
+    second.__enter__()
+
+    # Den svenska modellen måste släppas för att den engelska ska rymmas,
+    # men den är utlånad och får inte stängas än
+    with router.lease(ENGLISH_TEXT) as (_, english):
+        assert router.loaded == ['distilbert-en']
+        assert not swedish.closed
+
+    first.__exit__(None, None, None)
+    assert not swedish.closed
+    second.__exit__(None, None, None)
+    assert swedish.closed
+    assert not english.closed
+
+
+def test_failed_load_is_retried(monkeypatch):
+    attempts = []
+
+    def failing_load_pipeline(config, backend=None):
+        attempts.append(config.name)
+        if len(attempts) == 1:
+            raise OSError("modellen finns inte")
+        return FakePipeline(config.name)
+
+    monkeypatch.setattr(models, 'load_pipeline', failing_load_pipeline)
+    router = ModelRouter(memory_budget=size('kb-bert-sv'))
+
+    with pytest.raises(OSError):
+        with router.lease(SWEDISH_TEXT):
+            pass
+    with router.lease(SWEDISH_TEXT) as (config, _):
+        assert config.name == 'kb-bert-sv'
+    assert attempts == ['kb-bert-sv', 'kb-bert-sv']
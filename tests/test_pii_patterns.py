@@ -0,0 +1,101 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from pii_patterns import PII_SCANNER, PERSONAL_DATA_SCANNER, classify_pii
+from spans import resolve_overlaps
+
+RESOURCES_DIR = Path(__file__).resolve().parent.parent / "resources"
+
+# Mönstren som main2 tidigare körde ett re.finditer per, i samma ordning
+OLD_SCAN_PATTERNS = [
+    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b',
+    r'\b(?:\+46|0)(?:[\s-])?7[0-9](?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b',
+    r'\b(?:\+46|0)(?:[\s-])?[1-9][0-9]{0,2}(?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b',
+    r'\b(?:\+46|0)(?:[\s-])?[1-9](?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{3}(?:[\s-])?[0-9]{2}(?:[\s-])?[0-9]{2}\b',
+    r'\b[1-2][0-9]{3}(?:0[1-9]|1[0-2])(?:0[1-9]|[1-2][0-9]|3[0-1])[-]?[0-9]{4}\b',
+    r'\b(?:[0-9]{2})(?:0[1-9]|1[0-2])(?:0[1-9]|[1-2][0-9]|3[0-1])[-]?[0-9]{4}\b',
+    r'\b(?:\d{1,3}\.){3}\d{1,3}\b',
+    r'\b(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}\b',
+    r'\b(?:\d{4}[- ]?){3}\d{4}\b',
+]
+
+# Den tidigare klassificeringen i identify_pii_subtype, uppifrån och ned
+OLD_CLASSIFY_PATTERNS = [
+    ('email', r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'),
+    ('phone', r'\b(?:\+46|0)(?:[\s-])?[0-9]{1,3}(?:[\s-])?[0-9]{2,3}(?:[\s-])?[0-9]{2,3}(?:[\s-])?[0-9]{2,3}\b'),
+    ('ip', r'\b(?:\d{1,3}\.){3}\d{1,3}\b'),
+    ('ip', r'\b(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}\b'),
+    ('credit-card', r'\b(?:\d{4}[- ]?){3}\d{4}\b'),
+    ('other', r'\b(?:\d{6,8})[-]?\d{4}\b'),
+]
+
+SAMPLE_TEXT = """
+Kontakta anna.svensson@example.se eller ring 070-123 45 67, 08-123 45 67
+eller +46 70 123 45 67. Växeln nås på 031 12 345 67 89.
+Personnummer 19850101-1234, 850101-1234 och 8501011234.
+Servern har adressen 192.168.0.1 och 2001:0db8:85a3:0000:0000:8a2e:0370:7334.
+Kortet 1234 5678 9012 3456 spärrades. Ärende 2023-45 och datum 2023-01-01.
+"""
+
+
+def covered(text, spans):
+    mask = [False] * len(text)
+    for span in spans:
+        for i in range(span['start'], span['end']):
+            mask[i] = True
+    return mask
+
+
+def old_scan(text):
+    spans = []
+    for pattern in OLD_SCAN_PATTERNS:
+        for match in re.finditer(pattern, text):
+            spans.append({'start': match.start(), 'end': match.end(), 'score': 1.0})
+    return spans
+
+
+def old_classify(word):
+    for pii_type, pattern in OLD_CLASSIFY_PATTERNS:
+        if re.match(pattern, word):
+            return pii_type
+    return None
+
+
+def corpus_texts():
+    texts = [SAMPLE_TEXT]
+    for path in sorted((RESOURCES_DIR / "txt").glob("*_non_anon.txt")):
+        texts.append(path.read_text(encoding="utf-8"))
+    return texts
+
+
+@pytest.mark.parametrize('text', corpus_texts())
+def test_scanner_censors_the_same_characters_as_separate_patterns(text):
+    assert covered(text, resolve_overlaps(PII_SCANNER.scan(text))) == covered(text, resolve_overlaps(old_scan(text)))
+
+
+def test_first_matching_rule_wins():
+    rules = {span['word']: span['rule'] for span in PII_SCANNER.scan(SAMPLE_TEXT)}
+    assert rules['anna.svensson@example.se'] == 'email'
+    assert rules['070-123 45 67'] == 'phone_mobile'
+    assert rules['08-123 45 67'] == 'phone_landline'
+    assert rules['19850101-1234'] == 'personnummer_long'
+    assert rules['850101-1234'] == 'personnummer_short'
+    assert rules['192.168.0.1'] == 'ipv4'
+    assert rules['1234 5678 9012 3456'] == 'credit_card'
+
+
+def test_personal_data_scanner_only_has_email_phone_and_personnummer():
+    categories = {rule.category for rule in PERSONAL_DATA_SCANNER.rules.values()}
+    assert categories == {'email', 'phone', 'personnummer'}
+
+
+@pytest.mark.parametrize('word', [
+    'anna@example.se', '070-123 45 67', '+46 70 123 45 67', '192.168.0.1',
+    '2001:0db8:85a3:0000:0000:8a2e:0370:7334', '1234 5678 9012 3456', '1234-5678-9012-3456',
+    '19850101-1234', '8501011234', '0701234567', '123456789012', 'Anna', '2023-01-01', '',
+])
+def test_classify_pii_matches_the_old_order(word):
+    rule = classify_pii(word)
+    assert (rule.pii_type if rule else None) == old_classify(word)
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from propagation import DictionaryMatcher, fold, propagate
+
+
+def brute_force(entries, text):
+    """Alla förekomster på ordgränser, med första payloaden per vikt form"""
+    payloads = {}
+    for surface, payload in entries:
+        payloads.setdefault(fold(surface), payload)
+
+    folded = fold(text)
+    matches = set()
+    for form, payload in payloads.items():
+        if not form:
+            continue
+        start = folded.find(form)
+        while start >= 0:
+            end = start + len(form)
+            if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                matches.add((start, end, payload))
+            start = folded.find(form, start + 1)
+    return matches
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_matcher_finds_the_same_occurrences_as_brute_force(seed):
+    rng = random.Random(seed)
+    alphabet = "abåäöAÅÉé -"
+    entries = [(''.join(rng.choice(alphabet) for _ in range(rng.randrange(1, 6))), i) for i in range(rng.randrange(1, 40))]
+    text = ''.join(rng.choice(alphabet) for _ in range(rng.randrange(0, 400)))
+
+    assert set(DictionaryMatcher(entries).finditer(text)) == brute_force(entries, text)
+
+
+def test_fold_keeps_the_length_of_the_text():
+    text = "Åsa Öberg, Émile och ǅemal"
+    assert fold(text) == "asa oberg, emile och ǆemal"
+    assert len(fold(text)) == len(text)
+
+
+def plan_item(text, word, entity_type='PER', score=0.95):
+    start = text.index(word)
+    return {'start': start, 'end': start + len(word), 'word': word, 'entity_type': entity_type, 'score': score}
+
+
+def test_confident_entities_are_propagated_to_every_occurrence():
+    text = "Samuel kom hem. Sedan åt SAMUEL middag, men Samuelsson kom inte."
+    spans = propagate(text, [plan_item(text, "Samuel")], gazetteers=False)
+    assert [(s['word'], s['entity_type'], s['score']) for s in spans] == [("SAMUEL", 'PER', 0.95)]
+
+
+def test_uncertain_and_short_entities_are_not_propagated():
+    text = "Bo och Kim träffade Bo och Kim."
+    plan = [plan_item(text, "Bo"), plan_item(text, "Kim", score=0.5)]
+    assert propagate(text, plan, gazetteers=False) == []
+
+
+@pytest.mark.parametrize('text', ["He was on the street all night.", "På vägen hem mötte vi gatan.",
+                                  "Vi bodde på avenue-sidan."])
+def test_generic_address_nouns_are_not_propagated(text):
+    assert propagate(text, []) == []
+
+
+def test_cities_names_and_street_names_from_the_gazetteers():
+    text = "Anna bor på Drottninggatan i Malmö, nära Storgatan och Kungsvägen."
+    words = {s['word']: s['entity_type'] for s in propagate(text, [])}
+    assert words == {"Anna": 'PER', "Drottninggatan": 'LOC', "Malmö": 'LOC', "Storgatan": 'LOC', "Kungsvägen": 'LOC'}
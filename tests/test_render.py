@@ -0,0 +1,67 @@
+from censurering import generate_redactions_from_plan
+from render import censored_replacement, clip_spans, render_views, tagged_replacement
+
+VIEWS = {'censored': censored_replacement, 'tagged': tagged_replacement}
+
+
+def span(start, end, score=0.9, entity_type='PER'):
+    return {'start': start, 'end': end, 'entity_type': entity_type, 'score': score}
+
+
+def check_offsets(text, view, offsets):
+    """Texten mellan de ersatta spannen är oförändrad i vyn"""
+    orig_cursor = view_cursor = 0
+    for orig_start, orig_end, view_start, view_end in offsets:
+        assert view[view_cursor:view_start] == text[orig_cursor:orig_start]
+        orig_cursor, view_cursor = orig_end, view_end
+    assert view[view_cursor:] == text[orig_cursor:]
+
+
+def test_overlapping_spans_keep_the_first():
+    text = "Anna Svensson ringde"
+    spans = [span(5, 13), span(0, 4), span(3, 8)]
+    rendered = render_views(text, spans, VIEWS)
+
+    censored, offsets = rendered['censored']
+    assert censored == "**** ******** ringde"
+    assert [entry[:2] for entry in offsets] == [(0, 4), (5, 13)]
+    assert rendered['tagged'][0] == "<Anna> (PER) (0.90) <Svensson> (PER) (0.90) ringde"
+    for view, offsets in rendered.values():
+        check_offsets(text, view, offsets)
+
+
+def test_adjacent_spans_are_both_replaced():
+    text = "AnnaSvensson ringde"
+    rendered = render_views(text, [span(0, 4), span(4, 12, 0.8, 'LOC')], VIEWS)
+
+    assert rendered['censored'][0] == "************ ringde"
+    tagged, offsets = rendered['tagged']
+    assert tagged == "<Anna> (PER) (0.90)<Svensson> (LOC) (0.80) ringde"
+    assert offsets == [(0, 4, 0, 19), (4, 12, 19, 42)]
+    check_offsets(text, tagged, offsets)
+
+
+def test_angle_brackets_in_the_text_are_left_alone():
+    text = "if a < b and c > d: mejla <anna@example.se> eller Anna>"
+    start = text.index("anna@")
+    spans = [span(start, start + len("anna@example.se")), span(text.index("Anna>"), text.index("Anna>") + 4)]
+    rendered = render_views(text, spans, VIEWS)
+
+    censored, offsets = rendered['censored']
+    assert censored == "if a < b and c > d: mejla <***************> eller ****>"
+    for view, offsets in rendered.values():
+        check_offsets(text, view, offsets)
+
+    # Redaktionerna byggs från planen och påverkas inte av hakparenteserna
+    redactions = generate_redactions_from_plan(text, spans)
+    assert [(r['start'], r['end'], r['text']) for r in redactions] == [
+        (start, start + 15, "anna@example.se"), (text.index("Anna>"), text.index("Anna>") + 4, "Anna"),
+    ]
+
+
+def test_spans_outside_the_text_are_clipped():
+    text = "Anna"
+    assert [(start, end) for _, start, end in clip_spans(text, [span(-2, 2), span(3, 10), span(5, 9)])] == [
+        (0, 2), (3, 4),
+    ]
+    assert render_views(text, [span(2, 2)], VIEWS)['censored'] == ("Anna", [])
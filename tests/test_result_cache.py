@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import ner_worker
+import result_cache
+from result_cache import ResultCache
+
+RESULT = {'original_text': "Anna ringde", 'redactions': [{'start': 0, 'end': 4, 'type': 'name'}]}
+
+
+def test_miss_then_hit(tmp_path):
+    cache = ResultCache(tmp_path)
+    key = ResultCache.key_for(b"%PDF", "model:torch", 0.5)
+    assert cache.get(key) is None
+    cache.put(key, RESULT)
+    assert cache.get(key) == RESULT
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_key_depends_on_every_setting(monkeypatch):
+    base = ("model:torch", 0.5, "namn.gaz:10:32", {'regex_only': False})
+    key = ResultCache.key_for(b"%PDF", *base)
+    variants = [
+        ResultCache.key_for(b"%PDF-1", *base),
+        ResultCache.key_for(b"%PDF", "model:onnx", *base[1:]),
+        ResultCache.key_for(b"%PDF", base[0], 0.6, *base[2:]),
+        ResultCache.key_for(b"%PDF", *base[:2], "", base[3]),
+        ResultCache.key_for(b"%PDF", *base[:3], {'regex_only': True}),
+    ]
+    assert key not in variants and len(set(variants)) == len(variants)
+
+    monkeypatch.setattr(result_cache, 'PIPELINE_VERSION', result_cache.PIPELINE_VERSION + 1)
+    assert ResultCache.key_for(b"%PDF", *base) != key
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=10 ** 9)
+    for index, key in enumerate("abc"):
+        cache.put(key, {'text': key * 1000})
+        os.utime(cache._path(key), (index, index))
+
+    # 'a' används igen och blir nyast, så 'b' är äldst när cachen krymps
+    cache.get('a')
+    cache.max_bytes = sum(cache._path(key).stat().st_size for key in "ac")
+    cache.evict()
+    assert [key for key in "abc" if cache.get(key) is not None] == ['a', 'c']
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_main2(pdf_path, output_path=None, **kwargs):
+        calls.append(pdf_path)
+        if output_path:
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(RESULT['original_text'])
+        return RESULT
+
+    monkeypatch.setattr(ner_worker, 'main2', fake_main2)
+    monkeypatch.setattr(ner_worker, 'ner_model_key', lambda: "model:torch")
+    worker = ner_worker.NerWorker(cache=ResultCache(tmp_path / "cache"), pipeline_factory=object)
+    worker._local.converter = object()
+    worker.calls = calls
+    return worker
+
+
+def test_cached_job_still_writes_output_and_metrics(tmp_path, worker):
+    pdf_path = tmp_path / "in.pdf"
+    pdf_path.write_bytes(b"%PDF")
+
+    first = worker.handle({'pdf_path': str(pdf_path), 'output_path': str(tmp_path / "a.txt")})
+    second = worker.handle({'pdf_path': str(pdf_path), 'output_path': str(tmp_path / "b.txt"), 'metrics': True})
+
+    assert len(worker.calls) == 1
+    assert first['cached'] is False and second['cached'] is True
+    assert second['result'] == RESULT
+    assert second['metrics']['counters'] == {'cache_hits': 1}
+    assert (tmp_path / "b.txt").read_text(encoding="utf-8") == RESULT['original_text']
@@ -0,0 +1,55 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "ai_backend_python"))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv('ANONYMIZATION_CACHE_DIR', str(cache_dir))
+    monkeypatch.setenv('ANONYMIZATION_LAZY', '1')
+
+    # Modulen skapar ingenting vid import, cachen skapas först vid start
+    assert not cache_dir.exists()
+    with TestClient(server.app) as client:
+        assert cache_dir.exists()
+        yield client
+
+
+def test_regex_only_text_job(client):
+    response = client.post('/anonymize/text', json={'text': "Ring 070-123 45 67", 'regex_only': True})
+    assert response.status_code == 200
+    assert [r['type'] for r in response.json()['redactions']] == ['phone']
+
+    health = client.get('/health').json()
+    assert health['model_loaded'] is False and health['in_flight'] == 0
+
+
+def test_each_thread_gets_its_own_converter(monkeypatch):
+    import ner_worker
+
+    monkeypatch.setattr(ner_worker, 'create_converter', object)
+    worker = ner_worker.NerWorker()
+    converters = []
+
+    def convert():
+        converters.append(worker.converter)
+        converters.append(worker.converter)
+
+    threads = [threading.Thread(target=convert) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, converters))) == 3
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from spans import IntervalSet, resolve_overlaps
+
+
+def linear_resolve(spans):
+    """Den tidigare linjära genomgången av covered_ranges"""
+    covered_ranges = []
+    accepted = []
+    for span in sorted(spans, key=lambda x: -x['score']):
+        if any(span['start'] <= end and span['end'] >= start for start, end in covered_ranges):
+            continue
+        covered_ranges.append((span['start'], span['end']))
+        accepted.append(span)
+    return accepted
+
+
+def random_spans(rng, count, text_length):
+    spans = []
+    for _ in range(count):
+        start = rng.randrange(text_length)
+        spans.append({
+            'start': start,
+            'end': start + rng.randrange(1, 20),
+            'score': rng.choice([0.5, 0.8, 0.9, 1.0, rng.random()]),
+        })
+    return spans
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_resolve_overlaps_matches_linear_scan(seed):
+    rng = random.Random(seed)
+    spans = random_spans(rng, rng.randrange(1, 2000), rng.choice([50, 1000, 100000]))
+    assert resolve_overlaps(spans) == linear_resolve(spans)
+
+
+def test_interval_set_matches_brute_force_across_block_splits():
+    rng = random.Random(0)
+    intervals = IntervalSet()
+    added = []
+
+    # Fler intervall än flera block så att blockdelningen också testas
+    for _ in range(5000):
+        start = rng.randrange(200000)
+        end = start + rng.randrange(0, 30)
+        expected = any(start <= e and end >= s for s, e in added)
+        assert intervals.overlaps(start, end) == expected
+        if not expected:
+            intervals.add(start, end)
+            added.append((start, end))
+
+    assert len(intervals) == len(added)
+    assert len(intervals._starts) > 1
+
+
+def test_touching_spans_count_as_overlapping():
+    intervals = IntervalSet()
+    intervals.add(10, 20)
+    assert intervals.overlaps(20, 25)
+    assert intervals.overlaps(5, 10)
+    assert not intervals.overlaps(21, 25)
+    assert not intervals.overlaps(0, 9)
+
+
+def test_resolve_overlaps_custom_key():
+    spans = [
+        {'start': 0, 'end': 5, 'score': 0.5},
+        {'start': 3, 'end': 8, 'score': 0.9},
+    ]
+    assert resolve_overlaps(spans, key=lambda x: x['start']) == [spans[0]]
+    assert resolve_overlaps(spans) == [spans[1]]
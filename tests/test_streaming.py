@@ -0,0 +1,81 @@
+import pytest
+
+import streaming
+from censurering import build_censoring_plan, generate_redactions_from_plan
+from streaming import PAGE_SEPARATOR, stream_pdf
+
+PAGES = [
+    "mötet hölls i går och protokollet skickades till anna@example.se samt till Anna",
+    "",
+    "Karlsson som svarade från 070-123 45 67 dagen efter.",
+]
+
+
+class FakeConverter:
+    """Konverterare som ger en förbestämd text per sida och sparar anropen"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def convert(self, pdf_path, page_range):
+        self.calls.append(page_range)
+        text = self.pages[page_range[0] - 1]
+
+        class Document:
+            @staticmethod
+            def export_to_text():
+                return text
+
+        class Result:
+            document = Document
+
+        return Result
+
+
+def comparable(redactions):
+    return [(r['start'], r['end'], r['type'], r['text'], r['confidence']) for r in redactions]
+
+
+@pytest.fixture
+def pages(monkeypatch, fake_ner):
+    monkeypatch.setattr(streaming, 'count_pdf_pages', lambda pdf_path: len(PAGES))
+    return list(stream_pdf("dokument.pdf", fake_ner, FakeConverter(PAGES), context_chars=40))
+
+
+def test_pages_are_converted_one_at_a_time(monkeypatch, fake_ner):
+    converter = FakeConverter(PAGES)
+    monkeypatch.setattr(streaming, 'count_pdf_pages', lambda pdf_path: len(PAGES))
+    assert [page['page'] for page in stream_pdf("dokument.pdf", fake_ner, converter)] == [1, 2, 3]
+    assert converter.calls == [(1, 1), (2, 2), (3, 3)]
+
+
+def test_page_offsets_follow_the_joined_text(pages):
+    full_text = PAGE_SEPARATOR.join(text for text in PAGES if text)
+    for page in pages:
+        assert full_text[page['offset']:page['offset'] + len(page['text'])] == page['text']
+    assert [page['offset'] for page in pages] == [0, len(PAGES[0]), len(PAGES[0]) + len(PAGE_SEPARATOR)]
+
+
+def redacted_characters(text, redactions):
+    return {index for r in redactions for index in range(r['start'], r['end']) if not text[index].isspace()}
+
+
+def test_redactions_match_the_whole_document(pages, fake_ner):
+    full_text = PAGE_SEPARATOR.join(text for text in PAGES if text)
+    expected = generate_redactions_from_plan(full_text, build_censoring_plan(full_text, fake_ner))
+    streamed = [redaction for page in pages for redaction in page['redactions']]
+
+    for redaction in streamed:
+        assert full_text[redaction['start']:redaction['end']] == redaction['text']
+    assert redacted_characters(full_text, streamed) == redacted_characters(full_text, expected)
+
+    # Spann som inte korsar en sidbrytning är identiska
+    assert comparable(streamed[:1] + streamed[-1:]) == comparable(expected[:1] + expected[-1:])
+
+    # Namnet som NER slår ihop över sidbrytningen rapporteras en gång per sida,
+    # och delen i den medskickade kontexten rapporteras inte igen
+    assert "Anna\n\nKarlsson" in [r['text'] for r in expected]
+    assert [r['text'] for r in pages[0]['redactions']] == ["anna@example.se", "Anna"]
+    assert pages[1]['redactions'] == []
+    assert [r['text'] for r in pages[2]['redactions']] == ["Karlsson", "070-123 45 67"]
@@ -0,0 +1,120 @@
+import csv
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from censurering import analyze_text
+from chunking import run_ner, run_ner_many
+from tabular import anonymize_table, context_literals, has_ambiguous_words, row_context, TextAnonymizer
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+EXAMPLE_CSV = REPO_DIR / "resources" / "example-data.csv"
+
+
+def read_rows(path):
+    with open(path, encoding='cp1252', newline='') as f:
+        return list(csv.reader(f, delimiter=';'))
+
+
+def test_row_context_skips_empty_identifiers():
+    values = {'FirstName': ' Anna Karin ', 'LastName': '', 'NationalAssociation': 'NA Cambodia'}
+    context = row_context(values, ('FirstName', 'LastName', 'NationalAssociation'))
+    assert context == (('PER', 'Anna Karin'), ('ORG', 'NA Cambodia'))
+    assert row_context({'FirstName': ' '}, ('FirstName',)) is None
+
+
+def test_context_literals_split_names_but_not_organisations():
+    literals = list(context_literals((('PER', 'Anna-Karin Sok'), ('ORG', 'NA Cambodia'))))
+    assert literals == [
+        ('Anna-Karin Sok', 'PER'), ('Anna', 'PER'), ('Karin', 'PER'), ('Sok', 'PER'), ('NA Cambodia', 'ORG'),
+    ]
+
+
+def test_has_ambiguous_words_ignores_common_and_covered_words():
+    text = "He met Dara in Phnom Penh."
+    dara = {'start': 7, 'end': 11}
+    assert has_ambiguous_words(text, [dara])
+    assert not has_ambiguous_words("He met Dara today.", [dara])
+    assert not has_ambiguous_words("no capitals here", [])
+
+
+def test_identifiers_are_censored_without_ner():
+    anonymizer = TextAnonymizer()
+    context = (('PER', 'Dara'), ('PER', 'Sok'), ('ORG', 'NA Cambodia'))
+    censored = anonymizer.censor_many([("Dara Sok joined NA Cambodia.", context)])
+    assert censored[("Dara Sok joined NA Cambodia.", context)] == "**** *** joined ***********."
+
+
+def test_regex_only_csv_matches_analyze_text(tmp_path):
+    output = tmp_path / "out.csv"
+    anonymize_table(EXAMPLE_CSV, output, encoding='cp1252', batch_rows=7, context_columns=())
+
+    source, result = read_rows(EXAMPLE_CSV), read_rows(output)
+    header = source[0]
+    assert result[0] == header and len(result) == len(source)
+
+    text_column = header.index('TextValue')
+    mask_columns = [header.index('FirstName'), header.index('LastName')]
+    for before, after in zip(source[1:], result[1:]):
+        for i, (value, anonymized) in enumerate(zip(before, after)):
+            if i in mask_columns:
+                assert anonymized == '*' * len(value)
+            elif i == text_column:
+                assert anonymized == (analyze_text(value)['censored_text'] if value else value)
+            else:
+                assert anonymized == value
+
+
+def test_wrong_encoding_is_reported_by_the_cli(tmp_path):
+    result = subprocess.run(
+        [sys.executable, str(REPO_DIR / "cli" / "tabular.py"), str(EXAMPLE_CSV), str(tmp_path / "out.csv"),
+         "--regex-only"],
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 1
+    assert "--encoding" in result.stderr
+
+
+def test_ner_is_batched_across_cells_and_skipped_when_identifiers_cover_the_text(tmp_path, fake_ner):
+    with_context = anonymize_table(EXAMPLE_CSV, tmp_path / "a.csv", ner_pipeline=fake_ner, encoding='cp1252')
+    assert with_context.counters['ner_skipped'] > 0
+
+    # En liten cache ger samma resultat som en stor
+    anonymize_table(EXAMPLE_CSV, tmp_path / "b.csv", ner_pipeline=fake_ner, encoding='cp1252',
+                    batch_rows=5, cache_size=2)
+    assert read_rows(tmp_path / "a.csv") == read_rows(tmp_path / "b.csv")
+
+
+def test_run_ner_many_matches_run_ner_per_text(fake_ner):
+    texts = ["Anna ringde Erik.", "", "ingen träff", "Malmö och Stockholm " * 200]
+    many = run_ner_many(texts, fake_ner, max_length=32, stride=8)
+    assert many == [run_ner(text, fake_ner, max_length=32, stride=8) for text in texts]
+    assert len(fake_ner.calls) == 1 + len([text for text in texts if text.strip()])
+
+
+def test_parquet_without_pyarrow_gives_a_clear_error(tmp_path, monkeypatch):
+    for name in ('pyarrow', 'pyarrow.compute', 'pyarrow.parquet'):
+        monkeypatch.setitem(sys.modules, name, None)
+    with pytest.raises(ImportError, match="pip install pyarrow"):
+        anonymize_table(tmp_path / "in.parquet", tmp_path / "out.parquet")
+    assert not (tmp_path / "out.parquet").exists()
+
+
+def test_regex_only_parquet_matches_csv(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    rows = read_rows(EXAMPLE_CSV)
+    header = rows[0]
+    table = pa.table({name: [row[i] or None for row in rows[1:]] for i, name in enumerate(header)})
+    pq.write_table(table, tmp_path / "in.parquet")
+
+    anonymize_table(EXAMPLE_CSV, tmp_path / "out.csv", encoding='cp1252', batch_rows=7, context_columns=())
+    anonymize_table(tmp_path / "in.parquet", tmp_path / "out.parquet", batch_rows=7, context_columns=())
+
+    result = pq.read_table(tmp_path / "out.parquet")
+    assert result.schema == table.schema
+    expected = read_rows(tmp_path / "out.csv")[1:]
+    assert [[value or '' for value in row] for row in zip(*result.to_pydict().values())] == expected